@@ -5,7 +5,9 @@ from .models import (AccountName, Account, Party, Item, BankTransaction,
                      PurchaseRefund, InventoryReceivingVoucher, StockExport,
                      LossAdjustment, OpeningStock, ManufacturingOrder, Asset,
                      License, Component, Consumable, Maintenance, Depreciation,
-                     Bill, BillItem, Check, JournalEntry, JournalEntryLine, Order, OrderItem, PurchaseInvoice)
+                     Bill, BillItem, Check, JournalEntry, JournalEntryLine, Order, OrderItem, PurchaseInvoice,
+                     LedgerPosting, AccountBalanceSnapshot, Receivable,
+                     PartySummary)
 from django.contrib import admin
 from django.contrib import admin
 from .models import AccountName, Account
@@ -14,7 +16,8 @@ from django.contrib import admin
 
 @admin.register(AccountName)
 class AccountNameAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'parent', 'balance')
+    readonly_fields = ('balance',)
     search_fields = ('name',)
     ordering = ('name',)
 
@@ -126,6 +129,51 @@ class PurchasePaymentAdmin(admin.ModelAdmin):
                     'payment_mode', 'mapping_status', 'status')
 
 
+@admin.register(LedgerPosting)
+class LedgerPostingAdmin(admin.ModelAdmin):
+    list_display = ('date', 'account', 'debit', 'credit',
+                    'balance_delta', 'source_type', 'source_id')
+    list_filter = ('source_type', 'date')
+    search_fields = ('account__name', 'source_type')
+
+    # The ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('account', 'period_end', 'balance', 'is_dirty', 'updated_at')
+    list_filter = ('is_dirty', 'period_end')
+    search_fields = ('account__name',)
+
+
+@admin.register(Receivable)
+class ReceivableAdmin(admin.ModelAdmin):
+    list_display = ('source', 'kind', 'document_id', 'customer', 'date',
+                    'amount', 'open_amount', 'status')
+    list_filter = ('source', 'kind', 'status')
+    search_fields = ('customer__name',)
+
+    # Maintained from the invoice and payment tables
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PartySummary)
+class PartySummaryAdmin(admin.ModelAdmin):
+    list_display = ('party', 'invoiced', 'paid', 'outstanding', 'ordered', 'sold',
+                    'billed', 'purchased', 'expensed', 'last_activity')
+    search_fields = ('party__name',)
+
+    # Maintained from the party's documents
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Register remaining models with basic ModelAdmin
 admin.site.register(SalesPayment)
 admin.site.register(SalesOrderReturn)
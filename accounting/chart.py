@@ -0,0 +1,149 @@
+"""
+Chart-of-accounts rollups.
+
+AccountName groups accounts (Account.parent_account) and may itself sit
+under a parent group. Its balance holds the total of every account below
+it and is maintained by the posting service: whenever an account balance
+changes, the same delta is added to each of its groups, so reading group
+totals never re-aggregates the accounts.
+
+The group hierarchy is small, so the parent map is read afresh (one short
+query) by every rollup write: a cached copy could lag behind a group moved
+by another worker and send deltas to its old ancestors for good.
+Structural edits (moving or deleting a group) recompute all rollups with
+rebuild_rollups().
+
+The rendered tree is cached in the shared cache (see CACHES in
+core/settings.py) and dropped on every posting and structural edit, again
+once the transaction commits so a tree rendered meanwhile by another
+worker is not kept.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Account, AccountName
+
+TREE_KEY = 'chart:tree'
+
+
+def group_parents():
+    """
+    Return {group id: parent group id} for every AccountName.
+    """
+    return dict(AccountName.objects.values_list('id', 'parent_id'))
+
+
+def ancestors(group_id, parents):
+    """
+    Return ``group_id`` followed by each of its parent groups in
+    ``parents``, bottom-up.
+    """
+    chain = []
+    while group_id is not None and group_id not in chain:
+        chain.append(group_id)
+        group_id = parents.get(group_id)
+    return chain
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add {group id: balance delta} to those groups and all their ancestors.
+    Groups that get the same delta share one UPDATE, so a single posting
+    costs one statement however deep the hierarchy is.
+    """
+    deltas = {group_id: delta for group_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    parents = group_parents()
+    totals = defaultdict(Decimal)
+    for group_id, delta in deltas.items():
+        for node in ancestors(group_id, parents):
+            totals[node] += delta
+    by_delta = defaultdict(list)
+    for node, delta in totals.items():
+        if delta:
+            by_delta[delta].append(node)
+    now = timezone.now()
+    for delta, nodes in by_delta.items():
+        AccountName.objects.filter(pk__in=sorted(nodes)).update(
+            balance=Coalesce(
+                F('balance'), Value(Decimal('0')), output_field=DecimalField()
+            ) + delta,
+            updated_at=now,
+        )
+
+
+def rebuild_rollups():
+    """
+    Recompute every group balance from the account balances: one grouped
+    aggregate, then one bulk update.
+    """
+    totals = defaultdict(Decimal)
+    direct = Account.objects.filter(parent_account__isnull=False).order_by(
+    ).values_list('parent_account').annotate(total=Sum('balance'))
+    parents = group_parents()
+    for group_id, total in direct:
+        for node in ancestors(group_id, parents):
+            totals[node] += total or 0
+    now = timezone.now()
+    groups = []
+    for group in AccountName.objects.only('id', 'balance'):
+        if group.balance != totals[group.pk]:
+            group.balance = totals[group.pk]
+            group.updated_at = now
+            groups.append(group)
+    AccountName.objects.bulk_update(groups, ['balance', 'updated_at'], batch_size=500)
+
+
+def invalidate_chart():
+    """Drop the cached tree, now and when the transaction commits."""
+    cache.delete(TREE_KEY)
+    transaction.on_commit(lambda: cache.delete(TREE_KEY))
+
+
+def money(value):
+    return f"{value or 0:.2f}"
+
+
+def compute_chart_tree():
+    """
+    The whole chart with rolled-up totals, read in one query: groups and
+    accounts are fetched together with a UNION of the two tables.
+    """
+    groups = AccountName.objects.annotate(kind=Value('group')).values_list(
+        'id', 'name', 'balance', 'parent_id', 'kind')
+    accounts = Account.objects.annotate(kind=Value('account')).values_list(
+        'id', 'name', 'balance', 'parent_account_id', 'kind')
+
+    nodes, account_rows = {}, []
+    for pk, name, balance, parent_id, kind in groups.union(accounts, all=True):
+        if kind == 'group':
+            nodes[pk] = {'id': pk, 'name': name, 'balance': money(balance),
+                         'parent': parent_id, 'children': [], 'accounts': []}
+        else:
+            account_rows.append((pk, name, balance, parent_id))
+
+    roots = []
+    for node in sorted(nodes.values(), key=lambda node: node['id']):
+        parent = nodes.get(node['parent'])
+        (parent['children'] if parent else roots).append(node)
+    unassigned = []
+    for pk, name, balance, parent_id in sorted(account_rows):
+        account = {'id': pk, 'name': name, 'balance': money(balance)}
+        group = nodes.get(parent_id)
+        (group['accounts'] if group else unassigned).append(account)
+    return {'groups': roots, 'unassigned': unassigned}
+
+
+def chart_tree():
+    tree = cache.get(TREE_KEY)
+    if tree is None:
+        tree = compute_chart_tree()
+        cache.set(TREE_KEY, tree, None)
+    return tree
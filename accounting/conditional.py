@@ -0,0 +1,141 @@
+"""
+Conditional GET (ETag / Last-Modified) for the API.
+
+Every accounting and sales row carries an updated_at that moves forward on
+each write (see touch_updated_at in accounting/signals.py). A response is
+fingerprinted without rendering it, from one aggregate over the rows it
+would show: their count and latest updated_at, plus the latest updated_at
+(and, for to-many relations, the count) of every related table the
+serializer nests. A request whose If-None-Match carries the current ETag
+gets a 304 before anything is serialized.
+
+Detail responses also honour If-Modified-Since. List responses send
+Last-Modified but only validate by ETag, since a deleted row does not move
+the latest updated_at.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers
+
+from .querysets import relations
+
+
+def has_updated_at(model):
+    return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+
+def rendered_relations(serializer, model, prefix=''):
+    """
+    Yield (lookup path, related model, to_many) for every relation
+    ``serializer`` renders, nested ones included.
+    """
+    model_relations = relations(model)
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        relation = model_relations.get(field.source_attrs[0])
+        if relation is None:
+            continue
+        # Lookups go by the query name, not the accessor (salesitems_set)
+        path = prefix + relation.name
+        to_many = relation.many_to_many or relation.one_to_many
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.ModelSerializer):
+            yield path, relation.related_model, to_many
+            yield from rendered_relations(nested, relation.related_model, path + '__')
+        elif to_many:
+            # A list of ids still changes when children come and go
+            yield path, relation.related_model, to_many
+
+
+def fingerprint(queryset, serializer):
+    """
+    Return (state, last modified datetime or None, row count) of the rows
+    of ``queryset`` as rendered by ``serializer``, in one query; None if the
+    model has no updated_at.
+    """
+    model = queryset.model
+    if not has_updated_at(model):
+        return None
+    paths = list(rendered_relations(serializer, model))
+    joins_many = any(to_many for _, _, to_many in paths)
+    aggregates = {
+        'count': Count('pk', distinct=joins_many),
+        'latest': Max('updated_at'),
+    }
+    for n, (path, related_model, to_many) in enumerate(paths):
+        if has_updated_at(related_model):
+            aggregates[f"latest_{n}"] = Max(f"{path}__updated_at")
+        if to_many:
+            aggregates[f"count_{n}"] = Count(path, distinct=True)
+    state = queryset.order_by().aggregate(**aggregates)
+    latest = [value for key, value in state.items()
+              if key.startswith('latest') and value is not None]
+    return state, max(latest, default=None), state['count']
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin adding ETag and Last-Modified to ``list`` and
+    ``retrieve`` and answering matching conditional requests with 304.
+    """
+
+    def validators(self, queryset):
+        """
+        Return (ETag, Last-Modified timestamp or None, row count), or None
+        when the resource cannot be fingerprinted.
+        """
+        result = fingerprint(queryset, self.get_serializer())
+        if result is None:
+            return None
+        state, latest, count = result
+        # The same rows render differently per query string and format
+        key = repr((queryset.model._meta.label, sorted(state.items()),
+                    self.request.get_full_path(),
+                    getattr(self.request, 'accepted_media_type', None)))
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        return etag, (int(latest.timestamp()) if latest else None), count
+
+    def conditional(self, request, validators, respond, check_modified):
+        etag, last_modified, _ = validators
+        response = get_conditional_response(
+            request, etag=etag,
+            last_modified=last_modified if check_modified else None)
+        if response is None:
+            response = respond()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = self.validators(queryset)
+        respond = super().list
+        if validators is None:
+            return respond(request, *args, **kwargs)
+        return self.conditional(
+            request, validators, lambda: respond(request, *args, **kwargs),
+            check_modified=False)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        respond = super().retrieve
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            validators = None
+        else:
+            validators = self.validators(queryset)
+        if validators is None or not validators[2]:
+            # Not fingerprinted, or a 404 to be raised by get_object()
+            return respond(request, *args, **kwargs)
+        return self.conditional(
+            request, validators, lambda: respond(request, *args, **kwargs),
+            check_modified=True)
@@ -0,0 +1,137 @@
+"""
+values()-based list rendering.
+
+Rendering a list through a ModelSerializer builds a model instance per row
+(and per nested row), walks every field's get_attribute() and rebuilds the
+field tree for each request. For serializers made only of plain columns,
+primary keys and nested serializers over foreign keys, the same output can
+be produced from one values() query: the serializer is compiled once into
+a list of (key, lookup, converter) entries, where each converter is the
+bound to_representation() of the serializer's own field, so the rendered
+data is exactly what the serializer would have produced.
+
+Anything else (method fields, files, to-many relations, dotted sources...)
+makes compile_plan() return None and the view falls back to the serializer,
+so the mixin only goes on viewsets whose list serializer compiles: bank
+transactions, (accounting) sales payments and receivables. Orders and the
+sales app's payments nest their lines and installments and are left alone.
+"""
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+# Serializer class -> compiled plan (or None), for requests without
+# ?fields= / ?expand=
+_plans = {}
+
+
+class Unsupported(Exception):
+    pass
+
+
+def pk_converter(field):
+    def convert(value):
+        return field.to_representation(PKOnlyObject(pk=value))
+    return convert
+
+
+def compile_fields(serializer, model, prefix=''):
+    """
+    Return [(key, lookup, converter or nested entries)] for ``serializer``
+    over ``model``; raise Unsupported for a field values() cannot feed.
+    """
+    columns = {field.name: field for field in model._meta.concrete_fields}
+    entries = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1 or field.source_attrs[0] not in columns:
+            raise Unsupported(name)
+        column = columns[field.source_attrs[0]]
+        lookup = prefix + column.name
+        if column.is_relation:
+            if isinstance(field, serializers.ModelSerializer):
+                entries.append((name, lookup, compile_fields(
+                    field, column.related_model, lookup + '__')))
+            elif type(field) is serializers.PrimaryKeyRelatedField:
+                entries.append((name, lookup, pk_converter(field)))
+            else:
+                raise Unsupported(name)
+        elif isinstance(field, (serializers.BaseSerializer, serializers.RelatedField,
+                                serializers.ManyRelatedField, serializers.FileField,
+                                serializers.SerializerMethodField)):
+            raise Unsupported(name)
+        else:
+            entries.append((name, lookup, field.to_representation))
+    return entries
+
+
+def lookups(entries):
+    for _, lookup, convert in entries:
+        yield lookup
+        if isinstance(convert, list):
+            yield from lookups(convert)
+
+
+def render(row, entries):
+    data = {}
+    for key, lookup, convert in entries:
+        value = row[lookup]
+        if value is None:
+            data[key] = None
+        elif isinstance(convert, list):
+            data[key] = render(row, convert)
+        else:
+            data[key] = convert(value)
+    return data
+
+
+def compile_plan(serializer):
+    """
+    Return the entries rendering ``serializer`` (a ModelSerializer) from
+    values() rows, or None when it cannot be rendered that way.
+    """
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    try:
+        return compile_fields(serializer, serializer.Meta.model)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """
+    Viewset mixin rendering ``list`` from values() rows when the list
+    serializer allows it (see compile_plan); set ``fast_list = False`` to
+    always go through the serializer.
+    """
+    fast_list = True
+
+    def list_plan(self):
+        serializer = self.get_serializer()
+        params = self.request.query_params
+        if 'fields' in params or 'expand' in params:
+            return compile_plan(serializer)
+        cls = type(serializer)
+        if cls not in _plans:
+            _plans[cls] = compile_plan(serializer)
+        return _plans[cls]
+
+    def list(self, request, *args, **kwargs):
+        entries = self.list_plan() if self.fast_list else None
+        if entries is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = set(lookups(entries))
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            # The cursor is built from the ordering columns of the last row
+            columns.update(field.lstrip('-') for field in
+                           self.paginator.get_ordering(request, queryset, self))
+        rows = queryset.select_related(None).prefetch_related(None).values(*columns)
+
+        page = self.paginate_queryset(rows)
+        data = [render(row, entries) for row in (rows if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,147 @@
+"""
+Query-string filters for the API.
+
+A view lists what it can be filtered by in ``filter_fields``, mapping a
+query parameter to the model field (or fields) it narrows, e.g.
+
+    filter_fields = {
+        'date': 'date',
+        'status': 'status',
+        'party': 'customer',
+        'account': ('debit_account', 'credit_account'),
+        'amount': 'amount',
+    }
+
+and the parameters it accepts follow from the type of the field:
+
+- dates and datetimes: ``date_from`` / ``date_to``, both inclusive (a bare
+  date bound on a datetime covers the whole day);
+- numbers: ``amount_min`` / ``amount_max``, both inclusive;
+- relations: ``party=3`` or ``party=3,7``, by primary key;
+- anything else: ``status=paid`` or ``status=paid,partial``; fields with
+  choices only accept those.
+
+A parameter mapped to several fields matches a row if any of them does.
+Every value is parsed with the model field before the query is built, so a
+bad one is a 400 naming the parameter rather than a database error or a
+silently empty page, and the filters reach SQL as plain comparisons on the
+indexed columns. Parameters a view does not declare are ignored.
+"""
+import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def model_field(model, path):
+    """
+    Return the field ``path`` (``'customer'``, ``'invoice__date'``...)
+    points at from ``model``.
+    """
+    *relations, name = path.split('__')
+    for attr in relations:
+        model = model._meta.get_field(attr).related_model
+    return model._meta.get_field(name)
+
+
+def parse_bound(value, field, upper):
+    """
+    Return (lookup, value) for a date or datetime range bound on ``field``.
+    """
+    try:
+        # Dates first: parse_datetime() also reads '2024-03-01' as midnight
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        moment = day = None
+    if moment is None and day is None:
+        raise DjangoValidationError('Enter a valid date or datetime.')
+    if not isinstance(field, models.DateTimeField):
+        if day is None:
+            day = moment.date()
+        return ('lte' if upper else 'gte'), day
+    if moment is None:
+        # A bare date bounds the whole day: up to the next midnight
+        moment = datetime.datetime.combine(
+            day + datetime.timedelta(days=1) if upper else day, datetime.time.min)
+        lookup = 'lt' if upper else 'gte'
+    else:
+        lookup = 'lte' if upper else 'gte'
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return lookup, moment
+
+
+def parse_list(value, field):
+    """Return ('in', values) for a comma-separated list of ``field`` values."""
+    target = field.target_field if field.is_relation else field
+    values = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        item = target.to_python(item)
+        if field.choices and not field.is_relation:
+            field.validate(item, None)
+        values.append(item)
+    if not values:
+        raise DjangoValidationError('Enter at least one value.')
+    return 'in', values
+
+
+def parameters(name, field):
+    """
+    Yield (query parameter, parser) for the filter ``name`` on ``field``;
+    a parser takes the raw value and returns (lookup, value).
+    """
+    if isinstance(field, models.DateField):
+        yield f"{name}_from", lambda value: parse_bound(value, field, upper=False)
+        yield f"{name}_to", lambda value: parse_bound(value, field, upper=True)
+    elif not field.is_relation and isinstance(
+            field, (models.DecimalField, models.IntegerField, models.FloatField)):
+        yield f"{name}_min", lambda value: ('gte', field.to_python(value))
+        yield f"{name}_max", lambda value: ('lte', field.to_python(value))
+    elif isinstance(field, models.BooleanField):
+        yield name, lambda value: ('exact', field.to_python(value))
+    else:
+        yield name, lambda value: parse_list(value, field)
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """
+    Filter a view's queryset by the query parameters its ``filter_fields``
+    declares (see the module docstring).
+    """
+
+    def get_conditions(self, request, model, filter_fields):
+        conditions, errors = [], {}
+        for name, paths in filter_fields.items():
+            paths = (paths,) if isinstance(paths, str) else tuple(paths)
+            for param, parse in parameters(name, model_field(model, paths[0])):
+                value = request.query_params.get(param, '').strip()
+                if not value:
+                    continue
+                try:
+                    lookup, value = parse(value)
+                except DjangoValidationError as exc:
+                    errors[param] = exc.messages
+                    continue
+                condition = Q()
+                for path in paths:
+                    condition |= Q(**{f"{path}__{lookup}": value})
+                conditions.append(condition)
+        if errors:
+            raise ValidationError(errors)
+        return conditions
+
+    def filter_queryset(self, request, queryset, view):
+        filter_fields = getattr(view, 'filter_fields', None)
+        if not filter_fields:
+            return queryset
+        conditions = self.get_conditions(request, queryset.model, filter_fields)
+        return queryset.filter(*conditions) if conditions else queryset
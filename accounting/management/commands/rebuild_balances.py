@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Sum
+
+from accounting.models import Account, LedgerPosting
+from accounting.chart import invalidate_chart, rebuild_rollups
+from accounting.posting import apply_balance_delta, record_adjustment, source_balances
+
+
+def compute_chunk(account_types):
+    """
+    Worker entry point: recompute one chunk of accounts.
+    """
+    return source_balances(account_types)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every Account.balance from the source documents with "
+        "grouped aggregates, report accounts that drifted and optionally "
+        "correct them (and the chart-of-accounts group totals) in one "
+        "transaction, recording each correction in the ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Number of accounts aggregated per chunk (default 1000).")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Worker processes computing chunks in parallel (default 1).")
+        parser.add_argument(
+            '--apply', action='store_true',
+            help="Write the corrections; without it only the report is printed.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+
+        accounts = list(Account.objects.order_by('pk').values_list(
+            'pk', 'name', 'account_type', 'balance'))
+        stored = {pk: (name, balance or Decimal('0'))
+                  for pk, name, _, balance in accounts}
+        chunks = [
+            {pk: account_type for pk, _, account_type, _ in accounts[i:i + chunk_size]}
+            for i in range(0, len(accounts), chunk_size)
+        ]
+
+        if workers > 1 and len(chunks) > 1:
+            # Workers open their own connections; never share ours with them
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                results = list(pool.map(compute_chunk, chunks))
+        else:
+            results = [compute_chunk(chunk) for chunk in chunks]
+
+        diffs = []
+        for result in results:
+            for pk, expected in result.items():
+                name, balance = stored[pk]
+                if expected != balance:
+                    diffs.append((pk, name, balance, expected))
+
+        self.report(len(accounts), diffs)
+
+        if options['apply']:
+            corrected = self.correct([pk for pk, _, _, _ in diffs])
+            self.stdout.write(self.style.SUCCESS(
+                f"Corrected {corrected} account balance(s)."))
+        elif diffs:
+            self.stdout.write("Run again with --apply to correct them.")
+
+    def correct(self, account_ids):
+        """
+        Correct the drifted accounts in one transaction, returning how many
+        needed it. The accounts are locked before their stored balances and
+        documents are read again, so a posting to them either landed before
+        both reads or waits for the commit, and is never counted twice.
+        """
+        with transaction.atomic():
+            accounts = list(Account.objects.select_for_update().filter(
+                pk__in=account_ids).order_by('pk'))
+            expected = source_balances(
+                {account.pk: account.account_type for account in accounts})
+            ledger = dict(LedgerPosting.objects.filter(account__in=accounts).order_by(
+            ).values_list('account').annotate(total=Sum('balance_delta')))
+            corrected = 0
+            for account in accounts:
+                delta = expected[account.pk] - (account.balance or 0)
+                if not delta:
+                    continue
+                apply_balance_delta(account.pk, delta)
+                # The ledger may have drifted too (or not at all, if only the
+                # balance column was off): bring balance_as_of() and the
+                # snapshots to the same figure with a ledger row that has no
+                # source document, which source_balances() leaves out
+                ledger_delta = expected[account.pk] - (ledger.get(account.pk) or 0)
+                if ledger_delta:
+                    record_adjustment(account, ledger_delta)
+                corrected += 1
+            rebuild_rollups()
+            invalidate_chart()
+        return corrected
+
+    def report(self, total, diffs):
+        self.stdout.write(
+            f"Checked {total} account(s), {len(diffs)} out of balance.")
+        if not diffs:
+            return
+        self.stdout.write(
+            f"{'ID':>8}  {'Account':<30} {'Stored':>15} {'Expected':>15} {'Difference':>15}")
+        for pk, name, balance, expected in diffs:
+            self.stdout.write(
+                f"{pk:>8}  {(name or '')[:30]:<30} {balance:>15} {expected:>15} "
+                f"{expected - balance:>15}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounting.summaries import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the lifetime totals of every party from its invoices, "
+        "payments, orders, sales, bills, purchase orders and expenses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help="Parties recomputed per batch (default 500).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} party summary row(s)."))
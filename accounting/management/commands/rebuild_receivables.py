@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounting.receivables import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the receivables table from the sales invoices and payments "
+        "of the accounting and sales apps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Documents written per batch (default 2000).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} receivable row(s)."))
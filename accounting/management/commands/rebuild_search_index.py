@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounting.search import get_backend, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the full-text search index from the parties, items, "
+        "bills, checks and bank transactions in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Rows read per query while indexing (default 2000).")
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            self.stdout.write("Search is turned off for this database.")
+            return
+        with transaction.atomic():
+            total = rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} document(s)."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from accounting.snapshots import last_closed_period_end, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Write AccountBalanceSnapshot rows for every closed period that is "
+        "missing or was dirtied by a backdated posting. Run it after each "
+        "period closes (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            help="Last period end to snapshot, YYYY-MM-DD (default: the last "
+                 "closed period).")
+
+    def handle(self, *args, **options):
+        until = last_closed_period_end()
+        if options['until']:
+            until = parse_date(options['until'])
+            if until is None:
+                raise CommandError(f"Invalid date: {options['until']}")
+            until = min(until, last_closed_period_end())
+
+        with transaction.atomic():
+            written = take_snapshots(until)
+        self.stdout.write(f"{written} snapshot(s) written up to {until}")
@@ -4,16 +4,66 @@ from django.utils import timezone
 # Create your models here.
 
 
-class AccountName(models.Model):
+class TrackedFieldsMixin:
+    """
+    Keeps a snapshot of ``tracked_fields`` as they were loaded from (or last
+    saved to) the database, so the pre_save receivers in accounting/signals.py
+    can see the previous values without re-reading the row.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        # Deferred fields are left out rather than loaded
+        return {
+            field: self.__dict__[field]
+            for field in self.tracked_fields if field in self.__dict__
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._loaded_values = self._tracked_values()
+        elif hasattr(self, '_loaded_values'):
+            current = self._tracked_values()
+            for field in update_fields:
+                field = self._meta.get_field(field).attname
+                if field in current:
+                    self._loaded_values[field] = current[field]
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+
+
+class AccountName(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('parent_id',)
+
     name = models.CharField(max_length=255, null=True, blank=True)
+    # Optional parent group for deeper charts of accounts
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='children')
+    # Total of every account below this group, maintained by the posting
+    # service (see accounting/chart.py)
     balance = models.DecimalField(
         max_digits=10, decimal_places=2, blank=True, null=True)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
 
     def __str__(self):
         return self.name
 
 
-class Account(models.Model):
+class Account(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('balance', 'parent_account_id')
+
     ACCOUNT_TYPE_CHOICES = [
         ('debit', 'Debit'),
         ('credit', 'Credit'),
@@ -51,6 +101,13 @@ class Account(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Posting profile fallback: first account of a type
+            models.Index(fields=['account_type', 'id'],
+                         name='account_type_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -117,7 +174,9 @@ class Item(models.Model):  # For products/services in sales, purchases, inventor
 # Banking Feeds: Bank Transactions/Statements
 
 
-class BankTransaction(models.Model):
+class BankTransaction(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('deposit', 'withdrawal', 'date')
+
     account = models.ForeignKey(
         Account, on_delete=models.CASCADE, related_name='transactions')
     date = models.DateTimeField(default=timezone.now)
@@ -135,6 +194,16 @@ class BankTransaction(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='banktxn_date_idx'),
+            models.Index(fields=['account', 'date'],
+                         name='banktxn_account_date_idx'),
+            models.Index(fields=['status', 'date'],
+                         name='banktxn_status_idx'),
+        ]
+
     def __str__(self):
         return f"Transaction {self.date} for {self.account}"
 
@@ -143,7 +212,9 @@ class BankTransaction(models.Model):
 # Orders
 
 
-class Order(models.Model):
+class Order(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('total_amount', 'payment_mode', 'customer_id', 'order_date')
+
     PAYMENT_MODE = [
         ('cash', 'Cash'),
         ('bank', 'Bank'),
@@ -159,15 +230,30 @@ class Order(models.Model):
         Party, on_delete=models.CASCADE, null=True, blank=True)
     total_amount = models.DecimalField(
         max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date', 'id'],
+                         name='order_date_idx'),
+            models.Index(fields=['customer', 'order_date'],
+                         name='order_customer_date_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} ({self.customer})"
 
     # Calculate total automatically
     def calculate_total(self):
-        total = sum(item.subtotal() for item in self.items.all())
-        self.total_amount = total
-        self.save()
+        total = self.items.aggregate(
+            total=models.Sum(models.F('quantity') * models.F('unit_price')),
+        )['total'] or 0
+
+        # Only update if the total changed
+        if self.total_amount != total:
+            self.total_amount = total
+            self.save(update_fields=['total_amount', 'updated_at'])
         return total
 
 
@@ -179,6 +265,8 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, null=True, blank=True)
     unit_price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
 
     def subtotal(self):
         return self.quantity * self.unit_price
@@ -187,7 +275,9 @@ class OrderItem(models.Model):
         return f"{self.item.name} x {self.quantity}"
 
 
-class SalesInvoice(models.Model):
+class SalesInvoice(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount', 'date')
+
     order = models.ForeignKey(
         Order, on_delete=models.CASCADE, related_name='invoices', null=True, blank=True)
     date = models.DateTimeField(default=timezone.now)
@@ -203,8 +293,18 @@ class SalesInvoice(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='salesinvoice_date_idx'),
+            models.Index(fields=['status', 'date'],
+                         name='salesinvoice_status_idx'),
+        ]
+
+
+class SalesPayment(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount', 'date')
 
-class SalesPayment(models.Model):
     date = models.DateTimeField(default=timezone.now)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_mode = models.CharField(max_length=50)
@@ -217,6 +317,14 @@ class SalesPayment(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='salespayment_date_idx'),
+            models.Index(fields=['mapping_status', 'date'],
+                         name='salespayment_mapping_idx'),
+        ]
+
 
 class SalesOrderReturn(models.Model):
     order = models.ForeignKey(
@@ -230,8 +338,16 @@ class SalesOrderReturn(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='salesreturn_date_idx'),
+        ]
+
+
+class SalesRefund(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount',)
 
-class SalesRefund(models.Model):
     date = models.DateTimeField(default=timezone.now)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_mode = models.CharField(max_length=50)
@@ -243,10 +359,18 @@ class SalesRefund(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='salesrefund_date_idx'),
+        ]
+
 # Transactions: Expenses
 
 
-class Expense(models.Model):
+class Expense(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount', 'vendor_id', 'expense_date')
+
     attach_receipt = models.FileField(
         upload_to='assets/uploads/expenses/', null=True, blank=True)
     vendor = models.ForeignKey(
@@ -278,6 +402,14 @@ class Expense(models.Model):
     reference = models.CharField(max_length=255, blank=True, null=True)
     repeat_every = models.CharField(
         max_length=50, blank=True, null=True, default='1 week')
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expense_date', 'id'],
+                         name='expense_date_idx'),
+        ]
 
     def __str__(self):
         return f"Expense {self.name} - {self.amount}"
@@ -299,10 +431,18 @@ class Payslip(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_date', 'id'],
+                         name='payslip_date_idx'),
+        ]
+
 # Transactions: Purchases (Similar to Sales but for vendors)
 
 
-class PurchaseOrder(models.Model):
+class PurchaseOrder(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('total_including_tax', 'payment_status', 'vendor_id', 'order_date')
+
     STATUS = [
         ('paid', 'Paid'),
         ('unpaid', 'Unpaid'),
@@ -337,6 +477,14 @@ class PurchaseOrder(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date', 'id'],
+                         name='purchaseorder_date_idx'),
+            models.Index(fields=['payment_status', 'order_date'],
+                         name='purchaseorder_status_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.purchase_order} ({self.vendor})"
 
@@ -345,9 +493,7 @@ class PurchaseOrder(models.Model):
             subtotal=models.Sum(models.F('quantity') * models.F('unit_price')),
         )
 
-        subtotal = result['subtotal'] or 0
-        tax_amount = (subtotal * self.tax_value) / 100 if self.tax_value else 0
-        total_with_tax = subtotal + tax_amount
+        subtotal, total_with_tax = self.totals_for(result['subtotal'] or 0)
 
         # Only update if values changed
         update_fields = []
@@ -359,10 +505,17 @@ class PurchaseOrder(models.Model):
             update_fields.append('total_including_tax')
 
         if update_fields:
-            self.save(update_fields=update_fields)
+            self.save(update_fields=update_fields + ['updated_at'])
 
         return total_with_tax
 
+    def totals_for(self, subtotal):
+        """
+        Return (po_value, total_including_tax) for a line subtotal.
+        """
+        tax_amount = (subtotal * self.tax_value) / 100 if self.tax_value else 0
+        return subtotal, subtotal + tax_amount
+
     def save(self, *args, **kwargs):
         # Generate purchase order number if not provided
         if not self.purchase_order:
@@ -382,6 +535,8 @@ class PurchaseOrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, null=True, blank=True)
     unit_price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
 
     def subtotal(self):
         return self.quantity * self.unit_price
@@ -398,7 +553,9 @@ class PurchaseOrderItem(models.Model):
 
 # Transactions: Purchase Invoices
 
-class PurchaseInvoice(models.Model):
+class PurchaseInvoice(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('invoice_amount',)
+
     invoice_no = models.CharField(max_length=100, null=True, blank=True)
     vendor = models.ForeignKey(
         Party, on_delete=models.CASCADE, limit_choices_to={'type': 'vendor'})
@@ -417,7 +574,9 @@ class PurchaseInvoice(models.Model):
         default=timezone.now, null=True, blank=True)
 
 
-class PurchasePayment(models.Model):
+class PurchasePayment(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount',)
+
     date = models.DateTimeField(default=timezone.now)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_mode = models.CharField(max_length=50)
@@ -430,6 +589,14 @@ class PurchasePayment(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='purchasepayment_date_idx'),
+            models.Index(fields=['mapping_status', 'date'],
+                         name='purchasepayment_mapping_idx'),
+        ]
+
 
 class PurchaseOrderReturn(models.Model):
     return_number = models.CharField(max_length=100)
@@ -447,8 +614,16 @@ class PurchaseOrderReturn(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_created', 'id'],
+                         name='purchasereturn_date_idx'),
+        ]
+
+
+class PurchaseRefund(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount',)
 
-class PurchaseRefund(models.Model):
     date = models.DateTimeField(default=timezone.now)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_mode = models.CharField(max_length=50)
@@ -461,10 +636,18 @@ class PurchaseRefund(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='purchaserefund_date_idx'),
+        ]
+
 # Transactions: Inventory
 
 
-class InventoryReceivingVoucher(models.Model):
+class InventoryReceivingVoucher(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('value_of_inventory',)
+
     delivery_docket_code = models.CharField(max_length=100)
     accounting_date = models.DateTimeField(default=timezone.now)
     total_tax_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -480,6 +663,12 @@ class InventoryReceivingVoucher(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['accounting_date', 'id'],
+                         name='receiving_date_idx'),
+        ]
+
 
 class StockExport(models.Model):
     inventory_delivery_voucher_code = models.CharField(max_length=100)
@@ -494,6 +683,12 @@ class StockExport(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['accounting_date', 'id'],
+                         name='stockexport_date_idx'),
+        ]
+
 
 class LossAdjustment(models.Model):
     type = models.CharField(max_length=50)
@@ -506,6 +701,12 @@ class LossAdjustment(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['time', 'id'],
+                         name='lossadjustment_time_idx'),
+        ]
+
 
 class OpeningStock(models.Model):
     commodity_code = models.CharField(max_length=100)
@@ -522,7 +723,9 @@ class OpeningStock(models.Model):
 # Transactions: Manufacturing
 
 
-class ManufacturingOrder(models.Model):
+class ManufacturingOrder(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('quantity', 'product_id')
+
     reference = models.CharField(max_length=100)
     product = models.ForeignKey(
         Item, on_delete=models.CASCADE, related_name='manufactured_product')
@@ -625,8 +828,16 @@ class Maintenance(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'id'],
+                         name='maintenance_start_idx'),
+        ]
+
+
+class Depreciation(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount',)
 
-class Depreciation(models.Model):
     serial_number = models.CharField(max_length=100)
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -637,6 +848,12 @@ class Depreciation(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='depreciation_date_idx'),
+        ]
+
 # Billitems
 
 
@@ -649,10 +866,14 @@ class BillItem(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True)
     amount = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
 
 
 # Bills (Vendor Bills, similar to PurchaseInvoice but separate per description)
-class Bill(models.Model):
+class Bill(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount', 'vendor_id', 'bill_date')
+
     BILL_TYPE_CHOICES = [
         ('withdrawal', 'Withdrawal'),
         ('deposit', 'Deposit'),
@@ -681,9 +902,20 @@ class Bill(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['bill_date', 'id'],
+                         name='bill_date_idx'),
+            # Open bills by due date
+            models.Index(fields=['status', 'due_date'],
+                         name='bill_status_due_idx'),
+        ]
+
 
 # Checks
-class Check(models.Model):
+class Check(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('amount', 'date')
+
     CHECK_TYPE_CHOICES = [
         ('withdrawal', 'Withdrawal'),
         ('deposit', 'Deposit'),
@@ -708,10 +940,20 @@ class Check(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
- # Journal Entry (General ledger entries, connecting to accounts)
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='check_date_idx'),
+            models.Index(fields=['status', 'date'],
+                         name='check_status_idx'),
+        ]
+
+# Journal Entry (General ledger entries, connecting to accounts)
 
 
-class JournalEntry(models.Model):
+class JournalEntry(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('date',)
+
     date = models.DateTimeField(default=timezone.now)
     description = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(
@@ -719,14 +961,24 @@ class JournalEntry(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='journalentry_date_idx'),
+        ]
+
+
+class JournalEntryLine(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('debit', 'credit')
 
-class JournalEntryLine(models.Model):
     journal_entry = models.ForeignKey(
         JournalEntry, on_delete=models.CASCADE, related_name='lines')
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     debit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     credit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     description = models.TextField(null=True, blank=True)
+    updated_at = models.DateTimeField(
+        default=timezone.now, null=True, blank=True)
 
 # Convert
 
@@ -744,3 +996,158 @@ class Convert(models.Model):
         default=timezone.now, null=True, blank=True)
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transfer_date', 'id'],
+                         name='convert_date_idx'),
+        ]
+
+# Ledger: one immutable row per debit/credit posted by accounting/signals.py
+
+
+class LedgerPosting(models.Model):
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name='postings')
+    date = models.DateTimeField(default=timezone.now)
+    debit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Signed change this posting made to Account.balance
+    balance_delta = models.DecimalField(max_digits=12, decimal_places=2)
+    # Source document, e.g. ('accounting.Bill', 42)
+    source_type = models.CharField(max_length=100)
+    source_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Covers balance_as_of(): SUM(balance_delta) for one account up to a date
+            models.Index(fields=['account', 'date', 'balance_delta'],
+                         name='ledger_account_date_idx'),
+            models.Index(fields=['date', 'account'],
+                         name='ledger_date_account_idx'),
+            models.Index(fields=['source_type', 'source_id'],
+                         name='ledger_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source_type} #{self.source_id} -> {self.account} ({self.balance_delta:+})"
+
+    def save(self, *args, **kwargs):
+        # Postings are append-only; corrections are new postings
+        if not self._state.adding:
+            raise ValueError("Ledger postings cannot be changed once written")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger postings cannot be deleted")
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Balance of an account at the end of a closed period, so historical
+    balances are snapshot + postings since instead of a full replay.
+    """
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name='balance_snapshots')
+    period_end = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Set when a backdated posting lands on or before period_end
+    is_dirty = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period_end'],
+                                    name='unique_account_period_end'),
+        ]
+        indexes = [
+            models.Index(fields=['period_end', 'is_dirty'],
+                         name='snapshot_period_dirty_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} @ {self.period_end}: {self.balance}"
+
+
+class Receivable(models.Model):
+    """
+    One row per sales invoice and sales payment of both the accounting app
+    (from Orders) and the sales app, in one schema, maintained by
+    accounting/receivables.py so receivables are read from a single table.
+    """
+    SOURCE_CHOICES = [
+        ('order', 'Order'),
+        ('sales', 'Sales'),
+    ]
+    KIND_CHOICES = [
+        ('invoice', 'Invoice'),
+        ('payment', 'Payment'),
+    ]
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Id of the invoice or payment in its own table
+    document_id = models.BigIntegerField()
+    # The invoice a payment settles (an invoice's own id for invoices)
+    invoice_document_id = models.BigIntegerField(null=True, blank=True)
+    customer = models.ForeignKey(
+        Party, on_delete=models.SET_NULL, null=True, blank=True, related_name='receivables')
+    date = models.DateTimeField()
+    # The invoice's date, copied onto its payments
+    invoice_date = models.DateTimeField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Invoices only: amount less the paid payments against it
+    open_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'kind', 'document_id'],
+                                    name='unique_receivable_document'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', 'kind', 'date'],
+                         name='receivable_customer_idx'),
+            models.Index(fields=['kind', 'date'],
+                         name='receivable_kind_date_idx'),
+            models.Index(fields=['source', 'invoice_document_id'],
+                         name='receivable_invoice_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.kind} #{self.document_id}: {self.amount}"
+
+
+class PartySummary(models.Model):
+    """
+    Lifetime totals of one party across the documents that name it,
+    maintained by accounting/summaries.py so party pages and lists read one
+    row instead of aggregating seven tables.
+    """
+    party = models.OneToOneField(
+        Party, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    # From the receivables table: both apps' sales invoices and payments
+    invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Order.total_amount of the party's orders (as customer)
+    ordered = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # sales.Sales.amount of the party's sales (as lead or customer)
+    sold = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Bill.amount, PurchaseOrder.total_including_tax and Expense.amount
+    # of the party's bills, purchase orders and expenses (as vendor)
+    billed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchased = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expensed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Date of the latest document seen; deletes do not move it back
+    last_activity = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'party summaries'
+
+    def __str__(self):
+        return f"Summary of {self.party_id}"
@@ -0,0 +1,122 @@
+"""
+Keyset pagination for the API.
+
+Every list endpoint pages with a cursor over a stable ordering that ends in
+the primary key, e.g. (-order_date, -id). The cursor holds the whole sort
+key of the last row served and the next page is read with
+
+    WHERE order_date <= :date AND (order_date < :date OR id < :id)
+    ORDER BY order_date DESC, id DESC LIMIT :size
+
+so a deep page is one index range read, the same cost as the first. (DRF's
+stock cursor only keys on the first column and falls back to OFFSET for
+rows sharing it; page-number pagination counts and skips every earlier row.)
+
+A view picks its ordering with ``cursor_ordering`` (default: newest id
+first); the columns before the id must be non-null and should be indexed.
+Small reference tables opt out with ``pagination_class = None`` and return
+all rows.
+
+Page sizes come from REST_FRAMEWORK['PAGE_SIZE'] and may be overridden per
+request with ``?page_size=``, up to API_MAX_PAGE_SIZE.
+"""
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+
+
+def keyset_filter(ordering, position, backwards=False):
+    """
+    Q for the rows strictly after ``position`` (one value per ordering
+    field) in ``ordering``, or strictly before it when ``backwards``.
+    """
+    fields = [field.lstrip('-') for field in ordering]
+    descending = [field.startswith('-') for field in ordering]
+
+    def op(i, inclusive=False):
+        lookup = 'lt' if descending[i] != backwards else 'gt'
+        return f"{fields[i]}__{lookup}{'e' if inclusive else ''}"
+
+    after = Q()
+    for i in range(len(fields)):
+        equal = {fields[j]: position[j] for j in range(i)}
+        after |= Q(**equal, **{op(i): position[i]})
+    # The leading range lets the database seek the index instead of
+    # evaluating the OR for every row
+    return Q(**{op(0, inclusive=True): position[0]}) & after
+
+
+class CursorPagination(pagination.CursorPagination):
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            # Ending in the primary key makes every sort key unique, so a
+            # cursor never needs an offset
+            ordering = (*ordering, '-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*pagination._reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            try:
+                key = json.loads(current_position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(key, list) or len(key) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(keyset_filter(self.ordering, key, reverse))
+
+        # One extra row tells whether there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = (self._get_position_from_instance(results[-1], self.ordering)
+                     if len(results) > len(self.page) else None)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following is not None
+            self.next_position = current_position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = current_position is not None
+            self.next_position = following
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
@@ -0,0 +1,367 @@
+"""
+Balance posting service.
+
+All balance changes made by the signals in accounting/signals.py go through
+this module. A posting is applied with a single UPDATE ... SET balance =
+balance + delta statement per account, so concurrent workers can never
+overwrite each other's postings the way a read-modify-write in Python does.
+
+Every posting is also written to the append-only LedgerPosting table with
+its source document, which is what balance_as_of() reads.
+
+Inside a deferred_posting() block the balance deltas are collected per
+account instead and applied with one UPDATE per touched account when the
+block commits, which keeps bulk imports from hammering hot accounts.
+"""
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import (
+    Account, BankTransaction, Bill, Check, Expense, JournalEntryLine,
+    LedgerPosting, SalesInvoice, SalesPayment
+)
+from .chart import apply_rollup_deltas
+from .snapshots import latest_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Holds the active PostingBatch of the current thread, if any
+_local = threading.local()
+
+# Sent with ``postings`` (the LedgerPosting rows just written) whenever
+# postings land, so caches and derived tables can follow the ledger
+postings_recorded = Signal()
+
+
+def balance_delta(account, amount_delta, is_debit=True):
+    """
+    Return the change to ``account.balance`` for a debit (or credit) of
+    ``amount_delta``.
+
+    Debits increase debit-normal accounts (asset/expense) and credits
+    increase credit-normal accounts (liability/revenue); any other
+    combination decreases the balance.
+    """
+    return signed_amount(account.account_type, amount_delta, is_debit)
+
+
+def signed_amount(account_type, amount_delta, is_debit=True):
+    """
+    balance_delta() for when only the account_type is at hand.
+    """
+    if is_debit:
+        increases = account_type == 'debit'
+    else:
+        increases = account_type == 'credit'
+    return amount_delta if increases else -amount_delta
+
+
+def apply_balance_delta(account_id, delta):
+    """
+    Add ``delta`` to the stored balance of an account in one statement.
+    """
+    return Account.objects.filter(pk=account_id).update(
+        balance=Coalesce(
+            F('balance'), Value(Decimal('0')), output_field=DecimalField()
+        ) + delta,
+        updated_at=timezone.now(),
+    )
+
+
+class PostingBatch:
+    """
+    Balance deltas and ledger rows collected by deferred_posting().
+    """
+
+    def __init__(self):
+        self.deltas = defaultdict(Decimal)
+        self.postings = []
+
+    def add(self, posting, apply=True):
+        if apply:
+            self.deltas[posting.account_id] += posting.balance_delta
+        self.postings.append(posting)
+
+    def roll_up(self, account_ids):
+        """
+        Add the summed deltas of ``account_ids`` to their groups.
+        """
+        groups = defaultdict(Decimal)
+        for account_id, group_id in Account.objects.filter(
+                pk__in=account_ids, parent_account__isnull=False,
+        ).values_list('pk', 'parent_account_id'):
+            groups[group_id] += self.deltas[account_id]
+        apply_rollup_deltas(groups)
+
+    def flush(self):
+        # Update accounts in id order so concurrent batches lock rows in
+        # the same order and cannot deadlock each other
+        touched = [pk for pk in sorted(self.deltas) if self.deltas[pk]]
+        for account_id in touched:
+            apply_balance_delta(account_id, self.deltas[account_id])
+        if touched:
+            self.roll_up(touched)
+        if self.postings:
+            LedgerPosting.objects.bulk_create(self.postings, batch_size=500)
+            postings_recorded.send(sender=LedgerPosting, postings=self.postings)
+        logger.debug(
+            f"Flushed {len(self.postings)} postings to {len(self.deltas)} accounts")
+        self.deltas.clear()
+        self.postings = []
+
+
+def current_batch():
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def deferred_posting():
+    """
+    Defer balance postings made inside the block.
+
+    Every document saved in the block still produces the same postings, but
+    they are summed per account and applied with one UPDATE per account
+    (plus one bulk insert of ledger rows) as the last step of the block's
+    transaction. Nested blocks join the outermost one.
+
+        with deferred_posting():
+            for row in rows:
+                Bill.objects.create(**row)
+    """
+    if current_batch() is not None:
+        yield current_batch()
+        return
+    batch = PostingBatch()
+    _local.batch = batch
+    try:
+        with transaction.atomic():
+            yield batch
+            _local.batch = None
+            batch.flush()
+    finally:
+        _local.batch = None
+
+
+def source_label(source):
+    """
+    Return the (source_type, source_id) pair recorded for a source document.
+    """
+    if source is None:
+        return '', None
+    return source._meta.label, source.pk
+
+
+def ledger_posting(account, amount_delta, delta, is_debit=True, source=None, date=None):
+    """
+    Build (without saving) the LedgerPosting row for one debit/credit.
+    """
+    source_type, source_id = source_label(source)
+    return LedgerPosting(
+        account_id=account.pk,
+        date=date or timezone.now(),
+        debit=amount_delta if is_debit else 0,
+        credit=0 if is_debit else amount_delta,
+        balance_delta=delta,
+        source_type=source_type,
+        source_id=source_id,
+    )
+
+
+def post_to_account(account, amount_delta, is_debit=True, source=None, date=None):
+    """
+    Debit (or credit) ``account`` by ``amount_delta`` and record the posting
+    in the ledger against ``source``, dated ``date`` (default: now).
+    """
+    if not account:
+        logger.error("No account provided for balance update")
+        return
+    delta = balance_delta(account, amount_delta, is_debit=is_debit)
+    if not delta:
+        return
+    logger.debug(
+        f"{'Debiting' if is_debit else 'Crediting'} {account.name} "
+        f"({account.account_type}-normal): {delta:+}")
+    posting = ledger_posting(account, amount_delta, delta, is_debit=is_debit,
+                             source=source, date=date)
+    batch = current_batch()
+    if batch is not None:
+        # The row only changes when the batch flushes: leave the instance
+        # as stored, or saving it in the block would write the delta too
+        batch.add(posting)
+        return
+    apply_balance_delta(account.pk, delta)
+    if account.parent_account_id:
+        apply_rollup_deltas({account.parent_account_id: delta})
+    posting.save()
+    postings_recorded.send(sender=LedgerPosting, postings=[posting])
+    # Keep the in-memory instance in line with the row we just updated, so
+    # saving it later does not look like a manual balance change
+    account.balance = (account.balance or 0) + delta
+    if 'balance' in getattr(account, '_loaded_values', {}):
+        account._loaded_values['balance'] = account.balance
+
+
+def post_summed(amounts, source=None):
+    """
+    Post pre-summed amounts, {(account_id, is_debit, date): amount}, as one
+    deferred batch: the accounts are read in one query and every account's
+    balance is updated once. Used when a set-based UPDATE changes many
+    documents at a time.
+    """
+    amounts = {key: amount for key, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    accounts = Account.objects.in_bulk({account_id for account_id, _, _ in amounts})
+    with deferred_posting():
+        for (account_id, is_debit, date), amount in amounts.items():
+            post_to_account(accounts.get(account_id), amount, is_debit=is_debit,
+                            source=source, date=date)
+
+
+def record_adjustment(account, delta, source=None, date=None):
+    """
+    Record a balance change that was already written to ``account`` (e.g. an
+    opening balance entered on the account itself) so the ledger stays
+    complete. ``delta`` is the change to ``account.balance``.
+    """
+    is_debit = account.account_type != 'credit'
+    # Post whichever side produces ``delta`` for this account type
+    amount = delta if balance_delta(account, delta, is_debit) == delta else -delta
+    posting = ledger_posting(account, amount, delta, is_debit=is_debit,
+                             source=source, date=date)
+    batch = current_batch()
+    if batch is not None:
+        batch.add(posting, apply=False)
+    else:
+        posting.save()
+        postings_recorded.send(sender=LedgerPosting, postings=[posting])
+
+
+def end_of_day(value):
+    """
+    Turn a date into the first instant of the following day, so a date
+    filter can compare the raw column (and use its index).
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    value = datetime.datetime.combine(
+        value + datetime.timedelta(days=1), datetime.time.min)
+    return timezone.make_aware(value)
+
+
+def balance_as_of(account, date):
+    """
+    Return the balance of ``account`` at ``date`` (a date or datetime).
+
+    The nearest closed-period snapshot before ``date`` is taken as the
+    starting point, so only the account's postings since then are summed;
+    the (account, date) index on LedgerPosting serves that range.
+    """
+    if isinstance(date, datetime.datetime):
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        until = {'date__lte': date}
+        # A snapshot covers whole days, so it must end before this one
+        snapshot_day = timezone.localdate(date) - datetime.timedelta(days=1)
+    else:
+        until = {'date__lt': end_of_day(date)}
+        snapshot_day = date
+    postings = LedgerPosting.objects.filter(account=account, **until)
+    balance = Decimal('0')
+    snapshot = latest_snapshot(account.pk, snapshot_day)
+    if snapshot is not None:
+        balance = snapshot.balance
+        postings = postings.filter(date__gte=end_of_day(snapshot.period_end))
+    total = postings.aggregate(balance=Sum('balance_delta'))['balance']
+    return balance + (total or 0)
+
+
+class PostingRule:
+    """
+    Set-based description of what one posting receiver in
+    accounting/signals.py does: every ``model`` row debits (or credits)
+    ``amount`` to the account at ``account``, dated by ``date``.
+
+    Rules with ``is_debit=None`` carry a ready-made balance delta instead.
+    """
+
+    def __init__(self, model, account, date, amount, is_debit=True, filters=None):
+        self.model = model
+        self.account = account
+        self.date = date
+        self.amount = amount
+        self.is_debit = is_debit
+        self.filters = filters or {}
+
+    def totals(self, first_id, last_id, until=None):
+        """
+        Return {account_id: summed amount} for accounts first_id..last_id in
+        one grouped aggregate.
+        """
+        rows = self.model.objects.filter(**self.filters, **{
+            f"{self.account}__gte": first_id,
+            f"{self.account}__lte": last_id,
+        })
+        if until is not None:
+            rows = rows.filter(**{f"{self.date}__lt": end_of_day(until)})
+        amount = ExpressionWrapper(self.amount, output_field=DecimalField())
+        return dict(rows.order_by().values_list(
+            self.account).annotate(total=Sum(amount)))
+
+
+# Mirrors the receivers in accounting/signals.py; keep the two in step
+POSTING_RULES = [
+    PostingRule(BankTransaction, 'account', 'date',
+                F('deposit') - F('withdrawal')),
+    PostingRule(SalesInvoice, 'debit_account', 'date', F('amount')),
+    PostingRule(SalesInvoice, 'credit_account', 'date', F('amount'),
+                is_debit=False),
+    PostingRule(SalesPayment, 'invoice__debit_account', 'date', -F('amount')),
+    PostingRule(Expense, 'payment_account', 'expense_date', F('amount')),
+    PostingRule(Bill, 'debit_account', 'bill_date', F('amount')),
+    PostingRule(Bill, 'credit_account', 'bill_date', F('amount'),
+                is_debit=False),
+    PostingRule(Check, 'bank_account', 'date', -F('amount')),
+    PostingRule(Check, 'pay_to', 'date', F('amount')),
+    PostingRule(JournalEntryLine, 'account', 'journal_entry__date',
+                F('debit') - F('credit')),
+    # Opening balances and manual corrections only exist in the ledger
+    PostingRule(LedgerPosting, 'account', 'date', F('balance_delta'),
+                is_debit=None, filters={'source_type': Account._meta.label}),
+]
+
+
+def source_balances(account_types, until=None):
+    """
+    Recompute balances from the source documents.
+
+    ``account_types`` maps account id -> account_type for the accounts to
+    compute (typically one chunk of ids). Each posting rule runs one grouped
+    aggregate over the id range. Returns {account_id: balance}, optionally
+    only counting documents dated up to ``until``.
+    """
+    balances = dict.fromkeys(account_types, Decimal('0'))
+    if not account_types:
+        return balances
+    first_id, last_id = min(account_types), max(account_types)
+    for rule in POSTING_RULES:
+        for account_id, total in rule.totals(first_id, last_id, until).items():
+            if account_id not in balances or not total:
+                continue
+            if rule.is_debit is None:
+                balances[account_id] += total
+            else:
+                balances[account_id] += signed_amount(
+                    account_types[account_id], total, is_debit=rule.is_debit)
+    cents = Decimal('0.01')
+    return {pk: balance.quantize(cents) for pk, balance in balances.items()}
@@ -0,0 +1,78 @@
+"""
+Posting profiles: the default accounts documents generated by the signals
+(e.g. the SalesInvoice created for a new Order) are posted to.
+
+Each document type maps its account fields to a role, and each role to an
+Account. Roles are configured by account number in settings:
+
+    ACCOUNTING_POSTING_ACCOUNTS = {
+        'receivable': '1200',
+        'revenue': '4000',
+    }
+
+A role that is not configured (or whose number does not exist) falls back
+to the lowest-id account of the role's account_type. The resolved accounts
+are cached and dropped whenever an Account is saved or deleted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Account
+
+PROFILES_KEY = 'posting:profiles'
+
+# role -> account_type of the fallback account
+ROLES = {
+    'receivable': 'debit',
+    'cash': 'debit',
+    'revenue': 'credit',
+    'payable': 'credit',
+}
+
+# document type -> {account field: role}
+PROFILES = {
+    'sales_invoice': {'debit_account': 'receivable', 'credit_account': 'revenue'},
+}
+
+
+def resolve_roles():
+    """
+    Return {role: Account or None} for every role, in at most one query
+    per account_type plus one for the configured numbers.
+    """
+    configured = getattr(settings, 'ACCOUNTING_POSTING_ACCOUNTS', {})
+    numbers = {role: configured[role] for role in ROLES if configured.get(role)}
+    by_number = {}
+    if numbers:
+        for account in Account.objects.filter(
+                number__in=numbers.values()).order_by('-pk'):
+            # Ascending pk wins when numbers are duplicated
+            by_number[account.number] = account
+
+    fallbacks = {}
+    accounts = {}
+    for role, account_type in ROLES.items():
+        account = by_number.get(numbers.get(role))
+        if account is None:
+            if account_type not in fallbacks:
+                fallbacks[account_type] = Account.objects.filter(
+                    account_type=account_type).order_by('pk').first()
+            account = fallbacks[account_type]
+        accounts[role] = account
+    return accounts
+
+
+def posting_accounts(document_type):
+    """
+    Return {account field: Account} for ``document_type`` (a key of
+    PROFILES), resolved once and then served from the cache.
+    """
+    roles = cache.get(PROFILES_KEY)
+    if roles is None:
+        roles = resolve_roles()
+        cache.set(PROFILES_KEY, roles, None)
+    return {field: roles[role] for field, role in PROFILES[document_type].items()}
+
+
+def invalidate_profiles():
+    cache.delete(PROFILES_KEY)
@@ -0,0 +1,109 @@
+"""
+Queryset optimization derived from the read serializers.
+
+The read serializers nest related objects (a payment embeds its invoice,
+the invoice its sales, the sales its items and schedule...). Rendering a
+list of them naively costs a query per row and per relation. The viewset
+mixin below walks the serializer's field tree instead and loads every
+relation it is going to render up front:
+
+- a nested serializer over a foreign key or one-to-one is joined in with
+  select_related(), recursively;
+- a to-many relation (reverse foreign key, many-to-many) is loaded with one
+  prefetch_related() query, whose queryset is optimized the same way for
+  the nested serializer.
+
+A plain primary key field needs nothing when the id is a column of the row
+itself. Fields whose source is not a model relation (methods, properties)
+are left alone.
+"""
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def relations(model):
+    """
+    Return {attribute name: relation field} for ``model``, keyed the way
+    serializers refer to them (reverse relations by their accessor).
+    """
+    fields = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            fields[field.get_accessor_name()] = field
+        else:
+            fields[field.name] = field
+    return fields
+
+
+def related_lookups(serializer, model, prefix=''):
+    """
+    Return (select_related paths, prefetch_related lookups) for rendering
+    instances of ``model`` with ``serializer``. ``prefix`` is the path from
+    the queryset's model down to ``model``.
+    """
+    select, prefetch = [], []
+    model_relations = relations(model)
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path, current, relation = prefix, model_relations, None
+        for depth, attr in enumerate(field.source_attrs):
+            relation = current.get(attr)
+            if relation is None:
+                break
+            path += attr
+            if depth < len(field.source_attrs) - 1:
+                # A dotted source: follow single relations on the way down
+                if relation.many_to_many or relation.one_to_many:
+                    relation = None
+                    break
+                select.append(path)
+                path += '__'
+                current = relations(relation.related_model)
+        if relation is None:
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.ModelSerializer):
+            nested = None
+        if relation.many_to_many or relation.one_to_many:
+            if nested is None:
+                prefetch.append(path)
+                continue
+            related_model = relation.related_model
+            queryset = optimize_queryset(
+                related_model._default_manager.all(), nested, related_model)
+            prefetch.append(Prefetch(path, queryset=queryset))
+        elif nested is not None:
+            select.append(path)
+            nested_select, nested_prefetch = related_lookups(
+                nested, relation.related_model, path + '__')
+            select += nested_select
+            prefetch += nested_prefetch
+        elif not relation.concrete:
+            # The id of a reverse one-to-one lives on the other table
+            select.append(path)
+    return select, prefetch
+
+
+def optimize_queryset(queryset, serializer, model=None):
+    select, prefetch = related_lookups(serializer, model or queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class OptimizedQuerysetMixin:
+    """
+    Load what the active serializer renders along with the rows, so the
+    number of queries of list and detail views does not grow with the
+    number of rows.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer())
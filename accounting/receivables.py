@@ -0,0 +1,171 @@
+"""
+The receivables table (accounting.Receivable).
+
+Invoices and payments to customers live in two pairs of tables:
+accounting.SalesInvoice/SalesPayment (raised from Orders) and
+sales.SalesInvoice/SalesPayment (raised from Sales). Receivable holds one
+row per document of all four in a common schema, so receivable queries and
+reports are one indexed query over one table:
+
+- ``open_amount`` of an invoice is its amount less the paid payments
+  against it;
+- payments carry their invoice's customer and date.
+
+Rows are written from the save and delete signals of the four models and
+from the bulk update paths that bypass them (see sync_order_documents in
+accounting/signals.py); ``manage.py rebuild_receivables`` refills the
+table from scratch.
+"""
+from decimal import Decimal
+
+from django.apps import apps
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Receivable
+
+# source -> (invoice model, payment model)
+SOURCES = {
+    'order': ('accounting.SalesInvoice', 'accounting.SalesPayment'),
+    'sales': ('sales.SalesInvoice', 'sales.SalesPayment'),
+}
+
+# model label -> (source, kind)
+DOCUMENTS = {
+    label: (source, kind)
+    for source, labels in SOURCES.items()
+    for kind, label in zip(('invoice', 'payment'), labels)
+}
+
+# Payments with these statuses reduce the open amount
+PAID_STATUSES = ('paid',)
+
+UPDATE_FIELDS = ['invoice_document_id', 'customer', 'date', 'invoice_date',
+                 'amount', 'status', 'updated_at']
+
+
+def sync(source, invoices=None, payments=None):
+    """
+    Write the rows of the ``invoices`` and ``payments`` querysets (of the
+    ``source`` models) and refresh the open amounts they affect; return the
+    ids of the customers whose rows changed, before and after.
+    """
+    now = timezone.now()
+    rows, touched, customers = [], set(), set()
+    if invoices is not None:
+        invoice_rows = list(invoices.values_list('pk', 'customer', 'date', 'amount', 'status'))
+        # An invoice moved to another customer changes the one it left
+        customers.update(Receivable.objects.filter(
+            source=source, kind='invoice',
+            document_id__in=[row[0] for row in invoice_rows],
+        ).values_list('customer', flat=True))
+        for pk, customer, date, amount, status in invoice_rows:
+            rows.append(Receivable(
+                source=source, kind='invoice', document_id=pk, invoice_document_id=pk,
+                customer_id=customer, date=date, invoice_date=date, amount=amount,
+                status=status, updated_at=now))
+    if payments is not None:
+        payment_rows = list(payments.values_list(
+            'pk', 'invoice', 'invoice__customer', 'invoice__date', 'date', 'amount', 'status'))
+        # A payment moved to another invoice reopens the one it left
+        for invoice, customer in Receivable.objects.filter(
+                source=source, kind='payment',
+                document_id__in=[row[0] for row in payment_rows],
+        ).values_list('invoice_document_id', 'customer'):
+            touched.add(invoice)
+            customers.add(customer)
+        for pk, invoice, customer, invoice_date, date, amount, status in payment_rows:
+            rows.append(Receivable(
+                source=source, kind='payment', document_id=pk, invoice_document_id=invoice,
+                customer_id=customer, date=date, invoice_date=invoice_date, amount=amount,
+                status=status, updated_at=now))
+    if not rows:
+        return set()
+    Receivable.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['source', 'kind', 'document_id'], update_fields=UPDATE_FIELDS)
+
+    invoice_ids = {row.document_id for row in rows if row.kind == 'invoice'}
+    if invoice_ids:
+        copy_invoice_fields(source, invoice_ids)
+    touched.update(row.invoice_document_id for row in rows)
+    touched.discard(None)
+    refresh_open_amounts(source, touched)
+    customers.update(row.customer_id for row in rows)
+    customers.discard(None)
+    return customers
+
+
+def copy_invoice_fields(source, invoice_ids):
+    """Copy the customer and date of the given invoices onto their payments."""
+    invoice = Receivable.objects.filter(
+        source=source, kind='invoice', document_id=OuterRef('invoice_document_id'))
+    Receivable.objects.filter(
+        source=source, kind='payment', invoice_document_id__in=invoice_ids,
+    ).update(customer=Subquery(invoice.values('customer')[:1]),
+             invoice_date=Subquery(invoice.values('date')[:1]))
+
+
+def refresh_open_amounts(source, invoice_ids):
+    if not invoice_ids:
+        return
+    paid = Receivable.objects.filter(
+        source=source, kind='payment', invoice_document_id=OuterRef('document_id'),
+        status__in=PAID_STATUSES,
+    ).order_by().values('invoice_document_id').annotate(total=Sum('amount')).values('total')
+    Receivable.objects.filter(
+        source=source, kind='invoice', document_id__in=invoice_ids,
+    ).update(open_amount=F('amount') - Coalesce(
+        Subquery(paid), Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2)),
+        updated_at=timezone.now())
+
+
+def sync_document(instance):
+    """
+    Write the row of one saved invoice or payment; return the ids of the
+    customers whose rows changed.
+    """
+    source, kind = DOCUMENTS[instance._meta.label]
+    queryset = type(instance)._default_manager.filter(pk=instance.pk)
+    return sync(source, **{f"{kind}s": queryset})
+
+
+def remove_document(instance):
+    """
+    Drop the row of a deleted invoice or payment; return the ids of the
+    customers whose rows changed.
+    """
+    source, kind = DOCUMENTS[instance._meta.label]
+    row = Receivable.objects.filter(
+        source=source, kind=kind, document_id=instance.pk).first()
+    if row is None:
+        return set()
+    row.delete()
+    if kind == 'invoice':
+        # Its payments are kept with the invoice cleared (SET_NULL)
+        Receivable.objects.filter(
+            source=source, kind='payment', invoice_document_id=instance.pk,
+        ).update(invoice_document_id=None, invoice_date=None, customer=None,
+                 updated_at=timezone.now())
+    elif row.invoice_document_id is not None:
+        refresh_open_amounts(source, {row.invoice_document_id})
+    return {row.customer_id} - {None}
+
+
+def rebuild(chunk_size=2000):
+    """
+    Recreate every row from the source tables; return the number of rows.
+    """
+    Receivable.objects.all().delete()
+    total = 0
+    for source, labels in SOURCES.items():
+        invoice_model, payment_model = (apps.get_model(label) for label in labels)
+        for model, kind in ((invoice_model, 'invoices'), (payment_model, 'payments')):
+            ids = list(model._default_manager.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(ids), chunk_size):
+                chunk = model._default_manager.filter(pk__in=ids[start:start + chunk_size])
+                sync(source, **{kind: chunk})
+            total += len(ids)
+    return total
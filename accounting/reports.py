@@ -0,0 +1,302 @@
+"""
+Financial reports computed with grouped aggregates.
+
+Reports for closed dates (before today) are cached. Every posting that
+lands in a closed period, and every document moved to or from one by a
+change of date, bumps a generation counter for that month and each month
+after it, which retires the cached reports it affects. The counters are
+bumped again once the transaction commits, so a report computed by another
+worker from the data as it was before the commit is not kept. Adding,
+deleting or editing an account retires every cached report the same way
+(see invalidate_reports). They live in
+the shared cache (see CACHES in core/settings.py) so every worker sees them.
+
+The receivable and payable aging reports read documents rather than
+postings (sales-app invoices and purchase documents post nothing), so they
+are cached for any date under a counter of their own, bumped (again on
+commit) by every write to the documents they read (see invalidate_aging).
+"""
+import datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import Account
+from .posting import source_balances
+
+# How long a cached report for a closed date is kept (seconds)
+REPORT_CACHE_TIMEOUT = getattr(
+    settings, 'ACCOUNTING_REPORT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+# Bumped by every change to the accounts themselves, which every cached
+# report lists
+ACCOUNTS_KEY = 'reports:accounts'
+
+
+def period_key(day):
+    return f"reports:period:{day:%Y-%m}"
+
+
+def next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def bump_periods_from(day):
+    today = timezone.localdate()
+    day = day.replace(day=1)
+    while day <= today:
+        key = period_key(day)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+        day = next_month(day)
+
+
+def invalidate_reports_from(*dates):
+    """
+    Postings (or documents) dated ``dates`` have changed: retire every
+    cached report as of the earliest one's month or later, now and again
+    when the transaction commits.
+    """
+    days = [timezone.localdate(date) if isinstance(date, datetime.datetime) else date
+            for date in dates if date is not None]
+    if not days or min(days) >= timezone.localdate():
+        return  # Only closed dates are cached
+    day = min(days)
+    bump_periods_from(day)
+    transaction.on_commit(lambda: bump_periods_from(day))
+
+
+def bump_accounts():
+    try:
+        cache.incr(ACCOUNTS_KEY)
+    except ValueError:
+        cache.set(ACCOUNTS_KEY, 1, None)
+
+
+def invalidate_reports():
+    """
+    The chart of accounts has changed (an account added, deleted, renamed
+    or retyped): retire every cached report, now and again when the
+    transaction commits.
+    """
+    bump_accounts()
+    transaction.on_commit(bump_accounts)
+
+
+def cached_report(name, as_of, compute):
+    """
+    Return ``compute()``, cached per report ``name`` and ``as_of`` date
+    when the date is closed.
+    """
+    if as_of >= timezone.localdate():
+        return compute()
+    generation = f"{cache.get(ACCOUNTS_KEY, 0)}.{cache.get(period_key(as_of), 0)}"
+    key = f"reports:{name}:{as_of.isoformat()}:{generation}"
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, REPORT_CACHE_TIMEOUT)
+    return data
+
+
+def money(value):
+    return f"{value:.2f}"
+
+
+def compute_trial_balance(as_of):
+    """
+    Balance of every account as of the end of ``as_of``, split into debit
+    and credit columns by sign and account_type.
+    """
+    accounts = list(Account.objects.order_by('pk').values(
+        'id', 'number', 'name', 'account_type'))
+    balances = source_balances(
+        {account['id']: account['account_type'] for account in accounts},
+        until=as_of)
+
+    rows = []
+    total_debit = total_credit = Decimal('0')
+    for account in accounts:
+        balance = balances[account['id']]
+        # A positive balance sits on the account's normal side
+        if account['account_type'] == 'credit':
+            debit, credit = max(-balance, 0), max(balance, 0)
+        else:
+            debit, credit = max(balance, 0), max(-balance, 0)
+        total_debit += debit
+        total_credit += credit
+        rows.append({
+            **account,
+            'balance': money(balance),
+            'debit': money(debit),
+            'credit': money(credit),
+        })
+    return {
+        'as_of': as_of.isoformat(),
+        'accounts': rows,
+        'total_debit': money(total_debit),
+        'total_credit': money(total_credit),
+    }
+
+
+def trial_balance(as_of):
+    return cached_report('trial-balance', as_of,
+                         lambda: compute_trial_balance(as_of))
+
+
+# Aging
+
+AGING_KEY = 'reports:aging'
+
+# Age in days (from the invoice date, or the due date for bills) up to
+# which an open amount falls in each bucket; the last one is open-ended
+AGING_BUCKETS = (('current', 30), ('days_30', 60), ('days_60', 90), ('days_90_plus', None))
+
+# Statuses of documents that are not owed at all
+CLOSED_STATUSES = ('void', 'cancelled')
+
+
+def bump_aging():
+    try:
+        cache.incr(AGING_KEY)
+    except ValueError:
+        cache.set(AGING_KEY, 1, None)
+
+
+def invalidate_aging():
+    """
+    Retire the cached aging reports, now and again when the transaction
+    commits.
+    """
+    bump_aging()
+    transaction.on_commit(bump_aging)
+
+
+def start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def paid_total(payments, link, outer, end):
+    """
+    Subquery summing the paid ``payments`` dated before ``end`` whose
+    ``link`` is the outer row's ``outer``.
+    """
+    return Coalesce(
+        Subquery(payments.filter(
+            **{link: OuterRef(outer)}, status='paid', date__lt=end,
+        ).order_by().values(link).annotate(total=Sum('amount')).values('total')),
+        Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def aging_rows(queryset, party, amount, paid, age_field, as_of):
+    """
+    Open amount per party of the documents in ``queryset``, split into the
+    aging buckets, with one grouped query.
+    """
+    end = start_of(as_of + datetime.timedelta(days=1))
+    buckets, newer = {}, None
+    for name, days in AGING_BUCKETS:
+        older = start_of(as_of - datetime.timedelta(days=days)) if days else None
+        condition = Q()
+        if older is not None:
+            condition &= Q(**{f"{age_field}__gte": older})
+        if newer is not None:
+            condition &= Q(**{f"{age_field}__lt": newer})
+        buckets[name] = Sum('outstanding', filter=condition)
+        newer = older
+    return (queryset.filter(**{f"{party}__isnull": False})
+            .annotate(outstanding=F(amount) - paid)
+            .filter(outstanding__gt=0)
+            .values(party_id=F(party), party_name=F(f"{party}__name"))
+            .annotate(**buckets)
+            .order_by())
+
+
+def receivable_rows(as_of):
+    # Both invoice tables, through the receivables table
+    end = start_of(as_of + datetime.timedelta(days=1))
+    Receivable = apps.get_model('accounting.Receivable')
+    invoices = Receivable.objects.filter(kind='invoice', date__lt=end).exclude(
+        status__in=CLOSED_STATUSES)
+    payments = Receivable.objects.filter(kind='payment', source=OuterRef('source'))
+    paid = paid_total(payments, 'invoice_document_id', 'document_id', end)
+    return aging_rows(invoices, 'customer', 'amount', paid, 'date', as_of)
+
+
+def payable_rows(as_of):
+    end = start_of(as_of + datetime.timedelta(days=1))
+    PurchaseInvoice = apps.get_model('accounting.PurchaseInvoice')
+    PurchasePayment = apps.get_model('accounting.PurchasePayment')
+    Bill = apps.get_model('accounting.Bill')
+    # Purchase payments settle the order an invoice was raised for; an
+    # order's payments go to its invoices oldest first, so each invoice is
+    # paid by what is left after the invoices before it
+    invoices = PurchaseInvoice.objects.filter(invoice_date__lt=end)
+    order_paid = paid_total(PurchasePayment.objects.all(), 'purchase_order', 'purchase_order', end)
+    earlier = Coalesce(
+        Subquery(invoices.filter(
+            Q(invoice_date__lt=OuterRef('invoice_date'))
+            | Q(invoice_date=OuterRef('invoice_date'), pk__lt=OuterRef('pk')),
+            purchase_order=OuterRef('purchase_order'),
+        ).order_by().values('purchase_order').annotate(
+            total=Sum('invoice_amount')).values('total')),
+        Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+    paid = Least(F('invoice_amount'), Greatest(order_paid - earlier, Value(Decimal('0'))),
+                 output_field=DecimalField(max_digits=12, decimal_places=2))
+    yield from aging_rows(invoices, 'vendor', 'invoice_amount', paid, 'invoice_date', as_of)
+    # Bills carry no payments: an unpaid bill is owed in full from its due date
+    bills = Bill.objects.filter(bill_date__lt=end).exclude(
+        status__in=('paid', *CLOSED_STATUSES))
+    yield from aging_rows(bills, 'vendor', 'amount', Value(Decimal('0')), 'due_date', as_of)
+
+
+def compute_aging(rows, as_of):
+    names = [name for name, _ in AGING_BUCKETS]
+    parties = {}
+    for row in rows:
+        party = parties.setdefault(row['party_id'], {
+            'party': row['party_id'], 'name': row['party_name'],
+            **{name: Decimal('0') for name in names}})
+        for name in names:
+            party[name] += row[name] or 0
+    totals = {name: Decimal('0') for name in names}
+    result = []
+    for party in sorted(parties.values(), key=lambda party: (party['name'], party['party'])):
+        party['total'] = sum(party[name] for name in names)
+        for name in names:
+            totals[name] += party[name]
+        result.append({key: money(value) if isinstance(value, Decimal) else value
+                       for key, value in party.items()})
+    return {
+        'as_of': as_of.isoformat(),
+        'parties': result,
+        'totals': {**{name: money(totals[name]) for name in names},
+                   'total': money(sum(totals.values()))},
+    }
+
+
+def cached_aging(name, as_of, rows):
+    generation = cache.get(AGING_KEY, 0)
+    key = f"reports:{name}:{as_of.isoformat()}:{generation}"
+    data = cache.get(key)
+    if data is None:
+        data = compute_aging(rows(as_of), as_of)
+        cache.set(key, data, REPORT_CACHE_TIMEOUT)
+    return data
+
+
+def receivables_aging(as_of):
+    return cached_aging('ar-aging', as_of, receivable_rows)
+
+
+def payables_aging(as_of):
+    return cached_aging('ap-aging', as_of, payable_rows)
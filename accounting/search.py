@@ -0,0 +1,230 @@
+"""
+Full-text search over parties, items, bills, checks and bank transactions.
+
+Every searchable row has one document in a ``search_index`` table: its
+kind, id, a title (the first of its text fields) and a body (the others).
+The table is created after migrate (see create_search_index in
+accounting/signals.py) and kept current by the save and delete signals of
+the indexed models; ``manage.py rebuild_search_index`` refills it, e.g.
+after bulk writes that send no signals.
+
+Two backends share that layout:
+
+- SQLite: an FTS5 virtual table ranked with bm25(). Each document's rowid
+  is derived from its kind and id, so re-indexing a row is one INSERT OR
+  REPLACE by rowid rather than a scan of the index.
+- PostgreSQL: a plain table with a generated, GIN-indexed tsvector ranked
+  with ts_rank().
+
+The backend follows the database vendor unless SEARCH_BACKEND names one
+('sqlite', 'postgres') or is None to turn search off.
+
+Queries are reduced to words, so user input never reaches the match syntax;
+every word must match and the last one matches as a prefix, which keeps
+the endpoint usable while typing.
+"""
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+
+# kind -> (model label, text fields); the first field is the title. The
+# position of a kind is part of its rowids, so new kinds go at the end.
+SOURCES = {
+    'party': ('accounting.Party', ('name', 'email', 'phone')),
+    'item': ('accounting.Item', ('name', 'sku', 'description')),
+    'sales_item': ('sales.Item', ('name', 'description', 'long_description')),
+    'bill': ('accounting.Bill', ('reference', 'memo')),
+    'check': ('accounting.Check', ('memo',)),
+    'bank_transaction': ('accounting.BankTransaction', ('description',)),
+}
+
+KINDS = {label: kind for kind, (label, _) in SOURCES.items()}
+
+TABLE = 'search_index'
+
+
+def document_id(kind, pk):
+    return pk * len(SOURCES) + list(SOURCES).index(kind)
+
+
+def document(kind, instance):
+    """Return (title, body) of ``instance`` indexed as ``kind``."""
+    values = [str(getattr(instance, name) or '') for name in SOURCES[kind][1]]
+    return values[0], '\n'.join(value for value in values[1:] if value)
+
+
+def words(query):
+    """
+    Split ``query`` into words, each a list of tokens ('a.b@c.com' is one
+    word of three tokens, matched as a phrase).
+    """
+    return [tokens for tokens in (re.findall(r'\w+', part) for part in query.split())
+            if tokens]
+
+
+class SQLiteBackend:
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+
+    def remove(self, cursor, kind, pk):
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [document_id(kind, pk)])
+
+    def add(self, cursor, kind, pk, title, body):
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABLE} (rowid, kind, object_id, title, body) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [document_id(kind, pk), kind, pk, title, body])
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+    def match(self, query):
+        phrases = ['"' + ' '.join(tokens) + '"' for tokens in words(query)]
+        if phrases:
+            phrases[-1] += '*'
+        return ' '.join(phrases)
+
+    def search(self, cursor, query, kinds, limit, offset):
+        params = [self.match(query)]
+        where = ''
+        if kinds:
+            where = f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+            params += kinds
+        # Title matches weigh twice as much as body matches
+        cursor.execute(
+            f"SELECT kind, object_id, title, "
+            f"snippet({TABLE}, 3, '[', ']', '...', 12), "
+            f"bm25({TABLE}, 0, 0, 2.0, 1.0) AS score "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s{where} "
+            "ORDER BY score, rowid LIMIT %s OFFSET %s",
+            params + [limit, offset])
+        # bm25() is lower for better matches; report higher-is-better
+        return [(kind, pk, title, snippet, -score)
+                for kind, pk, title, snippet, score in cursor.fetchall()]
+
+
+class PostgresBackend:
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            "id bigint PRIMARY KEY, kind varchar(32) NOT NULL, "
+            "object_id bigint NOT NULL, title text NOT NULL, body text NOT NULL, "
+            "document tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', title), 'A') || "
+            "setweight(to_tsvector('simple', body), 'B')) STORED)")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx "
+            f"ON {TABLE} USING GIN (document)")
+
+    def remove(self, cursor, kind, pk):
+        cursor.execute(f"DELETE FROM {TABLE} WHERE id = %s", [document_id(kind, pk)])
+
+    def add(self, cursor, kind, pk, title, body):
+        cursor.execute(
+            f"INSERT INTO {TABLE} (id, kind, object_id, title, body) "
+            "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (id) DO UPDATE "
+            "SET title = EXCLUDED.title, body = EXCLUDED.body",
+            [document_id(kind, pk), kind, pk, title, body])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {TABLE}")
+
+    def match(self, query):
+        phrases = [' <-> '.join(tokens) for tokens in words(query)]
+        if phrases:
+            phrases[-1] += ':*'
+        return ' & '.join(f"({phrase})" for phrase in phrases)
+
+    def search(self, cursor, query, kinds, limit, offset):
+        params = [self.match(query)]
+        where = ''
+        if kinds:
+            where = " AND kind = ANY(%s)"
+            params.append(list(kinds))
+        cursor.execute(
+            f"SELECT kind, object_id, title, "
+            "ts_headline('simple', body, q, 'StartSel=[, StopSel=], MaxWords=12'), "
+            "ts_rank(document, q) AS rank "
+            f"FROM {TABLE}, to_tsquery('simple', %s) q "
+            f"WHERE document @@ q{where} "
+            "ORDER BY rank DESC, id LIMIT %s OFFSET %s",
+            params + [limit, offset])
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgres': PostgresBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(conn=connection):
+    """Return the configured search backend, or None when search is off."""
+    name = getattr(settings, 'SEARCH_BACKEND', conn.vendor)
+    backend = BACKENDS.get(name)
+    return backend() if backend else None
+
+
+def create_index(conn=connection):
+    backend = get_backend(conn)
+    if backend is not None:
+        with conn.cursor() as cursor:
+            backend.create(cursor)
+
+
+def index(instance):
+    """Add or refresh the document of ``instance``."""
+    backend = get_backend()
+    if backend is None:
+        return
+    kind = KINDS[instance._meta.label]
+    with connection.cursor() as cursor:
+        backend.add(cursor, kind, instance.pk, *document(kind, instance))
+
+
+def unindex(instance):
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.remove(cursor, KINDS[instance._meta.label], instance.pk)
+
+
+def rebuild(chunk_size=2000):
+    """
+    Refill the index from every source table; return the number of
+    documents indexed.
+    """
+    backend = get_backend()
+    if backend is None:
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        backend.create(cursor)
+        backend.clear(cursor)
+        for kind, (label, fields) in SOURCES.items():
+            model = apps.get_model(label)
+            for instance in model._default_manager.only('pk', *fields).iterator(chunk_size):
+                backend.add(cursor, kind, instance.pk, *document(kind, instance))
+                total += 1
+    return total
+
+
+def search(query, kinds=None, limit=50, offset=0):
+    """
+    Return the best matches of ``query`` as dicts of kind, id, title,
+    snippet and rank, best first.
+    """
+    backend = get_backend()
+    if backend is None or not words(query):
+        return []
+    with connection.cursor() as cursor:
+        rows = backend.search(cursor, query, list(kinds or ()), limit, offset)
+    return [{'kind': kind, 'id': int(pk), 'title': title, 'snippet': snippet, 'rank': rank}
+            for kind, pk, title, snippet, rank in rows]
@@ -9,18 +9,193 @@ from .models import (
     PurchaseInvoice, PurchasePayment, PurchaseOrderReturn, PurchaseRefund,
     InventoryReceivingVoucher, StockExport, LossAdjustment, OpeningStock,
     ManufacturingOrder, Asset, License, Component, Consumable, Maintenance,
-    Depreciation, Bill, BillItem, Check, JournalEntry, JournalEntryLine, Convert, Order, OrderItem
+    Depreciation, Bill, BillItem, Check, JournalEntry, JournalEntryLine, Convert, Order, OrderItem,
+    Receivable, PartySummary
 )
 from django.utils import timezone
+from .totals import deferred_totals
 
 
-class AccountNameSerializer(serializers.ModelSerializer):
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that, inside a BulkLineListSerializer, looks the
+    object up in the rows its list serializer already fetched.
+    """
+    resolved = None
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            obj = self.resolved.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class BulkLineListSerializer(serializers.ListSerializer):
+    """
+    List serializer for nested lines: resolves every BulkPrimaryKeyRelatedField
+    of the lines with one in_bulk() query instead of one query per line.
+    """
+
+    def to_internal_value(self, data):
+        fields = {
+            name: field for name, field in self.child.fields.items()
+            if isinstance(field, BulkPrimaryKeyRelatedField)
+        }
+        if isinstance(data, list):
+            for name, field in fields.items():
+                pks = set()
+                for row in data:
+                    value = row.get(name) if isinstance(row, dict) else None
+                    # Lines may send the related object as {'id': ...}
+                    if isinstance(value, dict):
+                        value = value.get('id')
+                    if isinstance(value, (int, str)) and not isinstance(value, bool):
+                        try:
+                            pks.add(int(value))
+                        except ValueError:
+                            pass
+                field.resolved = field.get_queryset().in_bulk(pks)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields.values():
+                field.resolved = None
+
+
+def line_fields(row):
+    """
+    Validated line data without the ``id`` used to match existing lines.
+    """
+    return {name: value for name, value in row.items() if name != 'id'}
+
+
+def sync_lines(queryset, rows, build, fields, field='items'):
+    """
+    Make the children in ``queryset`` match the validated ``rows``.
+
+    A row carrying the ``id`` of an existing child updates it (only if one
+    of ``fields`` changed), rows without an id are inserted and children
+    left out are deleted; each kind of change is one bulk statement.
+    ``build(values)`` returns an unsaved child for a row's values; an id
+    that is not one of the children is reported under ``field``, the name
+    the rows were sent as. Returns the built children, with their primary
+    keys.
+    """
+    existing = queryset.in_bulk()
+    model = queryset.model
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    children, created, changed = [], [], []
+    for row in rows:
+        child = build(line_fields(row))
+        pk = row.get('id')
+        if pk is None:
+            created.append(child)
+        elif pk not in existing:
+            raise serializers.ValidationError(
+                {field: [f"Line {pk} does not belong to this document."]})
+        else:
+            current = existing.pop(pk)
+            child.pk = pk
+            if any(getattr(current, name) != getattr(child, name) for name in attnames):
+                changed.append(child)
+        children.append(child)
+
+    if existing:
+        queryset.filter(pk__in=list(existing)).delete()
+    if changed:
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            # Built children carry a fresh updated_at default
+            fields = [*fields, 'updated_at']
+        model.objects.bulk_update(changed, fields, batch_size=500)
+    if created:
+        model.objects.bulk_create(created, batch_size=500)
+    return children
+
+
+def field_tree(value):
+    """
+    Parse 'id,invoice.sales.id' into {'id': {}, 'invoice': {'sales': {'id': {}}}}.
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    Read serializer mixin for the ``fields`` and ``expand`` query parameters
+    of GET requests, both comma separated with dotted paths into nested
+    serializers:
+
+    - ``?fields=id,amount,invoice.sales`` renders only those fields (a
+      nested serializer named without a sub-path renders in full);
+    - ``?expand=invoice,invoice.sales`` renders only those relations as
+      nested objects and every other one as its primary key.
+
+    Without the parameters the output is unchanged. Nested serializers get
+    their part of the spec from their parent, so only the serializers that
+    use the mixin are trimmed.
+    """
+
+    def sparse_spec(self):
+        """
+        Return (fields tree or None, expand tree or None) for this level.
+        """
+        if hasattr(self, '_sparse'):
+            return self._sparse
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        if parent is not None or request is None or request.method not in ('GET', 'HEAD'):
+            return None, None
+        params = request.query_params
+        only = field_tree(params['fields']) if 'fields' in params else None
+        expand = field_tree(params['expand']) if 'expand' in params else None
+        return only, expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.sparse_spec()
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        for name, field in fields.items():
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            if expand is not None and name not in expand:
+                kwargs = {'many': True} if many else {'allow_null': True}
+                if field.source not in (None, name):
+                    kwargs['source'] = field.source
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **kwargs)
+                continue
+            nested._sparse = (
+                (only or {}).get(name) or None,
+                expand.get(name) if expand is not None else None,
+            )
+        return fields
+
+
+class AccountNameSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = AccountName
-        fields = ['id', 'name', 'balance']
+        fields = ['id', 'name', 'parent', 'balance']
+        # Rolled up from the accounts below the group
+        read_only_fields = ['balance']
 
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     parent_account = serializers.PrimaryKeyRelatedField(
         queryset=AccountName.objects.all(),
         required=False,
@@ -49,15 +224,26 @@ class AccountSerializer(serializers.ModelSerializer):
 # Party Serializer
 
 
-class PartySerializer(serializers.ModelSerializer):
+class PartySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Party
         fields = '__all__'
 
+
+class PartySummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = PartySummary
+        exclude = ('party',)
+
+
+class PartyWithSummarySerializer(PartySerializer):
+    """A party with its lifetime totals (null until it has a summary)."""
+    summary = PartySummarySerializer(read_only=True)
+
 # BankTransaction Serializer
 
 
-class BankTransactionSerializer(serializers.ModelSerializer):
+class BankTransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     payee = PartySerializer()
     account = AccountSerializer()
 
@@ -68,7 +254,7 @@ class BankTransactionSerializer(serializers.ModelSerializer):
 # Item Serializer
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Item
         fields = '__all__'
@@ -76,13 +262,13 @@ class ItemSerializer(serializers.ModelSerializer):
 # SalesPayment Serializer
 
 
-class SalesPaymentSerializer(serializers.ModelSerializer):
+class SalesPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SalesPayment
         fields = '__all__'
 
 
-class OrderItemReadSerializer(serializers.ModelSerializer):
+class OrderItemReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
 
     class Meta:
@@ -90,7 +276,7 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
         fields = ['id', 'item', 'quantity', 'unit_price', 'subtotal']
 
 
-class OrderReadSerializer(serializers.ModelSerializer):
+class OrderReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     customer = PartySerializer(read_only=True)
     items = OrderItemReadSerializer(many=True, read_only=True)
 
@@ -101,12 +287,25 @@ class OrderReadSerializer(serializers.ModelSerializer):
 
 
 class OrderItemWriteSerializer(serializers.ModelSerializer):
-    item_id = serializers.PrimaryKeyRelatedField(
+    # Matches an existing line when the order is updated
+    id = serializers.IntegerField(required=False)
+    item_id = BulkPrimaryKeyRelatedField(
         queryset=Item.objects.all(), source='item')
 
     class Meta:
         model = OrderItem
-        fields = ['item_id', 'quantity', 'unit_price']
+        fields = ['id', 'item_id', 'quantity', 'unit_price']
+        list_serializer_class = BulkLineListSerializer
+
+
+def lines_total(items_data):
+    """
+    Total of validated order lines, as Order.calculate_total() would sum it.
+    """
+    return sum(
+        (item_data.get('quantity') or 0) * (item_data.get('unit_price') or 0)
+        for item_data in items_data
+    )
 
 
 class OrderWriteSerializer(serializers.ModelSerializer):
@@ -118,11 +317,13 @@ class OrderWriteSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
-        # Optional: calculate total
-        order.calculate_total()
+        # Saved as sent first, so the order's invoice signals see what they
+        # always have; the lines go in bulk and the total is set once
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, **line_fields(item_data)) for item_data in items_data])
+            order.calculate_total()
         return order
 
     def update(self, instance, validated_data):
@@ -131,21 +332,24 @@ class OrderWriteSerializer(serializers.ModelSerializer):
         instance.payment_mode = validated_data.get(
             'payment_mode', instance.payment_mode)
         instance.customer = validated_data.get('customer', instance.customer)
-        instance.save()
-
-        if items_data is not None:
-            # Remove existing items and add new
-            instance.items.all().delete()
-            for item_data in items_data:
-                OrderItem.objects.create(order=instance, **item_data)
 
-        instance.calculate_total()
+        # Line deletes recompute the total once, at the end of the block
+        with deferred_totals():
+            if items_data is not None:
+                instance.total_amount = lines_total(items_data)
+            instance.save()
+
+            if items_data is not None:
+                # Only the lines that changed are written
+                sync_lines(instance.items.all(), items_data,
+                           lambda values: OrderItem(order=instance, **values),
+                           fields=['item', 'quantity', 'unit_price'])
         return instance
 
 # SalesInvoice Serializer (with nested items for display)
 
 
-class SalesInvoiceRead(serializers.ModelSerializer):
+class SalesInvoiceRead(SparseFieldsMixin, serializers.ModelSerializer):
     order = OrderReadSerializer(read_only=True)
 
     class Meta:
@@ -168,7 +372,7 @@ class SalesOrderReturnCreateUpdateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class SalesOrderReturnSerializer(serializers.ModelSerializer):
+class SalesOrderReturnSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     order = OrderReadSerializer(read_only=True)
 
     class Meta:
@@ -177,7 +381,7 @@ class SalesOrderReturnSerializer(serializers.ModelSerializer):
 # SalesRefund Serializer
 
 
-class SalesRefundSerializer(serializers.ModelSerializer):
+class SalesRefundSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SalesRefund
         fields = '__all__'
@@ -185,7 +389,7 @@ class SalesRefundSerializer(serializers.ModelSerializer):
 # Expense Serializer
 
 
-class ExpenseReadSerializer(serializers.ModelSerializer):
+class ExpenseReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vendor = PartySerializer(read_only=True)
     customer = PartySerializer(read_only=True)
 
@@ -202,7 +406,7 @@ class ExpenseWriteSerializer(serializers.ModelSerializer):
 # Payslip Serializer
 
 
-class PayslipSerializer(serializers.ModelSerializer):
+class PayslipSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payslip
         fields = '__all__'
@@ -210,7 +414,7 @@ class PayslipSerializer(serializers.ModelSerializer):
 
 # PurchaseOrder Serializers
 
-class PurchaseOrderItemReadSerializer(serializers.ModelSerializer):
+class PurchaseOrderItemReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
 
     class Meta:
@@ -223,7 +427,7 @@ class PurchaseOrderItemReadSerializer(serializers.ModelSerializer):
         return data
 
 
-class PurchaseOrderReadSerializer(serializers.ModelSerializer):
+class PurchaseOrderReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vendor = PartySerializer(read_only=True)
     items = PurchaseOrderItemReadSerializer(many=True, read_only=True)
 
@@ -237,12 +441,15 @@ class PurchaseOrderReadSerializer(serializers.ModelSerializer):
 
 
 class PurchaseOrderItemWriteSerializer(serializers.ModelSerializer):
-    item_id = serializers.PrimaryKeyRelatedField(
+    # Matches an existing line when the purchase order is updated
+    id = serializers.IntegerField(required=False)
+    item_id = BulkPrimaryKeyRelatedField(
         queryset=Item.objects.all(), source='item')
 
     class Meta:
         model = PurchaseOrderItem
-        fields = ['item_id', 'quantity', 'unit_price']
+        fields = ['id', 'item_id', 'quantity', 'unit_price']
+        list_serializer_class = BulkLineListSerializer
 
     def to_internal_value(self, data):
         # Handle case where item_id is sent as a dict with 'id' key
@@ -264,16 +471,23 @@ class PurchaseOrderWriteSerializer(serializers.ModelSerializer):
             'mapping_status': {'required': False},
         }
 
-    def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        purchase_order = PurchaseOrder.objects.create(**validated_data)
-
-        for item_data in items_data:
-            PurchaseOrderItem.objects.create(
-                purchase_order=purchase_order, **item_data)
+    def priced_lines(self, items_data):
+        # As PurchaseOrderItem.save() does, default the price from the item
+        return [
+            {**item_data, 'unit_price': item_data.get('unit_price') or item_data['item'].price}
+            for item_data in items_data
+        ]
 
-        # Calculate total
-        purchase_order.calculate_total()
+    def create(self, validated_data):
+        lines = self.priced_lines(validated_data.pop('items'))
+        # Saved as sent first, so the order's invoice signals see what they
+        # always have; the lines go in bulk and the totals are set once
+        with transaction.atomic():
+            purchase_order = PurchaseOrder.objects.create(**validated_data)
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(purchase_order=purchase_order, **line_fields(line))
+                for line in lines])
+            purchase_order.calculate_total()
         return purchase_order
 
     def update(self, instance, validated_data):
@@ -297,21 +511,25 @@ class PurchaseOrderWriteSerializer(serializers.ModelSerializer):
         instance.mapping_status = validated_data.get(
             'mapping_status', instance.mapping_status)
         instance.updated_at = timezone.now()
-        instance.save()
 
-        if items_data is not None:
-            # Remove existing items and add new ones
-            instance.items.all().delete()
-            for item_data in items_data:
-                PurchaseOrderItem.objects.create(
-                    purchase_order=instance, **item_data)
+        # Line deletes recompute the totals once, at the end of the block
+        with deferred_totals():
+            if items_data is not None:
+                lines = self.priced_lines(items_data)
+                instance.po_value, instance.total_including_tax = (
+                    instance.totals_for(lines_total(lines)))
+            instance.save()
 
-            instance.calculate_total()
+            if items_data is not None:
+                # Only the lines that changed are written
+                sync_lines(instance.items.all(), lines,
+                           lambda values: PurchaseOrderItem(purchase_order=instance, **values),
+                           fields=['item', 'quantity', 'unit_price'])
 
         return instance
 
 
-class PurchaseInvoiceSerializer(serializers.ModelSerializer):
+class PurchaseInvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PurchaseInvoice
         fields = '__all__'
@@ -319,7 +537,7 @@ class PurchaseInvoiceSerializer(serializers.ModelSerializer):
 # PurchasePayment Serializer
 
 
-class PurchasePaymentSerializer(serializers.ModelSerializer):
+class PurchasePaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PurchasePayment
         fields = '__all__'
@@ -327,7 +545,7 @@ class PurchasePaymentSerializer(serializers.ModelSerializer):
 # PurchaseOrderReturn Serializer
 
 
-class PurchaseOrderReturnSerializer(serializers.ModelSerializer):
+class PurchaseOrderReturnSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrderReturn
         fields = '__all__'
@@ -335,7 +553,7 @@ class PurchaseOrderReturnSerializer(serializers.ModelSerializer):
 # PurchaseRefund Serializer
 
 
-class PurchaseRefundSerializer(serializers.ModelSerializer):
+class PurchaseRefundSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PurchaseRefund
         fields = '__all__'
@@ -343,7 +561,7 @@ class PurchaseRefundSerializer(serializers.ModelSerializer):
 # InventoryReceivingVoucher Serializer
 
 
-class InventoryReceivingVoucherSerializer(serializers.ModelSerializer):
+class InventoryReceivingVoucherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = InventoryReceivingVoucher
         fields = '__all__'
@@ -351,7 +569,7 @@ class InventoryReceivingVoucherSerializer(serializers.ModelSerializer):
 # StockExport Serializer
 
 
-class StockExportSerializer(serializers.ModelSerializer):
+class StockExportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StockExport
         fields = '__all__'
@@ -359,7 +577,7 @@ class StockExportSerializer(serializers.ModelSerializer):
 # LossAdjustment Serializer
 
 
-class LossAdjustmentSerializer(serializers.ModelSerializer):
+class LossAdjustmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = LossAdjustment
         fields = '__all__'
@@ -367,7 +585,7 @@ class LossAdjustmentSerializer(serializers.ModelSerializer):
 # OpeningStock Serializer
 
 
-class OpeningStockSerializer(serializers.ModelSerializer):
+class OpeningStockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = OpeningStock
         fields = '__all__'
@@ -375,7 +593,7 @@ class OpeningStockSerializer(serializers.ModelSerializer):
 # ManufacturingOrder Serializer
 
 
-class ManufacturingOrderSerializer(serializers.ModelSerializer):
+class ManufacturingOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ManufacturingOrder
         fields = '__all__'
@@ -383,7 +601,7 @@ class ManufacturingOrderSerializer(serializers.ModelSerializer):
 # Asset Serializer
 
 
-class AssetSerializer(serializers.ModelSerializer):
+class AssetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Asset
         fields = '__all__'
@@ -391,7 +609,7 @@ class AssetSerializer(serializers.ModelSerializer):
 # License Serializer
 
 
-class LicenseSerializer(serializers.ModelSerializer):
+class LicenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = License
         fields = '__all__'
@@ -399,7 +617,7 @@ class LicenseSerializer(serializers.ModelSerializer):
 # Component Serializer
 
 
-class ComponentSerializer(serializers.ModelSerializer):
+class ComponentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Component
         fields = '__all__'
@@ -407,7 +625,7 @@ class ComponentSerializer(serializers.ModelSerializer):
 # Consumable Serializer
 
 
-class ConsumableSerializer(serializers.ModelSerializer):
+class ConsumableSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Consumable
         fields = '__all__'
@@ -415,7 +633,7 @@ class ConsumableSerializer(serializers.ModelSerializer):
 # Maintenance Serializer
 
 
-class MaintenanceSerializer(serializers.ModelSerializer):
+class MaintenanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Maintenance
         fields = '__all__'
@@ -423,7 +641,7 @@ class MaintenanceSerializer(serializers.ModelSerializer):
 # Depreciation Serializer
 
 
-class DepreciationSerializer(serializers.ModelSerializer):
+class DepreciationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Depreciation
         fields = '__all__'
@@ -431,7 +649,7 @@ class DepreciationSerializer(serializers.ModelSerializer):
 # BillItem Serializer
 
 
-class BillItemSerializer(serializers.ModelSerializer):
+class BillItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item_details = ItemSerializer(read_only=True)
 
     class Meta:
@@ -447,7 +665,7 @@ class BillItemCreateUpdateSerializer(serializers.ModelSerializer):
 # Bill Serializer
 
 
-class BillSerializer(serializers.ModelSerializer):
+class BillSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = BillItemSerializer(many=True, read_only=True)
     vendor = PartySerializer(read_only=True)
     debit_account = AccountSerializer(read_only=True)
@@ -473,7 +691,7 @@ class CheckCreateUpdateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class CheckSerializer(serializers.ModelSerializer):
+class CheckSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     pay_to = AccountSerializer(read_only=True)
     bank_account = AccountSerializer(read_only=True)
     vendor = PartySerializer(read_only=True)
@@ -485,7 +703,7 @@ class CheckSerializer(serializers.ModelSerializer):
 # JournalEntryLine Serializer
 
 
-class JournalEntryLineSerializer(serializers.ModelSerializer):
+class JournalEntryLineSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = JournalEntryLine
         fields = '__all__'
@@ -493,7 +711,7 @@ class JournalEntryLineSerializer(serializers.ModelSerializer):
 # JournalEntry Serializer
 
 
-class JournalEntrySerializer(serializers.ModelSerializer):
+class JournalEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     lines = JournalEntryLineSerializer(many=True, read_only=True)
 
     class Meta:
@@ -507,10 +725,16 @@ class ConvertCreateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ConvertSerializer(serializers.ModelSerializer):
+class ConvertSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     transfer_from = AccountSerializer(read_only=True)
     transfer_to = AccountSerializer(read_only=True)
 
     class Meta:
         model = Convert
         fields = '__all__'
+
+
+class ReceivableSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Receivable
+        fields = '__all__'
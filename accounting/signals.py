@@ -1,34 +1,368 @@
 import logging
-from django.db.models.signals import pre_save, post_save, pre_delete
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
 from django.dispatch import receiver
 from .models import (
-    Account, BankTransaction, SalesInvoice, SalesPayment, SalesRefund, Expense, PurchaseOrder, PurchaseOrderItem,
+    Account, AccountName, BankTransaction, SalesInvoice, SalesPayment, SalesRefund, Expense, PurchaseOrder, PurchaseOrderItem,
     PurchaseInvoice, PurchasePayment, PurchaseRefund, Bill, Check, JournalEntryLine,
-    InventoryReceivingVoucher, StockExport, LossAdjustment, Depreciation, ManufacturingOrder, Order, OrderItem
+    InventoryReceivingVoucher, StockExport, LossAdjustment, Depreciation, ManufacturingOrder, Order, OrderItem,
+    Item, JournalEntry, Party
 )
-from django.db import transaction
+from django.db import connections, transaction
+from django.db.models import Count, QuerySet, Sum
 from django.utils.timezone import now
 from django.utils import timezone
 import uuid
+from .posting import post_summed, post_to_account, record_adjustment, postings_recorded
+from .reports import invalidate_aging, invalidate_reports, invalidate_reports_from
+from .snapshots import mark_dirty
+from .chart import apply_rollup_deltas, invalidate_chart, rebuild_rollups
+from .profiles import invalidate_profiles, posting_accounts
+from .totals import recalculate_total
+from . import receivables, search, summaries, typeahead
 
 
-def update_account_balance(account, amount_delta):
-    if account:
-        account.balance = (account.balance or 0) + amount_delta
-        account.save(update_fields=['balance'])
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+# Document date used for the ledger rows of each source model
+POSTING_DATE_FIELDS = {
+    BankTransaction: 'date',
+    SalesInvoice: 'date',
+    SalesPayment: 'date',
+    Expense: 'expense_date',
+    Bill: 'bill_date',
+    Check: 'date',
+}
+
+
+def posting_date(source):
+    if isinstance(source, JournalEntryLine):
+        return source.journal_entry.date
+    field = POSTING_DATE_FIELDS.get(type(source))
+    return getattr(source, field) if field else None
+
+
+def update_account_balance(account, amount_delta, is_debit=True, source=None):
+    """
+    Post a debit (or credit) of ``amount_delta`` to ``account`` on behalf of
+    the ``source`` document. The balance is changed in the database and the
+    posting written to the ledger by the posting service, see
+    accounting/posting.py.
+    """
+    post_to_account(account, amount_delta, is_debit=is_debit,
+                    source=source, date=posting_date(source))
+
+
+def old_values(sender, instance):
+    """
+    Return the tracked field values of ``instance`` as they are stored in the
+    database, or None for a new instance.
+
+    Instances loaded through the ORM carry a snapshot taken at load time (see
+    TrackedFieldsMixin), so this only queries for instances that were built
+    by hand with a pk, which may be that of an existing row.
+    """
+    if instance.pk is None:
+        return None
+    loaded = None if instance._state.adding else getattr(instance, '_loaded_values', None)
+    if loaded is None or len(loaded) < len(sender.tracked_fields):
+        loaded = sender.objects.filter(pk=instance.pk).values(
+            *sender.tracked_fields).first()
+    return loaded
+
+# Timestamps
+
+# updated_at drives the API's conditional GET (see accounting/conditional.py),
+# so every save of an accounting or sales row moves it forward. Saves with
+# update_fields must list 'updated_at' for it to be written.
+TIMESTAMPED_APPS = ('accounting', 'sales')
+
+
+@receiver(pre_save)
+def touch_updated_at(sender, instance, raw=False, **kwargs):
+    if raw or sender._meta.app_label not in TIMESTAMPED_APPS:
+        return
+    if any(field.name == 'updated_at' for field in sender._meta.concrete_fields):
+        instance.updated_at = timezone.now()
+
+
+# Search index
+
+@receiver(post_migrate)
+def create_search_index(sender, using='default', **kwargs):
+    if sender.name == 'accounting':
+        search.create_index(connections[using])
+
+
+@receiver(post_save, sender='accounting.Party')
+@receiver(post_save, sender='accounting.Item')
+@receiver(post_save, sender='sales.Item')
+@receiver(post_save, sender='accounting.Bill')
+@receiver(post_save, sender='accounting.Check')
+@receiver(post_save, sender='accounting.BankTransaction')
+def update_search_index(sender, instance, **kwargs):
+    search.index(instance)
+
+
+@receiver(post_delete, sender='accounting.Party')
+@receiver(post_delete, sender='accounting.Item')
+@receiver(post_delete, sender='sales.Item')
+@receiver(post_delete, sender='accounting.Bill')
+@receiver(post_delete, sender='accounting.Check')
+@receiver(post_delete, sender='accounting.BankTransaction')
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex(instance)
+
+
+# Receivables
+
+@receiver(post_save, sender='accounting.SalesInvoice')
+@receiver(post_save, sender='accounting.SalesPayment')
+@receiver(post_save, sender='sales.SalesInvoice')
+@receiver(post_save, sender='sales.SalesPayment')
+def update_receivables(sender, instance, **kwargs):
+    summaries.refresh('receivables', receivables.sync_document(instance))
+
+
+@receiver(post_delete, sender='accounting.SalesInvoice')
+@receiver(post_delete, sender='accounting.SalesPayment')
+@receiver(post_delete, sender='sales.SalesInvoice')
+@receiver(post_delete, sender='sales.SalesPayment')
+def remove_from_receivables(sender, instance, origin=None, **kwargs):
+    parties = receivables.remove_document(instance)
+    if not deletes_party(origin):
+        summaries.refresh('receivables', parties)
+
+
+# Party summaries
+
+def deletes_party(origin):
+    """
+    Whether the delete that started at ``origin`` removes parties, whose
+    summaries go with them: refreshing one mid-cascade would write a row
+    for a party about to disappear.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Party
+    return isinstance(origin, Party)
+
+
+@receiver(pre_save, sender='accounting.Order')
+@receiver(pre_save, sender='sales.Sales')
+@receiver(pre_save, sender='accounting.Bill')
+@receiver(pre_save, sender='accounting.PurchaseOrder')
+@receiver(pre_save, sender='accounting.Expense')
+def capture_old_summarized_fields(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_summarized = (
+        tuple(old[field] for field in summaries.summarized_fields(instance)) if old else None)
+
+
+@receiver(post_save, sender='accounting.Order')
+@receiver(post_save, sender='sales.Sales')
+@receiver(post_save, sender='accounting.Bill')
+@receiver(post_save, sender='accounting.PurchaseOrder')
+@receiver(post_save, sender='accounting.Expense')
+def update_party_summary(sender, instance, **kwargs):
+    fields = summaries.summarized_fields(instance)
+    current = tuple(getattr(instance, field) for field in fields)
+    old = instance._old_summarized
+    if current == old:
+        return  # Nothing summarized changed
+    # A document moved to another party changes the one it left too
+    parties = {current[0], old[0] if old else None}
+    summaries.refresh(summaries.DOCUMENTS[sender._meta.label][0], parties)
+
+
+@receiver(post_delete, sender='accounting.Order')
+@receiver(post_delete, sender='sales.Sales')
+@receiver(post_delete, sender='accounting.Bill')
+@receiver(post_delete, sender='accounting.PurchaseOrder')
+@receiver(post_delete, sender='accounting.Expense')
+def remove_from_party_summary(sender, instance, origin=None, **kwargs):
+    if not deletes_party(origin):
+        party = getattr(instance, summaries.summarized_fields(instance)[0])
+        summaries.refresh(summaries.DOCUMENTS[sender._meta.label][0], {party})
+
+
+# Typeahead
+
+@receiver(post_save, sender='accounting.Account')
+@receiver(post_save, sender='accounting.Party')
+@receiver(post_save, sender='sales.Item')
+@receiver(post_save, sender='sales.Brands')
+def update_typeahead(sender, instance, **kwargs):
+    kind = typeahead.KINDS[sender._meta.label]
+    name = getattr(instance, typeahead.SOURCES[kind][1])
+    transaction.on_commit(lambda: typeahead.update(kind, instance.pk, name))
+
+
+@receiver(post_delete, sender='accounting.Account')
+@receiver(post_delete, sender='accounting.Party')
+@receiver(post_delete, sender='sales.Item')
+@receiver(post_delete, sender='sales.Brands')
+def remove_from_typeahead(sender, instance, **kwargs):
+    kind, pk = typeahead.KINDS[sender._meta.label], instance.pk
+    transaction.on_commit(lambda: typeahead.update(kind, pk, None))
+
+# Report cache
+
+
+@receiver(postings_recorded)
+def invalidate_cached_reports(sender, postings, **kwargs):
+    invalidate_reports_from(min(posting.date for posting in postings))
+
+
+# A new date moves a document's amounts between periods without posting
+# anything, so the periods of the old and the new date are retired here
+REPORT_DATE_FIELDS = {**POSTING_DATE_FIELDS, JournalEntry: 'date'}
+
+
+@receiver(pre_save, sender=BankTransaction)
+@receiver(pre_save, sender=SalesInvoice)
+@receiver(pre_save, sender=SalesPayment)
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Bill)
+@receiver(pre_save, sender=Check)
+@receiver(pre_save, sender=JournalEntry)
+def capture_old_report_date(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_report_date = old[REPORT_DATE_FIELDS[sender]] if old else None
+
+
+@receiver(post_save, sender=BankTransaction)
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_save, sender=SalesPayment)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Bill)
+@receiver(post_save, sender=Check)
+@receiver(post_save, sender=JournalEntry)
+def invalidate_reports_on_redate(sender, instance, **kwargs):
+    old, new = instance._old_report_date, getattr(instance, REPORT_DATE_FIELDS[sender])
+    if old is not None and old != new:
+        invalidate_reports_from(old, new)
+
+
+# The aging reports read these tables directly
+@receiver(post_save, sender='accounting.Party')
+@receiver(post_delete, sender='accounting.Party')
+@receiver(post_save, sender='accounting.SalesInvoice')
+@receiver(post_delete, sender='accounting.SalesInvoice')
+@receiver(post_save, sender='accounting.SalesPayment')
+@receiver(post_delete, sender='accounting.SalesPayment')
+@receiver(post_save, sender='sales.SalesInvoice')
+@receiver(post_delete, sender='sales.SalesInvoice')
+@receiver(post_save, sender='sales.SalesPayment')
+@receiver(post_delete, sender='sales.SalesPayment')
+@receiver(post_save, sender='accounting.PurchaseInvoice')
+@receiver(post_delete, sender='accounting.PurchaseInvoice')
+@receiver(post_save, sender='accounting.PurchasePayment')
+@receiver(post_delete, sender='accounting.PurchasePayment')
+@receiver(post_save, sender='accounting.Bill')
+@receiver(post_delete, sender='accounting.Bill')
+def invalidate_aging_reports(sender, **kwargs):
+    invalidate_aging()
+
+# Balance snapshots
+
+
+@receiver(postings_recorded)
+def mark_snapshots_dirty(sender, postings, **kwargs):
+    mark_dirty(postings)
+
+# Chart of accounts
+
+
+@receiver(postings_recorded)
+def invalidate_chart_tree(sender, postings, **kwargs):
+    invalidate_chart()
+
+
+@receiver(pre_save, sender=AccountName)
+def capture_old_account_name_parent(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_parent_id = old['parent_id'] if old else None
+
+
+@receiver(post_save, sender=AccountName)
+def update_account_name_structure(sender, instance, created, **kwargs):
+    invalidate_chart()
+    if not created and instance._old_parent_id != instance.parent_id:
+        # A moved group changes the totals of two ancestor chains
+        rebuild_rollups()
+
+
+@receiver(post_delete, sender=AccountName)
+def rebuild_after_account_name_delete(sender, instance, **kwargs):
+    invalidate_chart()
+    rebuild_rollups()
+
+# Account signal
+
+
+@receiver(pre_save, sender=Account)
+def capture_old_account_balance(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_balance = (old['balance'] or 0) if old else 0
+    instance._old_parent_account_id = old['parent_account_id'] if old else None
+
+
+@receiver(post_save, sender=Account)
+def record_account_balance_adjustment(sender, instance, created, **kwargs):
+    """
+    Balances typed in on the account itself (opening balances, manual
+    corrections) bypass the posting service, so record them in the ledger
+    as adjustments.
+    """
+    delta = (instance.balance or 0) - instance._old_balance
+    if delta:
+        # An opening balance is dated by the account's own as_of
+        record_adjustment(instance, delta, source=instance,
+                          date=instance.as_of if created else None)
+
+    # Keep the group totals in step
+    if instance._old_parent_account_id != instance.parent_account_id:
+        apply_rollup_deltas({
+            instance._old_parent_account_id: -instance._old_balance,
+            instance.parent_account_id: instance.balance or 0,
+        })
+    elif delta and instance.parent_account_id:
+        apply_rollup_deltas({instance.parent_account_id: delta})
+    invalidate_chart()
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def reset_posting_profiles(sender, instance, **kwargs):
+    invalidate_profiles()
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_account_reports(sender, instance, **kwargs):
+    # Cached trial balances list every account by name, number and type
+    invalidate_reports()
+
+
+@receiver(post_delete, sender=Account)
+def remove_account_from_rollups(sender, instance, **kwargs):
+    # The cascade may have reversed documents against the account already,
+    # so recompute rather than subtract a balance that is out of date
+    if instance.parent_account_id:
+        rebuild_rollups()
+    invalidate_chart()
 
 # BankTransaction signal
 
 
 @receiver(pre_save, sender=BankTransaction)
 def capture_old_bank_transaction(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_deposit = old.deposit
-        instance._old_withdrawal = old.withdrawal
-    else:
-        instance._old_deposit = 0
-        instance._old_withdrawal = 0
+    old = old_values(sender, instance)
+    instance._old_deposit = old['deposit'] if old else 0
+    instance._old_withdrawal = old['withdrawal'] if old else 0
 
 
 @receiver(post_save, sender=BankTransaction)
@@ -36,74 +370,23 @@ def update_bank_transaction_balance(sender, instance, created, **kwargs):
     old_delta = instance._old_deposit - instance._old_withdrawal
     new_delta = instance.deposit - instance.withdrawal
     net_delta = new_delta - old_delta if not created else new_delta
-    update_account_balance(instance.account, net_delta)
+    if not net_delta:
+        return  # Nothing to post
+    update_account_balance(instance.account, net_delta, source=instance)
 
 
 @receiver(pre_delete, sender=BankTransaction)
 def reverse_bank_transaction_balance(sender, instance, **kwargs):
     delta = instance.withdrawal - instance.deposit  # Reverse effect
-    update_account_balance(instance.account, delta)
-
-# SalesInvoice signal
-
-
-# Helper function to update account balance, respecting account_type
-def update_account_balance(account, amount_delta, is_debit=True):
-    if account:
-        # If debit to debit-normal (asset/expense) or credit to credit-normal (liability/revenue), increase balance
-        if (is_debit and account.account_type == 'debit') or (not is_debit and account.account_type == 'credit'):
-            account.balance = (account.balance or 0) + amount_delta
-        else:
-            # If debit to credit-normal or credit to debit-normal, decrease balance
-            account.balance = (account.balance or 0) - amount_delta
-        account.save(update_fields=['balance'])
+    update_account_balance(instance.account, delta, source=instance)
 
 # SalesInvoice signals
 
 
-# Set up logging
-logger = logging.getLogger(__name__)
-
-
-def update_account_balance(account, amount_delta, is_debit=True):
-    if not account:
-        logger.error("No account provided for balance update")
-        return
-    current_balance = account.balance or 0
-    if is_debit:
-        # Debit: increase debit-normal (asset/expense), decrease credit-normal (liability/revenue)
-        if account.account_type == 'debit':
-            new_balance = current_balance + amount_delta
-            logger.debug(
-                f"Debiting {account.name} (debit-normal): {current_balance} + {amount_delta} = {new_balance}")
-        else:
-            new_balance = current_balance - amount_delta
-            logger.debug(
-                f"Debiting {account.name} (credit-normal): {current_balance} - {amount_delta} = {new_balance}")
-    else:
-        # Credit: increase credit-normal, decrease debit-normal
-        if account.account_type == 'credit':
-            new_balance = current_balance + amount_delta
-            logger.debug(
-                f"Crediting {account.name} (credit-normal): {current_balance} + {amount_delta} = {new_balance}")
-        else:
-            new_balance = current_balance - amount_delta
-            logger.debug(
-                f"Crediting {account.name} (debit-normal): {current_balance} - {amount_delta} = {new_balance}")
-    account.balance = new_balance
-    account.save(update_fields=['balance'])
-
-
 @receiver(pre_save, sender=SalesInvoice)
 def capture_old_sales_invoice(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = sender.objects.get(pk=instance.pk)
-            instance._old_amount = old.amount
-        except sender.DoesNotExist:
-            instance._old_amount = 0
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
     logger.debug(
         f"Captured old amount for SalesInvoice {instance.pk}: {instance._old_amount}")
 
@@ -113,12 +396,14 @@ def update_sales_invoice_balance(sender, instance, created, **kwargs):
     net_delta = instance.amount - instance._old_amount if not created else instance.amount
     logger.debug(
         f"SalesInvoice {instance.id}: net_delta={net_delta}, created={created}")
+    if not net_delta:
+        return  # Nothing to post
     if instance.debit_account:
         update_account_balance(instance.debit_account,
-                               net_delta, is_debit=True)
+                               net_delta, is_debit=True, source=instance)
     if instance.credit_account:
         update_account_balance(instance.credit_account,
-                               net_delta, is_debit=False)
+                               net_delta, is_debit=False, source=instance)
 
 
 @receiver(pre_delete, sender=SalesInvoice)
@@ -126,48 +411,46 @@ def reverse_sales_invoice_balance(sender, instance, **kwargs):
     logger.debug(
         f"Reversing SalesInvoice {instance.id}: amount={instance.amount}")
     if instance.debit_account:
-        update_account_balance(instance.debit_account,
-                               instance.amount, is_debit=False)  # Reverse debit
+        update_account_balance(instance.debit_account, instance.amount,
+                               is_debit=False, source=instance)  # Reverse debit
     if instance.credit_account:
-        update_account_balance(instance.credit_account,
-                               instance.amount, is_debit=True)  # Reverse credit
+        update_account_balance(instance.credit_account, instance.amount,
+                               is_debit=True, source=instance)  # Reverse credit
 
 # SalesPayment signal
 
 
 @receiver(pre_save, sender=SalesPayment)
 def capture_old_sales_payment(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=SalesPayment)
 def update_sales_payment_balance(sender, instance, created, **kwargs):
     net_delta = instance.amount - instance._old_amount if not created else instance.amount
+    if not net_delta:
+        return  # Nothing to post
     if instance.invoice and instance.invoice.debit_account:
         update_account_balance(
-            instance.invoice.debit_account, -net_delta)  # Reduce receivable
+            instance.invoice.debit_account, -net_delta,
+            source=instance)  # Reduce receivable
     # Note: Ideally, credit a bank/cash account, but model lacks it. Add Account FK if needed.
 
 
 @receiver(pre_delete, sender=SalesPayment)
 def reverse_sales_payment_balance(sender, instance, **kwargs):
     if instance.invoice and instance.invoice.debit_account:
-        update_account_balance(instance.invoice.debit_account, instance.amount)
+        update_account_balance(instance.invoice.debit_account,
+                               instance.amount, source=instance)
 
 # SalesRefund signal
 
 
 @receiver(pre_save, sender=SalesRefund)
 def capture_old_sales_refund(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=SalesRefund)
@@ -187,25 +470,26 @@ def reverse_sales_refund_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=Expense)
 def capture_old_expense(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=Expense)
 def update_expense_balance(sender, instance, created, **kwargs):
     net_delta = instance.amount - instance._old_amount if not created else instance.amount
+    if not net_delta:
+        return  # Nothing to post
     if instance.payment_account:
         # Debit expense account
-        update_account_balance(instance.payment_account, net_delta)
+        update_account_balance(instance.payment_account,
+                               net_delta, source=instance)
 
 
 @receiver(pre_delete, sender=Expense)
 def reverse_expense_balance(sender, instance, **kwargs):
-    if instance.account:
-        update_account_balance(instance.account, -instance.amount)
+    if instance.payment_account:
+        update_account_balance(instance.payment_account,
+                               -instance.amount, source=instance)
 
 # PurchaseInvoice signal
 # Note: PurchaseInvoice lacks debit/credit_account; consider adding like SalesInvoice
@@ -213,11 +497,8 @@ def reverse_expense_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=PurchaseInvoice)
 def capture_old_purchase_invoice(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.invoice_amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['invoice_amount'] if old else 0
 
 
 @receiver(post_save, sender=PurchaseInvoice)
@@ -238,11 +519,8 @@ def reverse_purchase_invoice_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=PurchasePayment)
 def capture_old_purchase_payment(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=PurchasePayment)
@@ -261,11 +539,8 @@ def reverse_purchase_payment_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=PurchaseRefund)
 def capture_old_purchase_refund(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=PurchaseRefund)
@@ -284,24 +559,23 @@ def reverse_purchase_refund_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=Bill)
 def capture_old_bill(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=Bill)
 def update_bill_balance(sender, instance, created, **kwargs):
     net_delta = instance.amount - instance._old_amount if not created else instance.amount
+    if not created and not net_delta:
+        return  # Nothing to post
 
     # Update account balances
     if instance.debit_account:
         update_account_balance(instance.debit_account,
-                               net_delta)  # Debit expense/asset
+                               net_delta, source=instance)  # Debit expense/asset
     if instance.credit_account:
         update_account_balance(instance.credit_account,
-                               net_delta)  # Credit payable
+                               net_delta, is_debit=False, source=instance)  # Credit payable
 
     # Create corresponding bank transaction for new bills
     if created:
@@ -322,31 +596,33 @@ def update_bill_balance(sender, instance, created, **kwargs):
 @receiver(pre_delete, sender=Bill)
 def reverse_bill_balance(sender, instance, **kwargs):
     if instance.debit_account:
-        update_account_balance(instance.debit_account, -instance.amount)
+        update_account_balance(instance.debit_account,
+                               -instance.amount, source=instance)
     if instance.credit_account:
-        update_account_balance(instance.credit_account, -instance.amount)
+        update_account_balance(instance.credit_account,
+                               -instance.amount, is_debit=False, source=instance)
 
 # Check signal
 
 
 @receiver(pre_save, sender=Check)
 def capture_old_check(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=Check)
 def update_check_balance(sender, instance, created, **kwargs):
     net_delta = instance.amount - instance._old_amount if not created else instance.amount
+    if not created and not net_delta:
+        return  # Nothing to post
     if instance.bank_account:
-        update_account_balance(instance.bank_account, -
-                               net_delta)  # Decrease bank
+        update_account_balance(instance.bank_account, -net_delta,
+                               source=instance)  # Decrease bank
 
     if instance.pay_to:
-        update_account_balance(instance.pay_to, net_delta)  # Increase pay_to
+        update_account_balance(instance.pay_to, net_delta,
+                               source=instance)  # Increase pay_to
 
     # Create corresponding bank transaction for new checks
     if created:
@@ -367,20 +643,20 @@ def update_check_balance(sender, instance, created, **kwargs):
 @receiver(pre_delete, sender=Check)
 def reverse_check_balance(sender, instance, **kwargs):
     if instance.bank_account:
-        update_account_balance(instance.bank_account, instance.amount)
+        update_account_balance(instance.bank_account,
+                               instance.amount, source=instance)
+    if instance.pay_to:
+        update_account_balance(instance.pay_to,
+                               -instance.amount, source=instance)
 
 # JournalEntryLine signal
 
 
 @receiver(pre_save, sender=JournalEntryLine)
 def capture_old_journal_line(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_debit = old.debit
-        instance._old_credit = old.credit
-    else:
-        instance._old_debit = 0
-        instance._old_credit = 0
+    old = old_values(sender, instance)
+    instance._old_debit = old['debit'] if old else 0
+    instance._old_credit = old['credit'] if old else 0
 
 
 @receiver(post_save, sender=JournalEntryLine)
@@ -388,24 +664,23 @@ def update_journal_line_balance(sender, instance, created, **kwargs):
     old_delta = instance._old_debit - instance._old_credit
     new_delta = instance.debit - instance.credit
     net_delta = new_delta - old_delta if not created else new_delta
-    update_account_balance(instance.account, net_delta)
+    if not net_delta:
+        return  # Nothing to post
+    update_account_balance(instance.account, net_delta, source=instance)
 
 
 @receiver(pre_delete, sender=JournalEntryLine)
 def reverse_journal_line_balance(sender, instance, **kwargs):
     delta = instance.credit - instance.debit  # Reverse
-    update_account_balance(instance.account, delta)
+    update_account_balance(instance.account, delta, source=instance)
 
 # InventoryReceivingVoucher signal
 
 
 @receiver(pre_save, sender=InventoryReceivingVoucher)
 def capture_old_inventory_receiving(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_value = old.value_of_inventory
-    else:
-        instance._old_value = 0
+    old = old_values(sender, instance)
+    instance._old_value = old['value_of_inventory'] if old else 0
 
 
 @receiver(post_save, sender=InventoryReceivingVoucher)
@@ -426,11 +701,7 @@ def reverse_inventory_receiving_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=StockExport)
 def capture_old_stock_export(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = 0  # Estimate via invoices if needed
-    else:
-        instance._old_amount = 0
+    instance._old_amount = 0  # Estimate via invoices if needed
 
 
 @receiver(post_save, sender=StockExport)
@@ -449,11 +720,7 @@ def reverse_stock_export_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=LossAdjustment)
 def capture_old_loss_adjustment(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = 0  # Estimate via items if needed
-    else:
-        instance._old_amount = 0
+    instance._old_amount = 0  # Estimate via items if needed
 
 
 @receiver(post_save, sender=LossAdjustment)
@@ -471,11 +738,8 @@ def reverse_loss_adjustment_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=Depreciation)
 def capture_old_depreciation(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_amount = old.amount
-    else:
-        instance._old_amount = 0
+    old = old_values(sender, instance)
+    instance._old_amount = old['amount'] if old else 0
 
 
 @receiver(post_save, sender=Depreciation)
@@ -495,10 +759,15 @@ def reverse_depreciation_balance(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=ManufacturingOrder)
 def capture_old_manufacturing_order(sender, instance, **kwargs):
-    if instance.pk:
-        old = sender.objects.get(pk=instance.pk)
-        instance._old_quantity = old.quantity
-        instance._old_cost = old.product.cost or 0
+    old = old_values(sender, instance)
+    if old:
+        instance._old_quantity = old['quantity']
+        if old['product_id'] == instance.product_id:
+            # Same product: reuse the instance's (cached) relation
+            instance._old_cost = instance.product.cost or 0
+        else:
+            instance._old_cost = Item.objects.filter(
+                pk=old['product_id']).values_list('cost', flat=True).first() or 0
     else:
         instance._old_quantity = 0
         instance._old_cost = 0
@@ -521,23 +790,13 @@ def reverse_manufacturing_order_balance(sender, instance, **kwargs):
 # OrderItem signal
 
 @receiver(post_save, sender=OrderItem)
-def update_order_total(sender, instance, **kwargs):
+@receiver(post_delete, sender=OrderItem)
+def update_order_total(sender, instance, origin=None, **kwargs):
     """
     Update order total when OrderItem is saved or deleted
     """
-    if instance.order:
-        # Use atomic transaction to ensure consistency
-        with transaction.atomic():
-            instance.order.calculate_total()
-
-
-@receiver(post_save, sender=OrderItem)
-def order_item_delete_handler(sender, instance, **kwargs):
-    """
-    Handle order item deletion to update total
-    """
-    if kwargs.get('created', False) or instance.order:
-        update_order_total(sender, instance, **kwargs)
+    if instance.order_id and not isinstance(origin, Order):
+        recalculate_total(Order, instance.order_id)
 
 
 @receiver(post_save, sender=Order)
@@ -547,21 +806,14 @@ def create_sales_invoice_and_payment(sender, instance, created, **kwargs):
     """
     if created and instance.total_amount > 0:
         with transaction.atomic():
-            # Get or create default accounts
-            debit_account = Account.objects.filter(
-                account_type='debit').first()
-            credit_account = Account.objects.filter(
-                account_type='credit').first()
-
-            # Create SalesInvoice
+            # Create SalesInvoice on the default sales posting accounts
             invoice = SalesInvoice.objects.create(
                 order=instance,
                 date=instance.order_date,
                 amount=instance.total_amount,
                 customer=instance.customer,
                 status='open',
-                debit_account=debit_account,
-                credit_account=credit_account,
+                **posting_accounts('sales_invoice'),
                 created_at=timezone.now(),
                 updated_at=timezone.now()
             )
@@ -581,35 +833,60 @@ def create_sales_invoice_and_payment(sender, instance, created, **kwargs):
             )
 
 
-@receiver(pre_save, sender=Order)
-def update_related_invoice_and_payment(sender, instance, **kwargs):
+def sync_order_documents(order, total):
     """
-    Update related SalesInvoice and SalesPayment when Order is updated
+    Set the amount of every SalesInvoice and SalesPayment of ``order`` to
+    ``total`` with one UPDATE each. The balance change is summed per
+    account with grouped aggregates first and posted as one batch, so the
+    cost does not grow with the number of documents.
     """
-    if not instance.pk:
-        return  # New instance, no update needed
+    invoices = SalesInvoice.objects.filter(order=order).exclude(amount=total)
+    payments = SalesPayment.objects.filter(
+        invoice__order=order).exclude(amount=total)
+
+    amounts = defaultdict(Decimal)
+    for debit_id, credit_id, date, count, amount in invoices.order_by().values_list(
+            'debit_account', 'credit_account', 'date').annotate(
+            count=Count('pk'), amount=Sum('amount')):
+        change = total * count - amount
+        if debit_id:
+            amounts[(debit_id, True, date)] += change
+        if credit_id:
+            amounts[(credit_id, False, date)] += change
+    for debit_id, date, count, amount in payments.order_by().values_list(
+            'invoice__debit_account', 'date').annotate(
+            count=Count('pk'), amount=Sum('amount')):
+        if debit_id:
+            # Payments reduce the receivable
+            amounts[(debit_id, True, date)] -= total * count - amount
+
+    now = timezone.now()
+    payments.update(amount=total, updated_at=now)
+    invoices.update(amount=total, updated_at=now)
+    post_summed(amounts, source=order)
+    parties = receivables.sync(
+        'order', invoices=SalesInvoice.objects.filter(order=order),
+        payments=SalesPayment.objects.filter(invoice__order=order))
+    summaries.refresh('receivables', parties)
+    invalidate_aging()
 
-    try:
-        old_instance = Order.objects.get(pk=instance.pk)
-    except Order.DoesNotExist:
-        return
 
-    # Check if total amount changed
-    if old_instance.total_amount != instance.total_amount:
-        with transaction.atomic():
-            # Update related invoice
-            invoices = SalesInvoice.objects.filter(order=instance)
-            for invoice in invoices:
-                invoice.amount = instance.total_amount
-                invoice.updated_at = timezone.now()
-                invoice.save()
+@receiver(pre_save, sender=Order)
+def capture_old_order(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_total_amount = old['total_amount'] if old else None
+    instance._old_payment_mode = old['payment_mode'] if old else None
 
-            # Update related payments
-            payments = SalesPayment.objects.filter(invoice__order=instance)
-            for payment in payments:
-                payment.amount = instance.total_amount
-                payment.updated_at = timezone.now()
-                payment.save()
+
+@receiver(post_save, sender=Order)
+def update_related_invoice_and_payment(sender, instance, created, **kwargs):
+    """
+    Update related SalesInvoice and SalesPayment when Order is updated
+    """
+    if created or instance._old_total_amount == instance.total_amount:
+        return
+    with transaction.atomic():
+        sync_order_documents(instance, instance.total_amount)
 
 
 @receiver(post_save, sender=Order)
@@ -617,42 +894,28 @@ def handle_order_payment_mode_change(sender, instance, created, **kwargs):
     """
     Handle payment mode changes and update payment status
     """
-    if not created:
-        try:
-            old_instance = Order.objects.get(pk=instance.pk)
-            if old_instance.payment_mode != instance.payment_mode:
-                with transaction.atomic():
-                    payments = SalesPayment.objects.filter(
-                        invoice__order=instance)
-                    for payment in payments:
-                        payment.payment_mode = instance.payment_mode
-                        payment.status = 'paid' if instance.payment_mode == 'cash' else 'pending'
-                        payment.updated_at = timezone.now()
-                        payment.save()
-        except Order.DoesNotExist:
-            pass
+    if created or instance._old_payment_mode == instance.payment_mode:
+        return
+    SalesPayment.objects.filter(invoice__order=instance).update(
+        payment_mode=instance.payment_mode,
+        status='paid' if instance.payment_mode == 'cash' else 'pending',
+        updated_at=timezone.now())
+    parties = receivables.sync(
+        'order', payments=SalesPayment.objects.filter(invoice__order=instance))
+    summaries.refresh('receivables', parties)
+    invalidate_aging()
 
 # PurchaseOrder signal
 
 
 @receiver(post_save, sender=PurchaseOrderItem)
-def update_purchase_order_total(sender, instance, **kwargs):
+@receiver(post_delete, sender=PurchaseOrderItem)
+def update_purchase_order_total(sender, instance, origin=None, **kwargs):
     """
     Update purchase order total when PurchaseOrderItem is saved or deleted
     """
-    if instance.purchase_order:
-        # Use atomic transaction to ensure consistency
-        with transaction.atomic():
-            instance.purchase_order.calculate_total()
-
-
-@receiver(post_save, sender=PurchaseOrderItem)
-def purchase_order_item_delete_handler(sender, instance, **kwargs):
-    """
-    Handle purchase order item deletion to update total
-    """
-    if kwargs.get('created', False) or instance.purchase_order:
-        update_purchase_order_total(sender, instance, **kwargs)
+    if instance.purchase_order_id and not isinstance(origin, PurchaseOrder):
+        recalculate_total(PurchaseOrder, instance.purchase_order_id)
 
 
 @receiver(post_save, sender=PurchaseOrder)
@@ -662,12 +925,6 @@ def create_purchase_invoice_and_payment(sender, instance, created, **kwargs):
     """
     if created and instance.total_including_tax > 0:
         with transaction.atomic():
-            # Get or create default accounts
-            debit_account = Account.objects.filter(
-                account_type='debit').first()
-            credit_account = Account.objects.filter(
-                account_type='credit').first()
-
             # Create PurchaseInvoice
             invoice = PurchaseInvoice.objects.create(
                 invoice_no=f"INV-{timezone.now().strftime('%Y%m%d')}",
@@ -694,34 +951,27 @@ def create_purchase_invoice_and_payment(sender, instance, created, **kwargs):
 
 
 @receiver(pre_save, sender=PurchaseOrder)
-def update_related_purchase_invoice_and_payment(sender, instance, **kwargs):
+def capture_old_purchase_order(sender, instance, **kwargs):
+    old = old_values(sender, instance)
+    instance._old_total_including_tax = old['total_including_tax'] if old else None
+    instance._old_payment_status = old['payment_status'] if old else None
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def update_related_purchase_invoice_and_payment(sender, instance, created, **kwargs):
     """
     Update related PurchaseInvoice and PurchasePayment when PurchaseOrder is updated
     """
-    if not instance.pk:
-        return  # New instance, no update needed
-
-    try:
-        old_instance = PurchaseOrder.objects.get(pk=instance.pk)
-    except PurchaseOrder.DoesNotExist:
+    if created or instance._old_total_including_tax == instance.total_including_tax:
         return
-
-    # Check if total amount changed
-    if old_instance.total_including_tax != instance.total_including_tax:
-        with transaction.atomic():
-            # Update related invoice
-            invoices = PurchaseInvoice.objects.filter(purchase_order=instance)
-            for invoice in invoices:
-                invoice.amount = instance.total_including_tax
-                invoice.updated_at = timezone.now()
-                invoice.save()
-
-            # Update related payments
-            payments = PurchasePayment.objects.filter(purchase_order=instance)
-            for payment in payments:
-                payment.amount = instance.total_including_tax
-                payment.updated_at = timezone.now()
-                payment.save()
+    # Purchase documents post nothing yet, so plain bulk updates suffice
+    now = timezone.now()
+    with transaction.atomic():
+        PurchaseInvoice.objects.filter(purchase_order=instance).update(
+            invoice_amount=instance.total_including_tax, updated_at=now)
+        PurchasePayment.objects.filter(purchase_order=instance).update(
+            amount=instance.total_including_tax, updated_at=now)
+    invalidate_aging()
 
 
 @receiver(post_save, sender=PurchaseOrder)
@@ -729,16 +979,8 @@ def handle_purchase_order_payment_status_change(sender, instance, created, **kwa
     """
     Handle payment status changes and update payment status
     """
-    if not created:
-        try:
-            old_instance = PurchaseOrder.objects.get(pk=instance.pk)
-            if old_instance.payment_status != instance.payment_status:
-                with transaction.atomic():
-                    payments = PurchasePayment.objects.filter(
-                        invoice__purchase_order=instance)
-                    for payment in payments:
-                        payment.status = instance.payment_status
-                        payment.updated_at = timezone.now()
-                        payment.save()
-        except PurchaseOrder.DoesNotExist:
-            pass
+    if created or instance._old_payment_status == instance.payment_status:
+        return
+    PurchasePayment.objects.filter(purchase_order=instance).update(
+        status=instance.payment_status, updated_at=timezone.now())
+    invalidate_aging()
@@ -0,0 +1,181 @@
+"""
+Periodic account balance snapshots.
+
+AccountBalanceSnapshot rows hold each account's balance at the end of every
+closed period (a month by default, see ACCOUNTING_SNAPSHOT_PERIOD), built
+from the ledger by the snapshot_balances command. Historical balances are
+then the nearest snapshot plus the postings made since, which reads one
+period of postings instead of the whole history.
+
+A posting dated inside a closed period marks the snapshots from that date
+on dirty; they are rebuilt lazily by the next lookup (or the next run of
+the command).
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import AccountBalanceSnapshot, LedgerPosting
+
+# 'month', 'quarter' or 'year'
+SNAPSHOT_PERIOD = getattr(settings, 'ACCOUNTING_SNAPSHOT_PERIOD', 'month')
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def period_start(day):
+    """
+    First day of the period containing ``day``.
+    """
+    months = PERIOD_MONTHS[SNAPSHOT_PERIOD]
+    return day.replace(month=(day.month - 1) // months * months + 1, day=1)
+
+
+def period_end(day):
+    """
+    Last day of the period containing ``day``.
+    """
+    start = period_start(day)
+    month = start.month - 1 + PERIOD_MONTHS[SNAPSHOT_PERIOD]
+    following = start.replace(year=start.year + month // 12, month=month % 12 + 1)
+    return following - datetime.timedelta(days=1)
+
+
+def last_closed_period_end():
+    return period_start(timezone.localdate()) - datetime.timedelta(days=1)
+
+
+def day_after(day):
+    """
+    The first instant after ``day`` ends, as an aware datetime.
+    """
+    return timezone.make_aware(datetime.datetime.combine(
+        day + datetime.timedelta(days=1), datetime.time.min))
+
+
+def posting_totals(start, end, account_id=None):
+    """
+    Sum of balance deltas per account for postings dated after the day
+    ``start`` (None: from the beginning) up to the end of the day ``end``.
+    """
+    postings = LedgerPosting.objects.filter(date__lt=day_after(end))
+    if start is not None:
+        postings = postings.filter(date__gte=day_after(start))
+    if account_id is not None:
+        postings = postings.filter(account_id=account_id)
+    return dict(postings.order_by().values_list('account').annotate(
+        total=Sum('balance_delta')))
+
+
+def mark_dirty(postings):
+    """
+    Flag the snapshots a batch of postings invalidates. Postings in the
+    current (open) period cannot affect any snapshot and cost nothing.
+    """
+    open_from = period_start(timezone.localdate())
+    earliest = {}
+    for posting in postings:
+        day = timezone.localdate(posting.date)
+        if day < open_from:
+            earliest[posting.account_id] = min(
+                day, earliest.get(posting.account_id, day))
+    for account_id, day in earliest.items():
+        AccountBalanceSnapshot.objects.filter(
+            account_id=account_id, period_end__gte=day, is_dirty=False,
+        ).update(is_dirty=True, updated_at=timezone.now())
+    if earliest:
+        # An account may have no snapshot for that period yet; give it a
+        # dirty one so the rebuild starts early enough to include the posting
+        AccountBalanceSnapshot.objects.bulk_create([
+            AccountBalanceSnapshot(account_id=account_id,
+                                   period_end=period_end(day), is_dirty=True)
+            for account_id, day in earliest.items()
+        ], ignore_conflicts=True)
+
+
+def latest_snapshot(account_id, day):
+    """
+    Return the clean snapshot of an account with the latest period_end on or
+    before ``day``, rebuilding it first if a backdated posting dirtied it.
+    """
+    snapshot = AccountBalanceSnapshot.objects.filter(
+        account_id=account_id, period_end__lte=day).order_by('-period_end').first()
+    if snapshot is None or not snapshot.is_dirty:
+        return snapshot
+
+    # Walk forward from the nearest clean snapshot, one period at a time
+    previous = AccountBalanceSnapshot.objects.filter(
+        account_id=account_id, period_end__lt=snapshot.period_end,
+        is_dirty=False).order_by('-period_end').first()
+    dirty = AccountBalanceSnapshot.objects.filter(
+        account_id=account_id, period_end__lte=snapshot.period_end,
+        is_dirty=True)
+    if previous is not None:
+        dirty = dirty.filter(period_end__gt=previous.period_end)
+    balance = previous.balance if previous else Decimal('0')
+    start = previous.period_end if previous else None
+    for stale in dirty.order_by('period_end'):
+        balance += posting_totals(
+            start, stale.period_end, account_id).get(account_id) or 0
+        stale.balance = balance
+        stale.is_dirty = False
+        stale.updated_at = timezone.now()
+        stale.save(update_fields=['balance', 'is_dirty', 'updated_at'])
+        start = stale.period_end
+    return stale
+
+
+def take_snapshots(until=None):
+    """
+    Write snapshots for every closed period up to ``until`` (default: the
+    last closed period), starting from the earliest dirty or missing period.
+    Each period costs one grouped aggregate over that period's postings.
+    Returns the number of snapshot rows written.
+    """
+    until = until or last_closed_period_end()
+    snapshots = AccountBalanceSnapshot.objects.all()
+    first_dirty = snapshots.filter(is_dirty=True).order_by('period_end').first()
+    latest = snapshots.order_by('-period_end').first()
+    if first_dirty is not None:
+        start = first_dirty.period_end
+    elif latest is not None:
+        start = period_end(latest.period_end + datetime.timedelta(days=1))
+    else:
+        first_posting = LedgerPosting.objects.order_by('date').first()
+        if first_posting is None:
+            return 0
+        start = period_end(timezone.localdate(first_posting.date))
+
+    # Carry balances forward from the snapshots just before ``start``. An
+    # account without one there (new, or with only the lone row mark_dirty
+    # gave it) starts from its postings up to then instead
+    seed_end = period_start(start) - datetime.timedelta(days=1)
+    seed = snapshots.filter(period_end=seed_end, is_dirty=False)
+    balances = defaultdict(Decimal, seed.values_list('account_id', 'balance'))
+    unseeded = LedgerPosting.objects.filter(date__lt=day_after(seed_end)).exclude(
+        account__in=seed.values('account'))
+    for account_id, total in unseeded.order_by().values_list('account').annotate(
+            total=Sum('balance_delta')):
+        balances[account_id] += total or 0
+
+    written = 0
+    previous_end, end = seed_end, start
+    while end <= until:
+        for account_id, total in posting_totals(previous_end, end).items():
+            balances[account_id] += total or 0
+        now = timezone.now()
+        rows = [
+            AccountBalanceSnapshot(account_id=account_id, period_end=end,
+                                   balance=balance, created_at=now, updated_at=now)
+            for account_id, balance in balances.items()
+        ]
+        AccountBalanceSnapshot.objects.bulk_create(
+            rows, batch_size=500, update_conflicts=True,
+            unique_fields=['account', 'period_end'],
+            update_fields=['balance', 'is_dirty', 'updated_at'])
+        written += len(rows)
+        previous_end, end = end, period_end(end + datetime.timedelta(days=1))
+    return written
@@ -0,0 +1,130 @@
+"""
+Lifetime totals per party (accounting.PartySummary).
+
+A customer or vendor page needs the party's totals over seven tables: both
+apps' sales invoices and payments, Orders, Sales, Bills, PurchaseOrders and
+Expenses. PartySummary keeps them in one row per party, so a party list
+with balances is one extra join rather than seven aggregates per row.
+
+The columns come in groups, one per source table (the receivables table
+standing in for the four invoice and payment tables, see
+accounting/receivables.py). A write to a source refreshes that group for
+the parties it touches, the old party included when a document moves: one
+aggregate over the source's party index, one upsert and one update for
+``last_activity``; the other groups are left alone. ``last_activity`` only moves forward, to the latest
+document date of a refreshed group.
+
+The refreshes are driven from the save and delete signals of the sources
+and from the receivables sync (see accounting/signals.py);
+``manage.py rebuild_party_summaries`` recomputes every row, e.g. after bulk
+writes that send no signals.
+"""
+from decimal import Decimal
+
+from django.apps import apps
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Party, PartySummary
+from .receivables import PAID_STATUSES
+
+# group -> (model label, party field, date field, {column: aggregate})
+GROUPS = {
+    'receivables': ('accounting.Receivable', 'customer', 'date', {
+        'invoiced': Sum('amount', filter=Q(kind='invoice')),
+        'paid': Sum('amount', filter=Q(kind='payment', status__in=PAID_STATUSES)),
+        'outstanding': Sum('open_amount', filter=Q(kind='invoice')),
+    }),
+    'orders': ('accounting.Order', 'customer', 'order_date', {
+        'ordered': Sum('total_amount'),
+    }),
+    'sales': ('sales.Sales', 'lead_or_customer', 'created_at', {
+        'sold': Sum('amount'),
+    }),
+    'bills': ('accounting.Bill', 'vendor', 'bill_date', {
+        'billed': Sum('amount'),
+    }),
+    'purchase_orders': ('accounting.PurchaseOrder', 'vendor', 'order_date', {
+        'purchased': Sum('total_including_tax'),
+    }),
+    'expenses': ('accounting.Expense', 'vendor', 'expense_date', {
+        'expensed': Sum('amount'),
+    }),
+}
+
+# model label -> (group, summed field), for the documents whose own
+# signals refresh a group
+DOCUMENTS = {
+    'accounting.Order': ('orders', 'total_amount'),
+    'sales.Sales': ('sales', 'amount'),
+    'accounting.Bill': ('bills', 'amount'),
+    'accounting.PurchaseOrder': ('purchase_orders', 'total_including_tax'),
+    'accounting.Expense': ('expenses', 'amount'),
+}
+
+
+def summarized_fields(instance):
+    """
+    Return the attnames of the party, the summed amount and the date of a
+    source document: the fields whose change refreshes its group.
+    """
+    group, amount = DOCUMENTS[instance._meta.label]
+    _, party, date, _ = GROUPS[group]
+    return instance._meta.get_field(party).attname, amount, date
+
+
+def refresh(group, parties):
+    """
+    Recompute the ``group`` columns of the given party ids, creating their
+    summary rows if need be.
+    """
+    parties = {pk for pk in parties if pk is not None}
+    if not parties:
+        return
+    label, field, date_field, aggregates = GROUPS[group]
+    documents = apps.get_model(label)._default_manager.order_by()
+    totals = {
+        row.pop('party'): row
+        for row in documents.filter(**{f"{field}__in": parties})
+        .values(party=F(field)).annotate(**aggregates)
+    }
+    now = timezone.now()
+    rows = [
+        PartySummary(party_id=pk, updated_at=now, **{
+            column: totals.get(pk, {}).get(column) or Decimal('0')
+            for column in aggregates})
+        for pk in parties
+    ]
+    PartySummary.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True, unique_fields=['party'],
+        update_fields=[*aggregates, 'updated_at'])
+
+    latest = Subquery(documents.filter(**{field: OuterRef('party')})
+                      .values(field).annotate(latest=Max(date_field)).values('latest'))
+    PartySummary.objects.filter(party__in=parties).update(
+        last_activity=Greatest(Coalesce(F('last_activity'), latest),
+                               Coalesce(latest, F('last_activity'))))
+
+
+def refresh_all(parties):
+    for group in GROUPS:
+        refresh(group, parties)
+
+
+def summary_of(party):
+    """Return the summary of ``party``, computing it if it has none yet."""
+    try:
+        return PartySummary.objects.get(party=party)
+    except PartySummary.DoesNotExist:
+        refresh_all({party.pk})
+        return PartySummary.objects.get(party=party)
+
+
+def rebuild(chunk_size=500):
+    """Recompute every summary; return the number of parties."""
+    PartySummary.objects.all().delete()
+    ids = list(Party.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), chunk_size):
+        refresh_all(ids[start:start + chunk_size])
+    return len(ids)
@@ -1,3 +1,1623 @@
-from django.test import TestCase
+import datetime
+import re
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import mixins
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from sales import models as sales_models
+
+from .fastlist import compile_plan
+from .management.commands import rebuild_balances
+from .models import (
+    Account, AccountName, BankTransaction, Bill, Check, Expense, Item,
+    JournalEntry, JournalEntryLine, LedgerPosting, Order, OrderItem, Party, PartySummary,
+    PurchaseInvoice, PurchaseOrder, PurchasePayment, Receivable, SalesInvoice, SalesPayment
+)
+from .pagination import keyset_filter
+from .posting import balance_as_of, deferred_posting, post_to_account
+from .reports import ACCOUNTS_KEY, AGING_KEY, period_key
+from .serializers import BankTransactionSerializer, OrderReadSerializer
+from .totals import deferred_totals
+from . import chart, typeahead
+from .views import BankTransactionViewSet, ReceivableViewSet, SalesPaymentViewSet
+
+
+TRANSACTION_CONTROL = re.compile(r'(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b')
+
+
+class DataQueries(CaptureQueriesContext):
+    """
+    Captures the queries of a block that read or write data, leaving out
+    the database cache backend's own and transaction control statements.
+    """
+
+    @property
+    def captured_queries(self):
+        return [query for query in super().captured_queries
+                if 'cache_table' not in query['sql']
+                and not TRANSACTION_CONTROL.match(query['sql'])]
+
+
+class ConcurrentPostingTest(TransactionTestCase):
+    """
+    Fire BankTransaction/Bill/Check writes from parallel threads and check
+    that every posting reaches Account.balance.
+    """
+    threads = 8
+    iterations = 10
+
+    def setUp(self):
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', bank_name='Bank', balance=0)
+        self.expense = Account.objects.create(
+            name='Expense', account_type='debit', balance=0)
+        self.payable = Account.objects.create(
+            name='Payable', account_type='credit', balance=0)
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+
+    def _retry(self, func):
+        # SQLite serialises writers with table locks; retry until we get in
+        for _ in range(200):
+            try:
+                with transaction.atomic():
+                    return func()
+            except OperationalError:
+                time.sleep(0.01)
+        raise AssertionError("Could not acquire the database lock")
+
+    def _worker(self, errors):
+        try:
+            for i in range(self.iterations):
+                self._retry(lambda: BankTransaction.objects.create(
+                    account=self.bank, deposit=Decimal('1.00')))
+                self._retry(lambda: Bill.objects.create(
+                    vendor=self.vendor, reference=f"B{i}",
+                    due_date=timezone.now(), amount=Decimal('2.00'),
+                    debit_account=self.expense, credit_account=self.payable))
+                self._retry(lambda: Check.objects.create(
+                    bank_account=self.bank, check_number=str(i),
+                    pay_to=self.expense, amount=Decimal('3.00')))
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_no_posting_is_lost(self):
+        errors = []
+        workers = [threading.Thread(target=self._worker, args=(errors,))
+                   for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+        rounds = self.threads * self.iterations
+        for account in (self.bank, self.expense, self.payable):
+            account.refresh_from_db()
+        # deposit +1, check -3 and the check's bank withdrawal -3
+        self.assertEqual(self.bank.balance, Decimal('-5.00') * rounds)
+        # bill debit +2 and check pay_to +3
+        self.assertEqual(self.expense.balance, Decimal('5.00') * rounds)
+        # bill credit +2 and the bill's bank withdrawal posted against it +2
+        self.assertEqual(self.payable.balance, Decimal('4.00') * rounds)
+
+
+class LedgerPostingTest(TestCase):
+    def setUp(self):
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=Decimal('100.00'),
+            as_of=timezone.make_aware(datetime.datetime(2024, 1, 1)))
+
+    def test_postings_mirror_balance_history(self):
+        jan = timezone.make_aware(datetime.datetime(2024, 1, 15))
+        feb = timezone.make_aware(datetime.datetime(2024, 2, 15))
+        BankTransaction.objects.create(
+            account=self.bank, date=jan, deposit=Decimal('50.00'))
+        txn = BankTransaction.objects.create(
+            account=self.bank, date=feb, withdrawal=Decimal('30.00'))
+
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal('120.00'))
+        # Opening adjustment + two transactions
+        self.assertEqual(self.bank.postings.count(), 3)
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2024, 1, 31)), Decimal('150.00'))
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2024, 2, 15)), Decimal('120.00'))
+
+        # Deleting a document appends a reversal instead of rewriting history
+        txn_id = txn.pk
+        txn.delete()
+        self.assertEqual(self.bank.postings.filter(
+            source_type='accounting.BankTransaction', source_id=txn_id).count(), 2)
+        self.assertEqual(
+            balance_as_of(self.bank, timezone.now()), Decimal('150.00'))
+
+    def test_postings_are_immutable(self):
+        posting = self.bank.postings.get()
+        posting.balance_delta = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            posting.save()
+        with self.assertRaises(ValueError):
+            posting.delete()
+
+
+class DeferredPostingTest(TestCase):
+    def setUp(self):
+        self.expense = Account.objects.create(
+            name='Expense', account_type='debit', balance=0)
+        self.payable = Account.objects.create(
+            name='Payable', account_type='credit', balance=0)
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+
+    def _import_bills(self, count):
+        for i in range(count):
+            Bill.objects.create(
+                vendor=self.vendor, reference=f"B{i}", due_date=timezone.now(),
+                amount=Decimal('2.50'), debit_account=self.expense,
+                credit_account=self.payable)
+
+    def test_one_balance_update_per_account(self):
+        with DataQueries(connection) as queries:
+            with deferred_posting():
+                self._import_bills(25)
+        balance_updates = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('UPDATE "accounting_account"')]
+        self.assertEqual(len(balance_updates), 2)
+
+        self.expense.refresh_from_db()
+        self.payable.refresh_from_db()
+        self.assertEqual(self.expense.balance, Decimal('62.50'))
+        # Credit plus the bill's bank withdrawal, exactly as when not deferred
+        self.assertEqual(self.payable.balance, Decimal('125.00'))
+        self.assertEqual(LedgerPosting.objects.count(), 75)
+
+    def test_failed_batch_posts_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with deferred_posting():
+                self._import_bills(3)
+                raise RuntimeError
+        self.expense.refresh_from_db()
+        self.assertEqual(self.expense.balance, Decimal('0'))
+        self.assertFalse(Bill.objects.exists())
+
+    def test_account_saved_in_batch_is_posted_once(self):
+        bank = Account.objects.create(name='Bank', account_type='debit',
+                                      balance=Decimal('100.00'))
+        with deferred_posting():
+            post_to_account(bank, Decimal('10.00'))
+            bank.name = 'Main bank'
+            bank.save()
+        bank.refresh_from_db()
+        self.assertEqual(bank.balance, Decimal('110.00'))
+        self.assertEqual(balance_as_of(bank, timezone.now()), Decimal('110.00'))
+
+
+class TrackedFieldsTest(TestCase):
+    def setUp(self):
+        self.expense = Account.objects.create(
+            name='Expense', account_type='debit', balance=0)
+        self.payable = Account.objects.create(
+            name='Payable', account_type='credit', balance=0)
+        vendor = Party.objects.create(name='Vendor', type='vendor')
+        Bill.objects.create(
+            vendor=vendor, reference='B1', due_date=timezone.now(),
+            amount=Decimal('10.00'), debit_account=self.expense,
+            credit_account=self.payable)
+
+    def test_update_reads_no_previous_row(self):
+        bill = Bill.objects.get()
+        bill.amount = Decimal('15.00')
+        with DataQueries(connection) as queries:
+            bill.save()
+        # The vendor's summary is re-aggregated; the bill itself is not re-read
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "accounting_bill"' in q['sql']
+            and '"accounting_bill"."id" =' in q['sql']])
+        self.expense.refresh_from_db()
+        self.assertEqual(self.expense.balance, Decimal('15.00'))
+
+        # The snapshot follows the save, so a second edit posts the new delta
+        bill.amount = Decimal('12.00')
+        bill.save()
+        self.expense.refresh_from_db()
+        self.assertEqual(self.expense.balance, Decimal('12.00'))
+
+    def test_hand_built_instance_posts_the_difference(self):
+        bill = Bill.objects.get()
+        Bill(pk=bill.pk, vendor_id=bill.vendor_id, reference='B1', due_date=bill.due_date,
+             amount=Decimal('15.00'), debit_account=self.expense,
+             credit_account=self.payable).save()
+        self.expense.refresh_from_db()
+        self.assertEqual(self.expense.balance, Decimal('15.00'))
+
+    def test_unchanged_amount_skips_posting(self):
+        bill = Bill.objects.get()
+        bill.memo = 'Edited'
+        postings = LedgerPosting.objects.count()
+        with DataQueries(connection) as queries:
+            bill.save()
+        # The UPDATE itself, and refreshing the bill's search document
+        self.assertEqual(len(queries.captured_queries), 2)
+        self.assertIn('search_index', queries.captured_queries[1]['sql'])
+        self.assertEqual(LedgerPosting.objects.count(), postings)
+
+
+class RebuildBalancesTest(TestCase):
+    def setUp(self):
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=Decimal('40.00'))
+        self.expense = Account.objects.create(
+            name='Expense', account_type='debit', balance=0)
+        self.payable = Account.objects.create(
+            name='Payable', account_type='credit', balance=0)
+        vendor = Party.objects.create(name='Vendor', type='vendor')
+        BankTransaction.objects.create(
+            account=self.bank, deposit=Decimal('12.35'))
+        Bill.objects.create(
+            vendor=vendor, reference='B1', due_date=timezone.now(),
+            amount=Decimal('10.10'), debit_account=self.expense,
+            credit_account=self.payable)
+        Check.objects.create(
+            bank_account=self.bank, check_number='1', pay_to=self.expense,
+            amount=Decimal('3.30'))
+        Expense.objects.create(amount=Decimal('0.70'),
+                               payment_account=self.expense)
+        entry = JournalEntry.objects.create()
+        JournalEntryLine.objects.create(
+            journal_entry=entry, account=self.payable, credit=Decimal('5.55'))
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_balances', *args, stdout=out)
+        return out.getvalue()
+
+    def test_consistent_books_report_no_drift(self):
+        self.assertIn('3 account(s), 0 out of balance', self.rebuild())
+
+    def test_drift_is_reported_and_corrected(self):
+        expected = Account.objects.get(pk=self.expense.pk).balance
+        Account.objects.filter(pk=self.expense.pk).update(balance=Decimal('1.00'))
+
+        output = self.rebuild('--chunk-size', '2')
+        self.assertIn('1 out of balance', output)
+        self.assertEqual(Account.objects.get(pk=self.expense.pk).balance,
+                         Decimal('1.00'))
+
+        self.rebuild('--apply')
+        self.assertEqual(Account.objects.get(pk=self.expense.pk).balance,
+                         expected)
+        # The correction is in the ledger too
+        self.assertEqual(balance_as_of(self.expense, timezone.now()), expected)
+        self.assertIn('0 out of balance', self.rebuild())
+
+    def test_posting_during_rebuild_is_counted_once(self):
+        correct = Account.objects.get(pk=self.bank.pk).balance
+        Account.objects.filter(pk=self.bank.pk).update(balance=Decimal('1.00'))
+        compute = rebuild_balances.compute_chunk
+
+        def compute_after_posting(chunk):
+            # Lands after the stored balances were read, before the aggregates
+            if not BankTransaction.objects.filter(deposit=Decimal('5.00')).exists():
+                BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+            return compute(chunk)
+
+        with mock.patch.object(rebuild_balances, 'compute_chunk', compute_after_posting):
+            self.rebuild('--apply')
+        self.assertEqual(Account.objects.get(pk=self.bank.pk).balance,
+                         correct + Decimal('5.00'))
+        self.assertIn('0 out of balance', self.rebuild())
+
+
+class TrialBalanceTest(APITestCase):
+    url = '/api/reports/trial-balance/'
+
+    def setUp(self):
+        cache.clear()
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=0)
+        self.payable = Account.objects.create(
+            name='Payable', account_type='credit', balance=0)
+        entry = JournalEntry.objects.create(
+            date=timezone.make_aware(datetime.datetime(2024, 1, 10)))
+        JournalEntryLine.objects.create(
+            journal_entry=entry, account=self.bank, debit=Decimal('80.00'))
+        JournalEntryLine.objects.create(
+            journal_entry=entry, account=self.payable, credit=Decimal('80.00'))
+
+    def rows(self, as_of):
+        response = self.client.get(self.url, {'as_of': as_of})
+        self.assertEqual(response.status_code, 200)
+        return response.data, {row['name']: row for row in response.data['accounts']}
+
+    def test_balances_as_of_date(self):
+        data, rows = self.rows('2024-01-31')
+        self.assertEqual(rows['Bank']['debit'], '80.00')
+        self.assertEqual(rows['Payable']['credit'], '80.00')
+        self.assertEqual(data['total_debit'], data['total_credit'])
+
+        _, rows = self.rows('2024-01-09')
+        self.assertEqual(rows['Bank']['balance'], '0.00')
+
+    def test_backdated_posting_invalidates_cached_period(self):
+        self.rows('2024-03-31')
+        with DataQueries(connection) as queries:
+            self.rows('2024-03-31')
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        BankTransaction.objects.create(
+            account=self.bank, deposit=Decimal('5.00'),
+            date=timezone.make_aware(datetime.datetime(2024, 2, 1)))
+        _, rows = self.rows('2024-03-31')
+        self.assertEqual(rows['Bank']['debit'], '85.00')
+
+    def test_redated_document_invalidates_both_periods(self):
+        self.assertEqual(self.rows('2024-01-31')[1]['Bank']['balance'], '80.00')
+        self.assertEqual(self.rows('2024-02-29')[1]['Bank']['balance'], '80.00')
+        entry = JournalEntry.objects.get()
+        # Redating posts nothing, yet moves the entry out of January
+        entry.date = timezone.make_aware(datetime.datetime(2024, 2, 15))
+        entry.save()
+        self.assertEqual(self.rows('2024-01-31')[1]['Bank']['balance'], '0.00')
+
+        # ...and back into it, which changes January again
+        entry.date = timezone.make_aware(datetime.datetime(2024, 1, 5))
+        entry.save()
+        self.assertEqual(self.rows('2024-01-31')[1]['Bank']['balance'], '80.00')
+
+    def test_account_changes_retire_cached_reports(self):
+        self.rows('2024-01-31')
+        self.payable.name = 'Payables'
+        self.payable.account_type = 'debit'
+        self.payable.save()
+        _, rows = self.rows('2024-01-31')
+        # Listed under its new name, on its new normal side
+        self.assertEqual(rows['Payables']['credit'], '80.00')
+        self.assertEqual(rows['Payables']['balance'], '-80.00')
+
+        Account.objects.create(name='Cash', account_type='debit', balance=0)
+        self.assertIn('Cash', self.rows('2024-01-31')[1])
+        Account.objects.get(name='Cash').delete()
+        self.assertNotIn('Cash', self.rows('2024-01-31')[1])
+
+    def test_report_cached_before_commit_is_retired(self):
+        as_of = datetime.date(2024, 3, 31)
+        with self.captureOnCommitCallbacks(execute=True):
+            BankTransaction.objects.create(
+                account=self.bank, deposit=Decimal('5.00'),
+                date=timezone.make_aware(datetime.datetime(2024, 2, 1)))
+            # Another worker caches the report from the data before the commit
+            generation = f"{cache.get(ACCOUNTS_KEY, 0)}.{cache.get(period_key(as_of), 0)}"
+            cache.set(f"reports:trial-balance:{as_of}:{generation}", {'stale': True})
+        data, rows = self.rows(as_of.isoformat())
+        self.assertEqual(rows['Bank']['debit'], '85.00')
+
+    def test_invalid_date(self):
+        response = self.client.get(self.url, {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BalanceSnapshotTest(TestCase):
+    def setUp(self):
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=0)
+        for month, amount in ((1, '10.00'), (2, '20.00'), (3, '40.00')):
+            BankTransaction.objects.create(
+                account=self.bank, deposit=Decimal(amount),
+                date=timezone.make_aware(datetime.datetime(2024, month, 10)))
+
+    def snapshot(self, until):
+        out = StringIO()
+        call_command('snapshot_balances', '--until', until, stdout=out)
+        return out.getvalue()
+
+    def test_lookup_starts_from_snapshot(self):
+        self.assertIn('3 snapshot(s)', self.snapshot('2024-03-31'))
+        snapshot = self.bank.balance_snapshots.get(period_end=datetime.date(2024, 2, 29))
+        self.assertEqual(snapshot.balance, Decimal('30.00'))
+
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2024, 3, 5)), Decimal('30.00'))
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2024, 3, 31)), Decimal('70.00'))
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2023, 12, 31)), Decimal('0'))
+
+    def test_backdated_posting_dirties_and_rebuilds(self):
+        self.snapshot('2024-03-31')
+        BankTransaction.objects.create(
+            account=self.bank, deposit=Decimal('5.00'),
+            date=timezone.make_aware(datetime.datetime(2024, 2, 1)))
+        self.assertEqual(
+            list(self.bank.balance_snapshots.filter(is_dirty=True).values_list(
+                'period_end', flat=True)),
+            [datetime.date(2024, 2, 29), datetime.date(2024, 3, 31)])
+
+        # Rebuilt lazily by the lookup...
+        self.assertEqual(
+            balance_as_of(self.bank, datetime.date(2024, 3, 5)), Decimal('35.00'))
+        self.assertFalse(self.bank.balance_snapshots.get(
+            period_end=datetime.date(2024, 2, 29)).is_dirty)
+        # ...or by the next run
+        self.snapshot('2024-03-31')
+        self.assertFalse(self.bank.balance_snapshots.filter(is_dirty=True).exists())
+        self.assertEqual(self.bank.balance_snapshots.get(
+            period_end=datetime.date(2024, 3, 31)).balance, Decimal('75.00'))
+
+    def test_backdated_posting_to_new_account(self):
+        self.snapshot('2024-03-31')
+        cash = Account.objects.create(name='Cash', account_type='debit', balance=0)
+        BankTransaction.objects.create(
+            account=cash, deposit=Decimal('7.00'),
+            date=timezone.make_aware(datetime.datetime(2024, 1, 20)))
+        self.snapshot('2024-03-31')
+        self.assertEqual(cash.balance_snapshots.get(
+            period_end=datetime.date(2024, 3, 31)).balance, Decimal('7.00'))
+        self.assertEqual(
+            balance_as_of(cash, datetime.date(2024, 2, 15)), Decimal('7.00'))
+
+    def test_lazily_rebuilt_account_is_carried_forward(self):
+        self.snapshot('2024-03-31')
+        cash = Account.objects.create(name='Cash', account_type='debit', balance=0)
+        BankTransaction.objects.create(
+            account=cash, deposit=Decimal('7.00'),
+            date=timezone.make_aware(datetime.datetime(2024, 2, 20)))
+        # The lookup rebuilds the lone February row, leaving nothing dirty
+        self.assertEqual(
+            balance_as_of(cash, datetime.date(2024, 3, 5)), Decimal('7.00'))
+        self.assertFalse(cash.balance_snapshots.filter(is_dirty=True).exists())
+
+        BankTransaction.objects.create(
+            account=cash, deposit=Decimal('3.00'),
+            date=timezone.make_aware(datetime.datetime(2024, 4, 10)))
+        self.snapshot('2024-04-30')
+        self.assertEqual(cash.balance_snapshots.get(
+            period_end=datetime.date(2024, 4, 30)).balance, Decimal('10.00'))
+        self.assertEqual(
+            balance_as_of(cash, datetime.date(2024, 5, 15)), Decimal('10.00'))
+        self.assertEqual(self.bank.balance_snapshots.get(
+            period_end=datetime.date(2024, 4, 30)).balance, Decimal('70.00'))
+
+
+class ChartRollupTest(APITestCase):
+    url = '/api/account-names/tree/'
+
+    def setUp(self):
+        cache.clear()
+        self.assets = AccountName.objects.create(name='Assets')
+        self.current = AccountName.objects.create(name='Current', parent=self.assets)
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=Decimal('10.00'),
+            parent_account=self.current)
+        self.fixed = Account.objects.create(
+            name='Fixed', account_type='debit', balance=0,
+            parent_account=self.assets)
+
+    def balances(self):
+        return dict(AccountName.objects.values_list('name', 'balance'))
+
+    def test_postings_roll_up_the_hierarchy(self):
+        self.assertEqual(self.balances(),
+                         {'Assets': Decimal('10.00'), 'Current': Decimal('10.00')})
+        BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+        with deferred_posting():
+            BankTransaction.objects.create(account=self.bank, deposit=Decimal('1.00'))
+            BankTransaction.objects.create(account=self.fixed, deposit=Decimal('2.00'))
+        self.assertEqual(self.balances(),
+                         {'Assets': Decimal('18.00'), 'Current': Decimal('16.00')})
+
+        # Moving an account moves its balance
+        self.bank.refresh_from_db()
+        self.bank.parent_account = self.assets
+        self.bank.save()
+        self.assertEqual(self.balances(),
+                         {'Assets': Decimal('18.00'), 'Current': Decimal('0.00')})
+        self.fixed.delete()
+        self.assertEqual(self.balances()['Assets'], Decimal('16.00'))
+
+    def test_single_posting_is_one_rollup_statement(self):
+        with DataQueries(connection) as queries:
+            BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+        rollups = [q for q in queries.captured_queries
+                   if q['sql'].startswith('UPDATE "accounting_accountname"')]
+        self.assertEqual(len(rollups), 1)
+
+    def test_tree_is_one_query_then_cached(self):
+        with DataQueries(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(len(queries.captured_queries), 1)
+        [assets] = response.data['groups']
+        self.assertEqual(assets['balance'], '10.00')
+        self.assertEqual(assets['children'][0]['accounts'][0]['name'], 'Bank')
+
+        with DataQueries(connection) as queries:
+            self.client.get(self.url)
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+        self.assertEqual(self.client.get(self.url).data['groups'][0]['balance'], '15.00')
+
+    def test_rollups_follow_a_group_moved_by_another_worker(self):
+        BankTransaction.objects.create(account=self.bank, deposit=Decimal('1.00'))
+        # Moved without this process seeing any signal
+        AccountName.objects.filter(pk=self.current.pk).update(parent=None)
+        BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+        self.assertEqual(self.balances(),
+                         {'Assets': Decimal('11.00'), 'Current': Decimal('16.00')})
+
+    def test_tree_cached_before_commit_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BankTransaction.objects.create(account=self.bank, deposit=Decimal('5.00'))
+            # Another worker caches the tree from the data before the commit
+            cache.set(chart.TREE_KEY, {'groups': [{'balance': '10.00'}]}, None)
+        self.assertEqual(self.client.get(self.url).data['groups'][0]['balance'], '15.00')
+
+
+class PostingProfileTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cash = Account.objects.create(
+            name='Cash', number='1000', account_type='debit', balance=0)
+        self.receivable = Account.objects.create(
+            name='Receivable', number='1200', account_type='debit', balance=0)
+        self.revenue = Account.objects.create(
+            name='Revenue', number='4000', account_type='credit', balance=0)
+        self.customer = Party.objects.create(name='Customer', type='customer')
+
+    def create_order(self, number):
+        return Order.objects.create(order_number=number, customer=self.customer,
+                                    total_amount=Decimal('25.00'))
+
+    def test_accounts_resolved_once(self):
+        self.create_order('O1')
+        with DataQueries(connection) as queries:
+            order = self.create_order('O2')
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "accounting_account"' in q['sql']])
+        invoice = order.invoices.get()
+        # Without configuration the lowest-id account of each type is used
+        self.assertEqual(invoice.debit_account, self.cash)
+        self.assertEqual(invoice.credit_account, self.revenue)
+
+    def test_configured_accounts_and_invalidation(self):
+        with self.settings(ACCOUNTING_POSTING_ACCOUNTS={'receivable': '1200'}):
+            invoice = self.create_order('O1').invoices.get()
+            self.assertEqual(invoice.debit_account, self.receivable)
+
+            self.receivable.number = '1201'
+            self.receivable.save()
+            invoice = self.create_order('O2').invoices.get()
+            self.assertEqual(invoice.debit_account, self.cash)
+
+
+class OrderPropagationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.receivable = Account.objects.create(
+            name='Receivable', account_type='debit', balance=0)
+        self.revenue = Account.objects.create(
+            name='Revenue', account_type='credit', balance=0)
+        self.customer = Party.objects.create(name='Customer', type='customer')
+
+    def create_order(self, number, documents):
+        order = Order.objects.create(order_number=number, customer=self.customer,
+                                     total_amount=Decimal('10.00'))
+        for _ in range(documents - 1):
+            invoice = SalesInvoice.objects.create(
+                order=order, amount=Decimal('10.00'), customer=self.customer,
+                debit_account=self.receivable, credit_account=self.revenue)
+            SalesPayment.objects.create(invoice=invoice, amount=Decimal('10.00'),
+                                        payment_mode='cash')
+        return Order.objects.get(pk=order.pk)
+
+    def edit_total(self, order):
+        order.total_amount = Decimal('15.00')
+        with DataQueries(connection) as queries:
+            order.save()
+        return len(queries.captured_queries)
+
+    def test_constant_queries_and_correct_balances(self):
+        small = self.edit_total(self.create_order('O1', 2))
+        large = self.edit_total(self.create_order('O2', 10))
+        self.assertEqual(small, large)
+
+        self.assertFalse(SalesInvoice.objects.exclude(amount=Decimal('15.00')).exists())
+        self.assertFalse(SalesPayment.objects.exclude(amount=Decimal('15.00')).exists())
+        out = StringIO()
+        call_command('rebuild_balances', stdout=out)
+        self.assertIn('0 out of balance', out.getvalue())
+        self.revenue.refresh_from_db()
+        self.assertEqual(self.revenue.balance, Decimal('180.00'))
+
+    def test_payment_mode_change_reaches_payments(self):
+        order = self.create_order('O1', 3)
+        order.payment_mode = 'bank'
+        order.save()
+        self.assertEqual(
+            set(SalesPayment.objects.values_list('payment_mode', 'status')),
+            {('bank', 'pending')})
+
+    def test_purchase_order_changes_reach_invoices_and_payments(self):
+        vendor = Party.objects.create(name='Vendor', type='vendor')
+        purchase_order = PurchaseOrder.objects.create(
+            vendor=vendor, payment_mode='bank',
+            total_including_tax=Decimal('20.00'))
+        purchase_order = PurchaseOrder.objects.get(pk=purchase_order.pk)
+        purchase_order.total_including_tax = Decimal('22.00')
+        purchase_order.payment_status = 'paid'
+        purchase_order.save()
+        self.assertEqual(PurchaseInvoice.objects.get().invoice_amount, Decimal('22.00'))
+        self.assertEqual(
+            list(PurchasePayment.objects.values_list('amount', 'status')),
+            [(Decimal('22.00'), 'paid')])
+
+
+class OrderTotalTest(APITestCase):
+    url = '/api/orders/'
+
+    def setUp(self):
+        cache.clear()
+        Account.objects.create(name='Receivable', account_type='debit', balance=0)
+        Account.objects.create(name='Revenue', account_type='credit', balance=0)
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.item = Item.objects.create(name='Widget', price=Decimal('2.00'))
+
+    def order_writes(self, queries):
+        return [q for q in queries.captured_queries
+                if q['sql'].startswith(('INSERT INTO "accounting_order"',
+                                        'UPDATE "accounting_order"'))]
+
+    def post_order(self, number, lines, **fields):
+        payload = {
+            'order_number': number, 'customer': self.customer.pk,
+            'payment_mode': 'cash',
+            'items': [{'item_id': self.item.pk, 'quantity': 2, 'unit_price': '1.50'}] * lines,
+            **fields,
+        }
+        with DataQueries(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(order_number=number), self.order_writes(queries)
+
+    def test_order_writes_do_not_grow_with_lines(self):
+        small, small_writes = self.post_order('O1', 1)
+        large, large_writes = self.post_order('O2', 25)
+        # The insert, then the total
+        self.assertEqual(len(small_writes), 2)
+        self.assertEqual(len(large_writes), 2)
+        self.assertEqual(large.total_amount, Decimal('75.00'))
+
+        payload = {'items': [{'item_id': self.item.pk, 'quantity': 1,
+                              'unit_price': '4.00'}] * 10}
+        with DataQueries(connection) as queries:
+            response = self.client.patch(f"{self.url}{large.pk}/", payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(self.order_writes(queries)), 1)
+        large.refresh_from_db()
+        self.assertEqual(large.total_amount, Decimal('40.00'))
+
+    def test_created_order_raises_invoice_as_sent(self):
+        # Saved with the total it was sent (none here) before its lines, so
+        # no invoice is raised for it
+        order, _ = self.post_order('O1', 2)
+        self.assertEqual(order.total_amount, Decimal('6.00'))
+        self.assertFalse(order.invoices.exists())
+
+        # A total sent with the order raises one, which follows the lines
+        order, _ = self.post_order('O2', 2, total_amount='1.00')
+        self.assertEqual(order.total_amount, Decimal('6.00'))
+        self.assertEqual(order.invoices.get().amount, Decimal('6.00'))
+
+    def test_line_edits_recompute_once(self):
+        order, _ = self.post_order('O1', 1)
+        line = order.items.get()
+        line.quantity = 4
+        line.save()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('6.00'))
+
+        with DataQueries(connection) as queries:
+            with deferred_totals():
+                for _ in range(5):
+                    OrderItem.objects.create(order=order, item=self.item,
+                                             quantity=1, unit_price=Decimal('1.00'))
+        self.assertEqual(len(self.order_writes(queries)), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('11.00'))
+
+        line.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('5.00'))
+
+
+class NestedLineWriteTest(APITestCase):
+    url = '/api/purchase-orders/'
+
+    def setUp(self):
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+        self.items = [Item.objects.create(name=f"Part {i}", price=Decimal('3.00'))
+                      for i in range(30)]
+
+    def post_order(self, lines):
+        payload = {
+            'vendor': self.vendor.pk, 'payment_mode': 'bank',
+            'tax_value': '10.00',
+            # Every other line takes its price from the item
+            'items': [{'item_id': item.pk, 'quantity': 2,
+                       **({'unit_price': '1.00'} if i % 2 else {})}
+                      for i, item in enumerate(self.items[:lines])],
+        }
+        with DataQueries(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return PurchaseOrder.objects.get(pk=response.data['id']), len(queries)
+
+    def test_queries_do_not_grow_with_lines(self):
+        _, small = self.post_order(2)
+        purchase_order, large = self.post_order(30)
+        self.assertEqual(small, large)
+        # 15 lines at 2 x 3.00 and 15 at 2 x 1.00, plus 10% tax
+        self.assertEqual(purchase_order.po_value, Decimal('120.00'))
+        self.assertEqual(purchase_order.total_including_tax, Decimal('132.00'))
+        # Saved without a total before its lines: no invoice, as ever
+        self.assertFalse(PurchaseInvoice.objects.filter(
+            purchase_order=purchase_order).exists())
+
+    def test_unknown_item_is_rejected(self):
+        response = self.client.post(self.url, {
+            'vendor': self.vendor.pk, 'items': [{'item_id': 0, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+
+class LineSyncTest(APITestCase):
+    url = '/api/orders/'
+
+    def setUp(self):
+        cache.clear()
+        customer = Party.objects.create(name='Customer', type='customer')
+        self.item = Item.objects.create(name='Widget', price=Decimal('2.00'))
+        response = self.client.post(self.url, {
+            'order_number': 'O1', 'customer': customer.pk, 'payment_mode': 'cash',
+            'items': [{'item_id': self.item.pk, 'quantity': q, 'unit_price': '1.00'}
+                      for q in (1, 2, 3)],
+        }, format='json')
+        self.order = Order.objects.get(pk=response.data['id'])
+        self.lines = list(self.order.items.order_by('pk').values_list('pk', flat=True))
+
+    def patch(self, items):
+        with DataQueries(connection) as queries:
+            response = self.client.patch(f"{self.url}{self.order.pk}/",
+                                         {'items': items}, format='json')
+        writes = [q['sql'].split()[0] for q in queries.captured_queries
+                  if 'accounting_orderitem' in q['sql'].split('WHERE')[0]
+                  and not q['sql'].startswith('SELECT')]
+        return response, writes
+
+    def test_only_changed_lines_are_written(self):
+        first, second, third = self.lines
+        response, writes = self.patch([
+            {'id': first, 'item_id': self.item.pk, 'quantity': 1, 'unit_price': '1.00'},
+            {'id': second, 'item_id': self.item.pk, 'quantity': 5, 'unit_price': '1.00'},
+            {'item_id': self.item.pk, 'quantity': 4, 'unit_price': '1.00'},
+        ])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+
+        lines = dict(self.order.items.values_list('pk', 'quantity'))
+        self.assertEqual(lines[first], 1)
+        self.assertEqual(lines[second], 5)
+        self.assertNotIn(third, lines)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('10.00'))
+
+    def test_foreign_line_id_is_rejected(self):
+        response, _ = self.patch([{'id': 0, 'item_id': self.item.pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.order.items.count(), 3)
+
+
+class CursorPaginationTest(APITestCase):
+    url = '/api/bank-transactions/'
+
+    def setUp(self):
+        account = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        day = timezone.make_aware(datetime.datetime(2024, 3, 1, 9))
+        # Two rows per timestamp, so pages have to break ties on id
+        with deferred_posting():
+            self.transactions = [
+                BankTransaction.objects.create(
+                    account=account, deposit=Decimal('1.00'),
+                    date=day + datetime.timedelta(hours=n // 2))
+                for n in range(7)
+            ]
+
+    def test_pages_follow_date_then_id(self):
+        expected = [t.pk for t in sorted(self.transactions,
+                                         key=lambda t: (t.date, t.pk), reverse=True)]
+        seen, url, params = [], self.url, {'page_size': 2}
+        while url:
+            with DataQueries(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            # Past the ETag fingerprint, the page is one range read
+            [page_sql] = [q['sql'] for q in queries.captured_queries
+                          if 'ORDER BY' in q['sql']]
+            self.assertNotIn('COUNT(', page_sql)
+            self.assertNotIn('OFFSET', page_sql)
+            seen += [row['id'] for row in response.data['results']]
+            last, url, params = response.data, response.data['next'], None
+        self.assertEqual(seen, expected)
+
+        # And back again from the last page
+        back = last['results']
+        while last['previous']:
+            last = self.client.get(last['previous']).data
+            back = last['results'] + back
+        self.assertEqual([row['id'] for row in back], expected)
+
+    def test_reference_tables_are_not_paginated(self):
+        AccountName.objects.create(name='Assets')
+        response = self.client.get('/api/account-names/')
+        self.assertEqual([group['name'] for group in response.data], ['Assets'])
+
+
+class ListQueryCountTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+        self.bank = Account.objects.create(
+            name='Bank', account_type='debit', balance=0, bank_name='Bank')
+        self.expense = Account.objects.create(name='Expense', account_type='debit', balance=0)
+
+    def add_rows(self, count):
+        with deferred_posting():
+            for n in range(count):
+                BankTransaction.objects.create(account=self.bank, payee=self.vendor,
+                                               deposit=Decimal('1.00'))
+                Check.objects.create(bank_account=self.bank, pay_to=self.expense,
+                                     vendor=self.vendor, check_number=str(n),
+                                     amount=Decimal('1.00'))
+
+    def queries(self, url):
+        with DataQueries(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_rows(2)
+        few = [self.queries(url) for url in ('/api/bank-transactions/', '/api/checks/')]
+        self.add_rows(8)
+        many = [self.queries(url) for url in ('/api/bank-transactions/', '/api/checks/')]
+        self.assertEqual(few, many)
+        # The ETag fingerprint, then the page
+        self.assertEqual(many, [2, 2])
+
+
+class FastListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        vendor = Party.objects.create(name='Vendor', type='vendor')
+        bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        with deferred_posting():
+            for n in range(6):
+                BankTransaction.objects.create(
+                    account=bank, payee=vendor if n % 2 else None,
+                    description=f"Row {n}", deposit=Decimal('1.25') * n)
+
+    def responses(self, url, **params):
+        fast = self.client.get(url, params)
+        with mock.patch.object(BankTransactionViewSet, 'fast_list', False):
+            slow = self.client.get(url, params)
+        return fast, slow
+
+    def test_output_matches_serializer(self):
+        url = '/api/bank-transactions/'
+        for params in ({}, {'page_size': 4}, {'expand': 'account'},
+                       {'fields': 'id,deposit,payee'}):
+            fast, slow = self.responses(url, **params)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content)
+        # The cursor built from values() rows pages the same way
+        fast, slow = self.responses(url, page_size=4)
+        self.assertEqual(self.client.get(fast.data['next']).content,
+                         self.client.get(slow.data['next']).content)
+
+    def test_one_query_per_page(self):
+        with DataQueries(connection) as queries:
+            self.client.get('/api/bank-transactions/')
+        # The ETag fingerprint, then the page
+        self.assertEqual(len(queries), 2)
+
+    def test_fast_path_is_used(self):
+        customer = Party.objects.create(name='Customer', type='customer')
+        invoice = SalesInvoice.objects.create(customer=customer, amount=Decimal('5.00'))
+        SalesPayment.objects.create(invoice=invoice, amount=Decimal('5.00'),
+                                    payment_mode='cash')
+        for viewset in (BankTransactionViewSet, SalesPaymentViewSet, ReceivableViewSet):
+            view = viewset.as_view({'get': 'list'})
+            # The serializer's list is the fallback
+            with mock.patch.object(mixins.ListModelMixin, 'list') as fallback:
+                with DataQueries(connection) as queries:
+                    response = view(APIRequestFactory().get('/'))
+            fallback.assert_not_called()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['results'])
+            # The ETag fingerprint, then the page
+            self.assertEqual(len(queries), 2, viewset)
+
+    def test_unsupported_serializers_fall_back(self):
+        self.assertIsNotNone(compile_plan(BankTransactionSerializer()))
+        # Order lines are a to-many relation and subtotal is a method
+        self.assertIsNone(compile_plan(OrderReadSerializer()))
+        self.assertIsNotNone(compile_plan(OrderReadSerializer(
+            context={'request': mock.Mock(method='GET', query_params={'fields': 'id,customer,total_amount'})})))
+
+
+class SparseFieldsTest(APITestCase):
+    url = '/api/orders/'
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.item = Item.objects.create(name='Widget', price=Decimal('2.00'))
+        self.order = Order.objects.create(order_number='O1', customer=self.customer,
+                                          payment_mode='cash')
+        self.line = OrderItem.objects.create(order=self.order, item=self.item,
+                                             quantity=2, unit_price=Decimal('1.50'))
+
+    def first_row(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def test_fields_subset(self):
+        self.assertEqual(set(self.first_row(fields='id,total_amount')),
+                         {'id', 'total_amount'})
+        # Unknown names are ignored rather than rejected
+        self.assertEqual(set(self.first_row(fields='id,missing,items.missing')),
+                         {'id', 'items'})
+        row = self.first_row(fields='id,items.quantity')
+        self.assertEqual(row['items'], [{'quantity': 2}])
+        # A nested serializer named without a sub-path renders in full
+        row = self.first_row(fields='customer')
+        self.assertEqual(row['customer']['name'], 'Customer')
+
+    def test_expand(self):
+        # Only the listed relations are nested, the rest are ids
+        row = self.first_row(expand='customer')
+        self.assertEqual(row['customer']['name'], 'Customer')
+        self.assertEqual(row['items'], [self.line.pk])
+
+        row = self.first_row(expand='items')
+        self.assertEqual(row['customer'], self.customer.pk)
+        self.assertEqual(row['items'][0]['item'], self.item.pk)
+
+        row = self.first_row(fields='id,items.item', expand='items,items.item')
+        self.assertEqual(row, {'id': self.order.pk,
+                               'items': [{'item': row['items'][0]['item']}]})
+        self.assertEqual(row['items'][0]['item']['name'], 'Widget')
+
+        # Without the parameters the output is unchanged
+        row = self.first_row()
+        self.assertEqual(row['customer']['name'], 'Customer')
+        self.assertEqual(row['items'][0]['item']['name'], 'Widget')
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        self.payee = Party.objects.create(name='Payee', type='vendor')
+        BankTransaction.objects.create(account=self.bank, payee=self.payee,
+                                       deposit=Decimal('5.00'))
+
+    def revalidate(self, url, response):
+        with DataQueries(connection) as queries:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        return again, len(queries)
+
+    def test_unchanged_list_is_not_modified(self):
+        url = '/api/bank-transactions/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        again, queries = self.revalidate(url, response)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(queries, 1)
+
+        # Changes to nested rows count too
+        self.payee.name = 'Renamed'
+        self.payee.save()
+        again, _ = self.revalidate(url, response)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['results'][0]['payee']['name'], 'Renamed')
+
+    def test_posting_changes_account_etag(self):
+        url = f"/api/accounts/{self.bank.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 304)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # Balances move through F() updates, which bump updated_at as well
+        response = self.client.get('/api/accounts/')
+        time.sleep(0.01)
+        BankTransaction.objects.create(account=self.bank, deposit=Decimal('1.00'))
+        again, _ = self.revalidate('/api/accounts/', response)
+        self.assertEqual(again.status_code, 200)
+
+    def test_order_lines_change_order_etag(self):
+        item = Item.objects.create(name='Widget', price=Decimal('2.00'))
+        order = Order.objects.create(order_number='O1')
+        line = OrderItem.objects.create(order=order, item=item, quantity=1,
+                                        unit_price=Decimal('2.00'))
+        url = f"/api/orders/{order.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 304)
+        line.delete()
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+
+class FilterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        self.payable = Account.objects.create(name='Payable', account_type='credit', balance=0)
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+        self.other = Party.objects.create(name='Other', type='vendor')
+        day = timezone.make_aware(datetime.datetime(2024, 3, 1, 12))
+        self.bills = [
+            Bill.objects.create(vendor=party, reference=str(n), amount=Decimal(amount),
+                                bill_date=day + datetime.timedelta(days=n), due_date=day,
+                                status=status, debit_account=debit,
+                                credit_account=self.payable)
+            for n, (party, amount, status, debit) in enumerate([
+                (self.vendor, '10.00', 'open', self.bank),
+                (self.vendor, '20.00', 'paid', None),
+                (self.other, '30.00', 'open', self.bank),
+            ])]
+
+    def ids(self, **params):
+        response = self.client.get('/api/bills/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['id'] for row in response.data['results'])
+
+    def expected(self, *positions):
+        return sorted(self.bills[n].pk for n in positions)
+
+    def test_filters(self):
+        # Bare dates cover the whole day on datetime columns
+        self.assertEqual(self.ids(bill_date_from='2024-03-02', bill_date_to='2024-03-02'),
+                         self.expected(1))
+        self.assertEqual(self.ids(bill_date_to='2024-03-02'), self.expected(0, 1))
+        self.assertEqual(self.ids(status='open'), self.expected(0, 2))
+        self.assertEqual(self.ids(status='open,paid'), self.expected(0, 1, 2))
+        self.assertEqual(self.ids(party=self.other.pk), self.expected(2))
+        self.assertEqual(self.ids(amount_min='15', amount_max='30.00'), self.expected(1, 2))
+        self.assertEqual(self.ids(party=self.vendor.pk, status='open'), self.expected(0))
+        self.assertEqual(self.ids(unknown='x'), self.expected(0, 1, 2))
+
+    def test_account_matches_either_side(self):
+        self.assertEqual(self.ids(account=self.bank.pk), self.expected(0, 2))
+        self.assertEqual(self.ids(account=self.payable.pk), self.expected(0, 1, 2))
+
+    def test_invalid_values_are_rejected_before_querying(self):
+        with DataQueries(connection) as queries:
+            response = self.client.get('/api/bills/', {
+                'bill_date_from': 'March', 'amount_min': 'ten', 'party': '1,x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'bill_date_from', 'amount_min', 'party'})
+        self.assertEqual(len(queries), 0)
+
+        # Fields with choices only accept those
+        response = self.client.get('/api/accounts/', {'type': 'debit,asset'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('type', response.data)
+
+    def test_datetime_bounds(self):
+        self.assertEqual(self.ids(bill_date_from='2024-03-02T12:00:00',
+                                  bill_date_to='2024-03-03T11:59:59'),
+                         self.expected(1))
+        noon = timezone.make_aware(datetime.datetime(2024, 3, 1, 12))
+        Order.objects.create(order_number='O1', order_date=noon)
+        later = Order.objects.create(order_number='O2', order_date=noon + datetime.timedelta(days=4))
+        response = self.client.get('/api/orders/', {'order_date_from': '2024-03-02'})
+        self.assertEqual([row['id'] for row in response.data['results']], [later.pk])
+
+
+class SearchTest(APITestCase):
+    url = '/api/search/'
+
+    def setUp(self):
+        self.vendor = Party.objects.create(name='Acme Supplies', type='vendor',
+                                           email='billing@acme.test')
+        self.item = Item.objects.create(name='Widget', sku='WID-1', price=Decimal('2.00'),
+                                        description='Blue acme widget')
+        bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        self.bill = Bill.objects.create(vendor=self.vendor, reference='INV-77', amount=1,
+                                        memo='Quarterly acme supplies', due_date=timezone.now(),
+                                        credit_account=bank)
+        # Paying the bill records a bank transaction described by its memo
+        self.payment = BankTransaction.objects.get(account=bank)
+
+    def hits(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(hit['kind'], hit['id']) for hit in response.data['results']]
+
+    def test_ranked_prefix_search(self):
+        hits = self.hits(q='acme')
+        # The party matches in its title, so it ranks first
+        self.assertEqual(hits[0], ('party', self.vendor.pk))
+        self.assertCountEqual(hits, [('party', self.vendor.pk), ('item', self.item.pk),
+                                     ('bill', self.bill.pk),
+                                     ('bank_transaction', self.payment.pk)])
+        self.assertCountEqual(self.hits(q='acme sup'), [('party', self.vendor.pk),
+                                                        ('bill', self.bill.pk),
+                                                        ('bank_transaction', self.payment.pk)])
+        self.assertEqual(self.hits(q='billing@acme.test'), [('party', self.vendor.pk)])
+        self.assertEqual(self.hits(q='wid-1'), [('item', self.item.pk)])
+        self.assertCountEqual(self.hits(q='acme', kind='bill,item'),
+                              [('item', self.item.pk), ('bill', self.bill.pk)])
+        self.assertEqual(self.hits(q='"acme" OR NEAR('), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.vendor.name = 'Globex'
+        self.vendor.save()
+        self.assertEqual(self.hits(q='globex'), [('party', self.vendor.pk)])
+        self.assertNotIn(('party', self.vendor.pk), self.hits(q='acme sup'))
+        self.item.delete()
+        self.assertEqual(self.hits(q='widget'), [])
+
+    def test_rebuild_command_indexes_bulk_rows(self):
+        Party.objects.bulk_create([Party(name=f"Initech {n}", type='customer')
+                                   for n in range(3)])
+        self.assertEqual(self.hits(q='initech'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.hits(q='initech')), 3)
+        self.assertEqual(len(self.hits(q='acme')), 4)
+
+    def test_paging_and_validation(self):
+        response = self.client.get(self.url, {'q': 'acme', 'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        rest = self.client.get(response.data['next']).data
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'acme', 'kind': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'acme', 'limit': 'x'}).status_code, 400)
+
+
+class TypeaheadTest(APITestCase):
+    url = '/api/typeahead/parties/'
+
+    def setUp(self):
+        cache.clear()
+        typeahead._indexes.clear()
+        for name in ['Acme Supplies', 'Acorn Café', 'Beta Acme', 'Globex']:
+            Party.objects.create(name=name, type='customer')
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data]
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.names(q='ac'), ['Acme Supplies', 'Beta Acme', 'Acorn Café'])
+        self.assertEqual(self.names(q='acme s'), ['Acme Supplies'])
+        self.assertEqual(self.names(q='CAFE'), ['Acorn Café'])
+        self.assertEqual(self.names(q='ac', limit=1), ['Acme Supplies'])
+        self.assertEqual(self.names(), ['Acme Supplies', 'Acorn Café', 'Beta Acme', 'Globex'])
+        self.assertEqual(self.client.get('/api/typeahead/nothing/').status_code, 404)
+
+    def test_keystrokes_do_not_query(self):
+        self.names(q='a')
+        with DataQueries(connection) as queries:
+            self.assertEqual(self.names(q='gl'), ['Globex'])
+        self.assertEqual(len(queries), 0)
+
+    def test_saves_and_deletes_update_the_index(self):
+        self.names(q='a')
+        with self.captureOnCommitCallbacks(execute=True):
+            party = Party.objects.create(name='Acrobat', type='vendor')
+        self.assertIn('Acrobat', self.names(q='acr'))
+        with self.captureOnCommitCallbacks(execute=True):
+            party.name = 'Initech'
+            party.save()
+        self.assertEqual(self.names(q='acr'), [])
+        # Another process rebuilds its index from the shared cache, not the database
+        typeahead._indexes.clear()
+        with DataQueries(connection) as queries:
+            self.assertEqual(self.names(q='ini'), ['Initech'])
+        self.assertEqual(len(queries), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            party.delete()
+        self.assertEqual(self.names(q='ini'), [])
+
+    def test_names_loaded_before_a_commit_are_not_kept(self):
+        party = Party.objects.get(name='Globex')
+        self.names(q='a')
+        with self.captureOnCommitCallbacks(execute=True):
+            party.name = 'Initech'
+            party.save()
+            # Another process reloads the names from the data before the commit
+            typeahead._indexes.clear()
+            with mock.patch.object(typeahead, 'load_names',
+                                   return_value={party.pk: 'Globex'}):
+                self.assertEqual(self.names(q='gl'), ['Globex'])
+        self.assertEqual(self.names(q='gl'), [])
+        self.assertEqual(self.names(q='ini'), ['Initech'])
+
+    def test_concurrent_renames_are_both_kept(self):
+        first, second = Party.objects.filter(name__in=['Globex', 'Beta Acme'])
+        self.names(q='a')
+        first.name, second.name = 'Initech', 'Hooli'
+        first.save()
+        second.save()
+        # The second writer read the version before the first one retired it
+        version = typeahead.current_version('parties')
+        typeahead.update('parties', first.pk, 'Initech')
+        with mock.patch.object(typeahead, 'current_version', return_value=version):
+            typeahead.update('parties', second.pk, 'Hooli')
+        self.assertEqual(self.names(q='ini'), ['Initech'])
+        self.assertEqual(self.names(q='hoo'), ['Hooli'])
+
+
+class AgingReportTest(APITestCase):
+    as_of = datetime.date(2024, 6, 30)
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+        self.bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+
+    def days_ago(self, days):
+        return timezone.make_aware(datetime.datetime.combine(
+            self.as_of - datetime.timedelta(days=days), datetime.time(12)))
+
+    def report(self, name):
+        with DataQueries(connection) as queries:
+            response = self.client.get(f"/api/reports/{name}/", {'as_of': self.as_of})
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_receivables_across_both_invoice_tables(self):
+        invoice = SalesInvoice.objects.create(customer=self.customer, amount=Decimal('100.00'),
+                                              date=self.days_ago(10))
+        SalesPayment.objects.create(invoice=invoice, amount=Decimal('40.00'),
+                                    payment_mode='cash', date=self.days_ago(5))
+        SalesPayment.objects.create(invoice=invoice, amount=Decimal('10.00'),
+                                    payment_mode='bank', status='pending', date=self.days_ago(5))
+        # Paid after the as-of date: still open on it
+        SalesPayment.objects.create(invoice=invoice, amount=Decimal('60.00'),
+                                    payment_mode='cash', date=self.days_ago(-1))
+        SalesInvoice.objects.create(customer=self.customer, amount=Decimal('70.00'),
+                                    date=self.days_ago(100))
+        SalesInvoice.objects.create(customer=self.customer, amount=Decimal('5.00'),
+                                    date=self.days_ago(100), status='void')
+        sales_models.SalesInvoice.objects.create(customer=self.customer, amount=Decimal('50.00'),
+                                                 date=self.days_ago(45))
+
+        data, queries = self.report('ar-aging')
+        self.assertEqual(queries, 1)  # one grouped query over the receivables table
+        self.assertEqual(data['parties'], [{
+            'party': self.customer.pk, 'name': 'Customer', 'current': '60.00',
+            'days_30': '50.00', 'days_60': '0.00', 'days_90_plus': '70.00',
+            'total': '180.00'}])
+        self.assertEqual(data['totals']['total'], '180.00')
+
+        self.assertEqual(self.report('ar-aging'), (data, 0))
+        SalesPayment.objects.create(invoice=invoice, amount=Decimal('60.00'),
+                                    payment_mode='cash', date=self.days_ago(1))
+        data, _ = self.report('ar-aging')
+        self.assertEqual(data['parties'][0]['current'], '0.00')
+
+    def test_payables(self):
+        order = PurchaseOrder.objects.create(vendor=self.vendor, order_date=self.days_ago(65),
+                                             total_including_tax=Decimal('30.00'),
+                                             payment_mode='bank')
+        # The order raised an invoice and an unpaid payment of the same amount
+        self.assertEqual(PurchaseInvoice.objects.get().invoice_amount, Decimal('30.00'))
+        Bill.objects.create(vendor=self.vendor, reference='B1', amount=Decimal('20.00'),
+                            bill_date=self.days_ago(20), due_date=self.days_ago(5),
+                            credit_account=self.bank)
+        Bill.objects.create(vendor=self.vendor, reference='B2', amount=Decimal('9.00'),
+                            bill_date=self.days_ago(20), due_date=self.days_ago(5),
+                            credit_account=self.bank, status='paid')
+
+        data, queries = self.report('ap-aging')
+        self.assertEqual(queries, 2)
+        row = data['parties'][0]
+        self.assertEqual((row['current'], row['days_60'], row['total']),
+                         ('20.00', '30.00', '50.00'))
+
+        order.payment_status = 'paid'
+        order.save()
+        data, _ = self.report('ap-aging')
+        self.assertEqual(data['parties'][0]['total'], '20.00')
+
+    def test_order_payments_settle_its_invoices_oldest_first(self):
+        order = PurchaseOrder.objects.create(vendor=self.vendor, order_date=self.days_ago(65),
+                                             total_including_tax=Decimal('30.00'),
+                                             payment_mode='bank')
+        PurchaseInvoice.objects.create(vendor=self.vendor, purchase_order=order,
+                                       invoice_amount=Decimal('20.00'),
+                                       invoice_date=self.days_ago(10))
+        PurchasePayment.objects.create(purchase_order=order, amount=Decimal('40.00'),
+                                       payment_mode='bank', status='paid',
+                                       date=self.days_ago(3))
+        # 30 settles the first invoice, the other 10 half of the second
+        data, _ = self.report('ap-aging')
+        row = data['parties'][0]
+        self.assertEqual((row['current'], row['days_60'], row['total']),
+                         ('10.00', '0.00', '10.00'))
+
+    def test_report_cached_before_commit_is_retired(self):
+        invoice = SalesInvoice.objects.create(customer=self.customer, amount=Decimal('100.00'),
+                                              date=self.days_ago(10))
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesPayment.objects.create(invoice=invoice, amount=Decimal('40.00'),
+                                        payment_mode='cash', date=self.days_ago(5))
+            # Another worker caches the report from the data before the commit
+            generation = cache.get(AGING_KEY, 0)
+            cache.set(f"reports:ar-aging:{self.as_of}:{generation}", {'stale': True})
+        data, _ = self.report('ar-aging')
+        self.assertEqual(data['totals']['total'], '60.00')
+
+
+class ReceivableTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        # The order raises its invoice and a paid payment of its total
+        self.order = Order.objects.create(order_number='O1', customer=self.customer,
+                                          total_amount=Decimal('10.00'))
+        self.invoice = SalesInvoice.objects.get(order=self.order)
+        self.payment = SalesPayment.objects.get(invoice=self.invoice)
+        self.payment.amount = Decimal('4.00')
+        self.payment.save()
+        self.sales_invoice = sales_models.SalesInvoice.objects.create(
+            customer=self.customer, amount=Decimal('50.00'))
+
+    def rows(self):
+        return {(row.source, row.kind, row.document_id): row
+                for row in Receivable.objects.all()}
+
+    def open_amounts(self):
+        return dict(Receivable.objects.filter(kind='invoice').values_list(
+            'source', 'open_amount'))
+
+    def test_rows_follow_both_apps(self):
+        rows = self.rows()
+        self.assertEqual(set(rows), {('order', 'invoice', self.invoice.pk),
+                                     ('order', 'payment', self.payment.pk),
+                                     ('sales', 'invoice', self.sales_invoice.pk)})
+        payment = rows[('order', 'payment', self.payment.pk)]
+        self.assertEqual((payment.customer_id, payment.invoice_date),
+                         (self.customer.pk, self.invoice.date))
+        self.assertEqual(self.open_amounts(), {'order': Decimal('6.00'), 'sales': Decimal('50.00')})
+
+        sales_payment = sales_models.SalesPayment.objects.create(
+            invoice=self.sales_invoice, amount=Decimal('20.00'), payment_mode='cash')
+        self.assertEqual(self.open_amounts()['sales'], Decimal('30.00'))
+        sales_payment.status = 'pending'
+        sales_payment.save()
+        self.assertEqual(self.open_amounts()['sales'], Decimal('50.00'))
+
+        self.invoice.date = timezone.make_aware(datetime.datetime(2024, 4, 1))
+        self.invoice.save()
+        self.assertEqual(Receivable.objects.get(kind='payment', source='order').invoice_date,
+                         self.invoice.date)
+
+        self.payment.delete()
+        self.assertEqual(self.open_amounts()['order'], Decimal('10.00'))
+
+    def test_bulk_order_updates_are_synced(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.total_amount = Decimal('15.00')
+        order.save()
+        self.assertEqual(set(Receivable.objects.filter(source='order').values_list(
+            'amount', flat=True)), {Decimal('15.00')})
+        self.assertEqual(self.open_amounts()['order'], Decimal('0.00'))
+
+        order.payment_mode = 'bank'
+        order.save()
+        self.assertEqual(Receivable.objects.get(kind='payment').status, 'pending')
+        self.assertEqual(self.open_amounts()['order'], Decimal('15.00'))
+
+    def test_deleted_invoice_keeps_its_payments(self):
+        self.invoice.delete()
+        payment = Receivable.objects.get(kind='payment')
+        self.assertEqual((payment.invoice_document_id, payment.customer_id), (None, None))
+
+    def test_rebuild_and_api(self):
+        before = {key: (row.amount, row.open_amount, row.customer_id, row.invoice_date)
+                  for key, row in self.rows().items()}
+        call_command('rebuild_receivables', stdout=StringIO())
+        after = {key: (row.amount, row.open_amount, row.customer_id, row.invoice_date)
+                 for key, row in self.rows().items()}
+        self.assertEqual(before, after)
+
+        response = self.client.get('/api/receivables/', {'kind': 'invoice',
+                                                         'open_amount_min': '10'})
+        self.assertEqual([row['document_id'] for row in response.data['results']],
+                         [self.sales_invoice.pk])
+
+
+class PartySummaryTest(APITestCase):
+    columns = ('invoiced', 'paid', 'outstanding', 'ordered', 'sold',
+               'billed', 'purchased', 'expensed')
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.vendor = Party.objects.create(name='Vendor', type='vendor')
+        self.other = Party.objects.create(name='Other', type='customer')
+        # The order raises an invoice and a paid payment of 10, the sales
+        # an invoice and a pending payment of 30
+        self.order = Order.objects.create(order_number='O1', customer=self.customer,
+                                          total_amount=Decimal('10.00'))
+        sales_models.Sales.objects.create(lead_or_customer=self.customer,
+                                          amount=Decimal('30.00'))
+        sales_models.SalesInvoice.objects.create(customer=self.customer,
+                                                 amount=Decimal('50.00'))
+        bank = Account.objects.create(name='Bank', account_type='debit', balance=0)
+        self.bill = Bill.objects.create(vendor=self.vendor, reference='B1', amount=Decimal('7.00'),
+                                        due_date=timezone.now(), credit_account=bank)
+        PurchaseOrder.objects.create(vendor=self.vendor, payment_mode='bank',
+                                     total_including_tax=Decimal('20.00'))
+        Expense.objects.create(vendor=self.vendor, amount=Decimal('3.00'))
+
+    def totals(self, party):
+        summary = PartySummary.objects.filter(party=party).first()
+        if summary is None:
+            return None
+        return {column: getattr(summary, column) for column in self.columns
+                if getattr(summary, column)}
+
+    def test_totals_follow_documents(self):
+        self.assertEqual(self.totals(self.customer), {
+            'invoiced': Decimal('90.00'), 'paid': Decimal('10.00'),
+            'outstanding': Decimal('80.00'), 'ordered': Decimal('10.00'),
+            'sold': Decimal('30.00')})
+        self.assertEqual(self.totals(self.vendor), {
+            'billed': Decimal('7.00'), 'purchased': Decimal('20.00'),
+            'expensed': Decimal('3.00')})
+        self.assertIsNone(self.totals(self.other))
+        last_activity = PartySummary.objects.get(party=self.vendor).last_activity
+        self.assertIsNotNone(last_activity)
+
+        # Moving a document refreshes the party it left as well
+        order = Order.objects.get(pk=self.order.pk)
+        order.customer = self.other
+        order.save()
+        self.assertNotIn('ordered', self.totals(self.customer))
+        self.assertEqual(self.totals(self.other), {'ordered': Decimal('10.00')})
+
+        order.total_amount = Decimal('15.00')
+        order.save()
+        self.assertEqual(self.totals(self.customer)['invoiced'], Decimal('95.00'))
+
+        self.bill.delete()
+        self.assertNotIn('billed', self.totals(self.vendor))
+        # Deletes do not move the last activity back
+        self.assertEqual(PartySummary.objects.get(party=self.vendor).last_activity,
+                         last_activity)
+
+    def test_deleting_a_party_drops_its_summary(self):
+        self.customer.delete()
+        self.assertFalse(PartySummary.objects.filter(party_id=self.customer.pk).exists())
+        self.assertEqual(self.totals(self.vendor)['billed'], Decimal('7.00'))
+
+    def test_rebuild(self):
+        before = {party.pk: self.totals(party) for party in (self.customer, self.vendor)}
+        PartySummary.objects.all().delete()
+        call_command('rebuild_party_summaries', stdout=StringIO())
+        self.assertEqual({party.pk: self.totals(party) for party in (self.customer, self.vendor)},
+                         before)
+        self.assertEqual(self.totals(self.other), {})
+
+    def test_api(self):
+        response = self.client.get(f"/api/parties/{self.customer.pk}/summary/")
+        self.assertEqual((response.data['invoiced'], response.data['outstanding']),
+                         ('90.00', '80.00'))
+        # A party without documents gets a summary of zeros
+        response = self.client.get(f"/api/parties/{self.other.pk}/summary/")
+        self.assertEqual(response.data['invoiced'], '0.00')
+
+        with DataQueries(connection) as plain:
+            self.client.get('/api/parties/')
+        with DataQueries(connection) as annotated:
+            response = self.client.get('/api/parties/', {'summary': 'true'})
+        # The totals come in with a join, not more queries
+        self.assertEqual(len(annotated), len(plain))
+        summaries = {row['id']: row['summary'] for row in response.data['results']}
+        self.assertEqual(summaries[self.vendor.pk]['purchased'], '20.00')
+        self.assertNotIn('summary', self.client.get('/api/parties/').data['results'][0])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class IndexUsageTest(TestCase):
+    """
+    Seeds the hot tables and checks with EXPLAIN that each hot query of the
+    API and the reports is answered from its index rather than a scan.
+    """
+    rows = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.make_aware(datetime.datetime(2024, 1, 1))
+        days = [start + datetime.timedelta(hours=n) for n in range(cls.rows)]
+        statuses = ['open', 'paid', 'void', 'overdue', 'draft']
+        # bulk_create sends no signals, so nothing is posted
+        accounts = Account.objects.bulk_create([
+            Account(name=f"Account {n}", account_type=('debit', 'credit')[n % 2],
+                    balance=0) for n in range(100)])
+        vendor = Party.objects.create(name='Vendor', type='vendor')
+        Order.objects.bulk_create([Order(order_date=day) for day in days])
+        BankTransaction.objects.bulk_create([
+            BankTransaction(account=accounts[n % 100], date=day, deposit=1)
+            for n, day in enumerate(days)])
+        SalesInvoice.objects.bulk_create([
+            SalesInvoice(customer=vendor, date=day, amount=1, status=statuses[n % 5])
+            for n, day in enumerate(days)])
+        SalesPayment.objects.bulk_create([
+            SalesPayment(date=day, amount=1, payment_mode='cash',
+                         mapping_status=f"batch-{n % 300}")
+            for n, day in enumerate(days)])
+        Bill.objects.bulk_create([
+            Bill(vendor=vendor, reference=str(n), amount=1, bill_date=day,
+                 due_date=day, status=statuses[n % 5])
+            for n, day in enumerate(days)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.day = days[cls.rows // 2]
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"INDEX {index}", plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_hot_queries_use_indexes(self):
+        day = self.day
+        keyset = keyset_filter(('-order_date', '-id'), [day, 1500])
+        account = Account.objects.order_by('pk').first()
+        checks = [
+            ('order_date_idx', Order.objects.order_by('-order_date', '-id')[:50]),
+            # A deep cursor page is a range read on the same index
+            ('order_date_idx', Order.objects.filter(keyset).order_by(
+                '-order_date', '-id')[:50]),
+            ('banktxn_account_date_idx', BankTransaction.objects.filter(
+                account=account, date__gte=day).order_by('date')),
+            ('salesinvoice_status_idx', SalesInvoice.objects.filter(
+                status='open', date__lt=day).order_by('date')),
+            ('salespayment_mapping_idx', SalesPayment.objects.filter(
+                mapping_status='batch-7')),
+            ('account_type_idx', Account.objects.filter(
+                account_type='debit').order_by('pk')[:1]),
+            ('bill_status_due_idx', Bill.objects.filter(
+                status='open', due_date__lt=day).order_by('due_date')),
+        ]
+        for index, queryset in checks:
+            with self.subTest(index=index, query=str(queryset.query)):
+                self.assertUsesIndex(queryset, index)
@@ -0,0 +1,56 @@
+"""
+Order total maintenance.
+
+Order and PurchaseOrder totals are DB-side aggregates over their lines
+(see their calculate_total()). A single line edit recomputes its order
+straight away; inside a deferred_totals() block the orders touched are
+collected instead and each is recomputed once when the block ends.
+
+Bulk line writes (bulk_create/update) send no signals and should call
+calculate_total() themselves, once.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+# Holds the pending {(model, pk)} set of the current thread, if any
+_local = threading.local()
+
+
+def recalculate_total(model, pk):
+    """
+    Recompute the total of the ``model`` order ``pk``, now or at the end of
+    the enclosing deferred_totals() block.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.add((model, pk))
+        return
+    order = model.objects.filter(pk=pk).first()
+    if order is not None:
+        order.calculate_total()
+
+
+@contextmanager
+def deferred_totals():
+    """
+    Recompute each order touched in the block once, as the last step of
+    the block's transaction. Nested blocks join the outermost one.
+
+        with deferred_totals():
+            for row in rows:
+                OrderItem.objects.create(order=order, **row)
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    pending = _local.pending = set()
+    try:
+        with transaction.atomic():
+            yield
+            _local.pending = None
+            for model, pk in sorted(pending, key=lambda key: (key[0]._meta.label, key[1])):
+                recalculate_total(model, pk)
+    finally:
+        _local.pending = None
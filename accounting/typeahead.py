@@ -0,0 +1,140 @@
+"""
+Prefix autocomplete for the account, party, item and brand pickers.
+
+The names of each kind live in the shared cache (see CACHES in
+core/settings.py) as one {id: name} map, stored under a key that carries
+the kind's current version. Every process keeps its own prefix index built
+from that map: a sorted list of (word, name, id) for every word of every
+name, so a keystroke is a bisect into the list plus a short scan, with no
+query of the source tables and only the version read from the cache.
+
+Saves and deletes of the source models never rewrite the map: once their
+transaction commits they retire its version, and the first lookup under
+the new version reloads the names from the database and caches them for
+every other process. Concurrent writers therefore cannot lose each
+other's changes, and a map loaded from data as it was before a commit is
+cached under a version that commit retires. Writes that send no signals
+(bulk updates, raw SQL) show up when the version expires after
+TYPEAHEAD_TIMEOUT seconds.
+"""
+import bisect
+import re
+import unicodedata
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+# kind -> (model label, name field)
+SOURCES = {
+    'accounts': ('accounting.Account', 'name'),
+    'parties': ('accounting.Party', 'name'),
+    'items': ('sales.Item', 'name'),
+    'brands': ('sales.Brands', 'name'),
+}
+
+KINDS = {label: kind for kind, (label, _) in SOURCES.items()}
+
+TIMEOUT = getattr(settings, 'TYPEAHEAD_TIMEOUT', 60 * 60)
+
+# kind -> (version, index) of this process
+_indexes = {}
+
+
+def normalize(text):
+    """Case- and accent-insensitive form of ``text``."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def words(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def version_key(kind):
+    return f"typeahead:{kind}:version"
+
+
+def names_key(kind, version):
+    return f"typeahead:{kind}:{version}"
+
+
+def current_version(kind):
+    version = cache.get(version_key(kind))
+    if version is None:
+        # Concurrent first lookups agree on whichever version is added first
+        cache.add(version_key(kind), uuid.uuid4().hex, TIMEOUT)
+        version = cache.get(version_key(kind))
+    return version
+
+
+def load_names(kind):
+    label, field = SOURCES[kind]
+    model = apps.get_model(label)
+    return dict(model._default_manager.exclude(**{f"{field}__isnull": True})
+                .values_list('pk', field))
+
+
+class PrefixIndex:
+    def __init__(self, names):
+        self.names = names
+        self.words = {pk: words(name) for pk, name in names.items()}
+        self.entries = sorted(
+            (word, normalize(name), pk)
+            for pk, name in names.items() for word in set(self.words[pk]))
+        self.by_name = sorted(self.names, key=lambda pk: (normalize(self.names[pk]), pk))
+
+    def matches(self, pk, prefixes):
+        return all(any(word.startswith(prefix) for word in self.words[pk])
+                   for prefix in prefixes)
+
+    def complete(self, query, limit):
+        """
+        Return up to ``limit`` ids whose name has a word starting with each
+        word of ``query``, in the order of the word matched.
+        """
+        prefixes = words(query)
+        if not prefixes:
+            return self.by_name[:limit]
+        # Seek on the longest word, the most selective one
+        seek = max(prefixes, key=len)
+        found = []
+        start = bisect.bisect_left(self.entries, (seek,))
+        for word, _, pk in self.entries[start:]:
+            if not word.startswith(seek) or len(found) == limit:
+                break
+            if pk not in found and self.matches(pk, prefixes):
+                found.append(pk)
+        return found
+
+
+def get_index(kind):
+    version = current_version(kind)
+    local = _indexes.get(kind)
+    if local is not None and local[0] == version:
+        return local[1]
+    names = cache.get(names_key(kind, version))
+    if names is None:
+        names = load_names(kind)
+        cache.set(names_key(kind, version), names, TIMEOUT)
+    index = PrefixIndex(names)
+    _indexes[kind] = (version, index)
+    return index
+
+
+def complete(kind, query, limit=10):
+    """Return the top ``limit`` matches of ``query`` as {id, name} dicts."""
+    index = get_index(kind)
+    return [{'id': pk, 'name': index.names[pk]} for pk in index.complete(query, limit)]
+
+
+def update(kind, pk, name):
+    """
+    Retire the cached names of ``kind`` unless they already give ``pk`` the
+    name ``name`` (None: ``pk`` is gone).
+    """
+    names = cache.get(names_key(kind, current_version(kind)))
+    if names is not None and names.get(pk) == name:
+        return
+    cache.set(version_key(kind), uuid.uuid4().hex, TIMEOUT)
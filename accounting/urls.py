@@ -14,7 +14,8 @@ from .views import (
     ManufacturingOrderViewSet, AssetViewSet, LicenseViewSet,
     ComponentViewSet, ConsumableViewSet, MaintenanceViewSet,
     DepreciationViewSet, BillViewSet, BillItemViewSet, CheckViewSet,
-    JournalEntryViewSet, ConvertViewSet
+    JournalEntryViewSet, ConvertViewSet, ReportViewSet, SearchViewSet,
+    TypeaheadViewSet, ReceivableViewSet
 )
 
 router = DefaultRouter()
@@ -52,6 +53,10 @@ router.register(r'bill-items', BillItemViewSet)
 router.register(r'checks', CheckViewSet)
 router.register(r'journal-entries', JournalEntryViewSet)
 router.register(r'converts', ConvertViewSet)
+router.register(r'receivables', ReceivableViewSet)
+router.register(r'reports', ReportViewSet, basename='reports')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'typeahead', TypeaheadViewSet, basename='typeahead')
 urlpatterns = [
     path('', include(router.urls)),
 ]
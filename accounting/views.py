@@ -2,6 +2,12 @@ from rest_framework.decorators import action
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from .models import (
     Account, AccountName, BankTransaction, Party,
     Item, SalesPayment, SalesInvoice, SalesOrderReturn, SalesRefund,
@@ -10,10 +16,11 @@ from .models import (
     PurchaseOrderReturn, PurchaseRefund, InventoryReceivingVoucher, StockExport,
     LossAdjustment,
     OpeningStock, ManufacturingOrder, Asset, License, Component, Consumable,
-    Maintenance, Depreciation, Bill, Check, JournalEntry, BillItem, Convert
+    Maintenance, Depreciation, Bill, Check, JournalEntry, BillItem, Convert, Receivable
 )
 from .serializers import (
     AccountSerializer, AccountNameSerializer, BankTransactionSerializer, PartySerializer,
+    PartySummarySerializer, PartyWithSummarySerializer,
     ItemSerializer,
     SalesPaymentSerializer, SalesInvoiceRead, SalesInvoiceWrite, SalesOrderReturnSerializer, SalesRefundSerializer,
     SalesOrderReturnCreateUpdateSerializer, OrderReadSerializer, OrderWriteSerializer,
@@ -23,42 +30,112 @@ from .serializers import (
     PurchaseOrderReturnSerializer, PurchaseRefundSerializer, InventoryReceivingVoucherSerializer, StockExportSerializer,
     LossAdjustmentSerializer, OpeningStockSerializer, ManufacturingOrderSerializer, AssetSerializer, LicenseSerializer,
     ComponentSerializer, ConsumableSerializer, MaintenanceSerializer, DepreciationSerializer, BillSerializer, BillCreateUpdateSerializer, CheckSerializer, CheckCreateUpdateSerializer,
-    JournalEntrySerializer, BillItemSerializer, BillItemCreateUpdateSerializer, ConvertCreateSerializer, ConvertSerializer
+    JournalEntrySerializer, BillItemSerializer, BillItemCreateUpdateSerializer, ConvertCreateSerializer, ConvertSerializer,
+    ReceivableSerializer
 )
+from .chart import chart_tree
+from .conditional import ConditionalGetMixin
+from .fastlist import FastListMixin
+from .posting import balance_as_of
+from .querysets import OptimizedQuerysetMixin
+from .reports import payables_aging, receivables_aging, trial_balance
+from . import search, summaries, typeahead
 
 
-class AccountNameViewSet(viewsets.ModelViewSet):
+class AccountNameViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = AccountName.objects.all()
+    pagination_class = None
     serializer_class = AccountNameSerializer
 
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        The whole chart of accounts as nested groups with their rolled-up
+        balances and accounts.
+        """
+        return Response(chart_tree())
 
-class AccountViewSet(viewsets.ModelViewSet):
+
+class AccountViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Account.objects.all()
+    filter_fields = {'type': 'account_type', 'status': 'status', 'parent': 'parent_account'}
     serializer_class = AccountSerializer
 
-
-class BankTransactionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='balance-as-of')
+    def balance_as_of(self, request, pk=None):
+        """
+        Balance of the account at ?date= (YYYY-MM-DD or ISO datetime),
+        computed from its ledger postings.
+        """
+        account = self.get_object()
+        value = request.query_params.get('date', '')
+        try:
+            date = parse_datetime(value) or parse_date(value)
+        except ValueError:
+            date = None
+        if date is None:
+            return Response({'date': 'Enter a valid date or datetime.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        balance = balance_as_of(account, date)
+        return Response({
+            'account': account.id,
+            'date': value,
+            'balance': serializers.DecimalField(
+                max_digits=12, decimal_places=2).to_representation(balance),
+        })
+
+
+class BankTransactionViewSet(ConditionalGetMixin, FastListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = BankTransaction.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'party': 'payee', 'account': 'account',
+                     'deposit': 'deposit', 'withdrawal': 'withdrawal'}
     serializer_class = BankTransactionSerializer
 
 
-class PartyViewSet(viewsets.ModelViewSet):
+class PartyViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Party.objects.all()
+    filter_fields = {'type': 'type'}
     serializer_class = PartySerializer
 
-
-class ItemViewSet(viewsets.ModelViewSet):
+    def get_serializer_class(self):
+        # ?summary=true embeds each party's lifetime totals: one join to
+        # the summaries table (see accounting/summaries.py)
+        if (self.action in ['list', 'retrieve']
+                and self.request.query_params.get('summary') in ('1', 'true')):
+            return PartyWithSummarySerializer
+        return PartySerializer
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """
+        Lifetime totals of the party: invoiced, paid and outstanding across
+        both sales apps, and its orders, sales, bills, purchase orders and
+        expenses.
+        """
+        party = self.get_object()
+        return Response(PartySummarySerializer(
+            summaries.summary_of(party), context=self.get_serializer_context()).data)
+
+
+class ItemViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
 
 
-class SalesPaymentViewSet(viewsets.ModelViewSet):
+class SalesPaymentViewSet(ConditionalGetMixin, FastListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SalesPayment.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'mapping_status': 'mapping_status',
+                     'invoice': 'invoice', 'amount': 'amount'}
     serializer_class = SalesPaymentSerializer
 
 
-class SalesInvoiceViewSet(viewsets.ModelViewSet):
+class SalesInvoiceViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SalesInvoice.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'party': 'customer', 'order': 'order',
+                     'account': ('debit_account', 'credit_account'), 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -66,8 +143,11 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
         return SalesInvoiceWrite
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all().order_by('-order_date')
+    cursor_ordering = ('-order_date',)
+    filter_fields = {'order_date': 'order_date', 'party': 'customer', 'payment_mode': 'payment_mode',
+                     'amount': 'total_amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -75,8 +155,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderWriteSerializer
 
 
-class SalesOrderReturnViewSet(viewsets.ModelViewSet):
+class SalesOrderReturnViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SalesOrderReturn.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'order': 'order'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -84,13 +166,18 @@ class SalesOrderReturnViewSet(viewsets.ModelViewSet):
         return SalesOrderReturnCreateUpdateSerializer
 
 
-class SalesRefundViewSet(viewsets.ModelViewSet):
+class SalesRefundViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SalesRefund.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'amount': 'amount'}
     serializer_class = SalesRefundSerializer
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
+    cursor_ordering = ('-expense_date',)
+    filter_fields = {'expense_date': 'expense_date', 'party': ('vendor', 'customer'),
+                     'account': ('payment_account', 'deposit_to'), 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -98,13 +185,18 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         return ExpenseWriteSerializer
 
 
-class PayslipViewSet(viewsets.ModelViewSet):
+class PayslipViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Payslip.objects.all()
+    cursor_ordering = ('-created_date',)
+    filter_fields = {'date': 'created_date', 'status': 'status', 'staff': 'staff'}
     serializer_class = PayslipSerializer
 
 
-class PurchaseOrderViewSet(viewsets.ModelViewSet):
+class PurchaseOrderViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = PurchaseOrder.objects.all()
+    cursor_ordering = ('-order_date',)
+    filter_fields = {'order_date': 'order_date', 'status': 'payment_status', 'party': 'vendor',
+                     'amount': 'total_including_tax'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -112,82 +204,102 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         return PurchaseOrderWriteSerializer
 
 
-class PurchaseInvoiceViewSet(viewsets.ModelViewSet):
+class PurchaseInvoiceViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = PurchaseInvoice.objects.all()
+    filter_fields = {'invoice_date': 'invoice_date', 'party': 'vendor', 'purchase_order': 'purchase_order',
+                     'amount': 'invoice_amount'}
     serializer_class = PurchaseInvoiceSerializer
 
 
-class PurchasePaymentViewSet(viewsets.ModelViewSet):
+class PurchasePaymentViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = PurchasePayment.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'mapping_status': 'mapping_status',
+                     'purchase_order': 'purchase_order', 'amount': 'amount'}
     serializer_class = PurchasePaymentSerializer
 
 
-class PurchaseOrderReturnViewSet(viewsets.ModelViewSet):
+class PurchaseOrderReturnViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = PurchaseOrderReturn.objects.all()
+    cursor_ordering = ('-date_created',)
+    filter_fields = {'date': 'date_created', 'status': 'status', 'party': 'vendor',
+                     'amount': 'total_after_discount'}
     serializer_class = PurchaseOrderReturnSerializer
 
 
-class PurchaseRefundViewSet(viewsets.ModelViewSet):
+class PurchaseRefundViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = PurchaseRefund.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'amount': 'amount'}
     serializer_class = PurchaseRefundSerializer
 
 
-class InventoryReceivingVoucherViewSet(viewsets.ModelViewSet):
+class InventoryReceivingVoucherViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = InventoryReceivingVoucher.objects.all()
+    cursor_ordering = ('-accounting_date',)
+    filter_fields = {'date': 'accounting_date', 'status': 'status'}
     serializer_class = InventoryReceivingVoucherSerializer
 
 
-class StockExportViewSet(viewsets.ModelViewSet):
+class StockExportViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = StockExport.objects.all()
+    cursor_ordering = ('-accounting_date',)
+    filter_fields = {'date': 'accounting_date', 'status': 'status', 'party': 'customer'}
     serializer_class = StockExportSerializer
 
 
-class LossAdjustmentViewSet(viewsets.ModelViewSet):
+class LossAdjustmentViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = LossAdjustment.objects.all()
+    cursor_ordering = ('-time',)
+    filter_fields = {'date': 'time', 'status': 'status'}
     serializer_class = LossAdjustmentSerializer
 
 
-class OpeningStockViewSet(viewsets.ModelViewSet):
+class OpeningStockViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = OpeningStock.objects.all()
     serializer_class = OpeningStockSerializer
 
 
-class ManufacturingOrderViewSet(viewsets.ModelViewSet):
+class ManufacturingOrderViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = ManufacturingOrder.objects.all()
     serializer_class = ManufacturingOrderSerializer
 
 
-class AssetViewSet(viewsets.ModelViewSet):
+class AssetViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Asset.objects.all()
     serializer_class = AssetSerializer
 
 
-class LicenseViewSet(viewsets.ModelViewSet):
+class LicenseViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = License.objects.all()
     serializer_class = LicenseSerializer
 
 
-class ComponentViewSet(viewsets.ModelViewSet):
+class ComponentViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Component.objects.all()
     serializer_class = ComponentSerializer
 
 
-class ConsumableViewSet(viewsets.ModelViewSet):
+class ConsumableViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Consumable.objects.all()
     serializer_class = ConsumableSerializer
 
 
-class MaintenanceViewSet(viewsets.ModelViewSet):
+class MaintenanceViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Maintenance.objects.all()
+    cursor_ordering = ('-start_date',)
+    filter_fields = {'date': 'start_date', 'asset': 'asset'}
     serializer_class = MaintenanceSerializer
 
 
-class DepreciationViewSet(viewsets.ModelViewSet):
+class DepreciationViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Depreciation.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'asset': 'asset', 'amount': 'amount'}
     serializer_class = DepreciationSerializer
 
 
-class BillItemViewSet(viewsets.ModelViewSet):
+class BillItemViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = BillItem.objects.all()
 
     def get_serializer_class(self):
@@ -196,8 +308,11 @@ class BillItemViewSet(viewsets.ModelViewSet):
         return BillItemCreateUpdateSerializer
 
 
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Bill.objects.all()
+    cursor_ordering = ('-bill_date',)
+    filter_fields = {'bill_date': 'bill_date', 'due_date': 'due_date', 'status': 'status', 'party': 'vendor',
+                     'account': ('debit_account', 'credit_account'), 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -205,8 +320,11 @@ class BillViewSet(viewsets.ModelViewSet):
         return BillCreateUpdateSerializer  # For POST/PUT/PATCH
 
 
-class CheckViewSet(viewsets.ModelViewSet):
+class CheckViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Check.objects.all().order_by('-created_at')
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'party': ('pay_to', 'vendor'),
+                     'account': 'bank_account', 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -214,15 +332,141 @@ class CheckViewSet(viewsets.ModelViewSet):
         return CheckCreateUpdateSerializer  # For POST/PUT/PATCH
 
 
-class JournalEntryViewSet(viewsets.ModelViewSet):
+class JournalEntryViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = JournalEntry.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date'}
     serializer_class = JournalEntrySerializer
 
 
-class ConvertViewSet(viewsets.ModelViewSet):
+class ConvertViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Convert.objects.all().order_by('-created_at')
+    cursor_ordering = ('-transfer_date',)
+    filter_fields = {'date': 'transfer_date', 'account': ('transfer_from', 'transfer_to'),
+                     'amount': 'transfer_amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return ConvertSerializer   # For GET
         return ConvertCreateSerializer  # For POST/PUT/PATCH
+
+
+class ReceivableViewSet(ConditionalGetMixin, FastListMixin, OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Invoices and payments of both the accounting and sales apps in one
+    schema (see accounting/receivables.py).
+    """
+    queryset = Receivable.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'invoice_date': 'invoice_date', 'kind': 'kind',
+                     'source': 'source', 'status': 'status', 'party': 'customer',
+                     'amount': 'amount', 'open_amount': 'open_amount'}
+    serializer_class = ReceivableSerializer
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    Read-only financial reports, e.g. /api/reports/trial-balance/?as_of=
+    """
+
+    def get_as_of(self, request):
+        value = request.query_params.get('as_of')
+        if not value:
+            return timezone.localdate()
+        try:
+            as_of = parse_date(value)
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            raise ValidationError({'as_of': 'Enter a valid date (YYYY-MM-DD).'})
+        return as_of
+
+    @action(detail=False, methods=['get'], url_path='trial-balance')
+    def trial_balance(self, request):
+        return Response(trial_balance(self.get_as_of(request)))
+
+    @action(detail=False, methods=['get'], url_path='ar-aging')
+    def ar_aging(self, request):
+        """
+        Open receivables per customer, across both sales invoice tables,
+        bucketed by age: current (up to 30 days), 31-60, 61-90 and 90+.
+        """
+        return Response(receivables_aging(self.get_as_of(request)))
+
+    @action(detail=False, methods=['get'], url_path='ap-aging')
+    def ap_aging(self, request):
+        """
+        Open payables per vendor (purchase invoices by invoice date, unpaid
+        bills by due date), bucketed like ar-aging.
+        """
+        return Response(payables_aging(self.get_as_of(request)))
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Ranked full-text search, e.g. /api/search/?q=acme&kind=party,bill
+    (see accounting/search.py), paged with ?limit= and ?offset=.
+    """
+
+    def get_int(self, request, name, default, maximum=None):
+        value = request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise ValidationError({name: 'Enter a non-negative integer.'})
+        return min(value, maximum) if maximum else value
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        unknown = set(kinds) - set(search.SOURCES)
+        if unknown:
+            raise ValidationError({'kind': f"Unknown kind(s): {', '.join(sorted(unknown))}; "
+                                           f"expected {', '.join(search.SOURCES)}."})
+        if search.get_backend() is None:
+            return Response({'detail': 'Search is not available on this database.'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+        limit = self.get_int(request, 'limit', settings.REST_FRAMEWORK['PAGE_SIZE'],
+                             getattr(settings, 'API_MAX_PAGE_SIZE', 500)) or 1
+        offset = self.get_int(request, 'offset', 0)
+
+        # One extra row tells whether there is a page after this one
+        results = search.search(query, kinds, limit + 1, offset)
+        url = request.build_absolute_uri()
+        following = replace_query_param(url, 'offset', offset + limit)
+        if offset <= limit:
+            preceding = remove_query_param(url, 'offset')
+        else:
+            preceding = replace_query_param(url, 'offset', offset - limit)
+        return Response({
+            'next': following if len(results) > limit else None,
+            'previous': preceding if offset else None,
+            'results': results[:limit],
+        })
+
+
+class TypeaheadViewSet(viewsets.ViewSet):
+    """
+    Prefix autocomplete for pickers, e.g. /api/typeahead/parties/?q=ac&limit=10
+    (see accounting/typeahead.py).
+    """
+    lookup_value_regex = '[a-z]+'
+    max_limit = 50
+
+    def retrieve(self, request, pk=None):
+        if pk not in typeahead.SOURCES:
+            raise NotFound(f"Unknown kind; expected {', '.join(typeahead.SOURCES)}.")
+        try:
+            limit = int(request.query_params.get('limit') or 10)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({'limit': 'Enter a positive integer.'})
+        query = request.query_params.get('q', '')
+        return Response(typeahead.complete(pk, query, min(limit, self.max_limit)))
@@ -85,6 +85,22 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# The report, chart and typeahead caches are read and invalidated by every
+# worker, so they need a cache all workers share; the per-process default
+# (LocMemCache) would leave each worker serving its own stale copy. The
+# database cache needs nothing beyond the database (create its table with
+# ``manage.py createcachetable``); a memcached or redis backend can stand
+# in for it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_table',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -136,3 +152,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3032",
 ]
+
+# REST framework
+# List endpoints page with a cursor (see accounting/pagination.py)
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'accounting.pagination.CursorPagination',
+    'DEFAULT_FILTER_BACKENDS': ['accounting.filters.FieldFilterBackend'],
+    'PAGE_SIZE': 50,
+}
+API_MAX_PAGE_SIZE = 500
@@ -2,7 +2,7 @@ from django.db import models
 from accounting.models import Party
 # Create your models here.
 from django.utils import timezone
-from accounting.models import Account
+from accounting.models import Account, TrackedFieldsMixin
 
 
 class Brands(models.Model):
@@ -26,6 +26,7 @@ class PlotDescription(models.Model):
     plot_road = models.CharField(max_length=100, null=True, blank=True)
     plot_facing = models.CharField(max_length=100, null=True, blank=True)
     plot_block = models.CharField(max_length=100, null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return self.plot_no
@@ -87,7 +88,9 @@ class Item(models.Model):
         return self.name
 
 
-class Sales(models.Model):
+class Sales(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('lead_or_customer_id', 'amount', 'created_at')
+
     sales_no = models.CharField(max_length=100, null=True, blank=True)
     subject = models.CharField(max_length=100, null=True, blank=True)
     related = models.CharField(choices=(
@@ -127,6 +130,14 @@ class Sales(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'],
+                         name='sales_created_idx'),
+            models.Index(fields=['status', 'created_at'],
+                         name='sales_status_idx'),
+        ]
+
     def __str__(self):
         return self.sales_no
 
@@ -174,6 +185,14 @@ class SalesInvoice(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='sales_invoice_date_idx'),
+            models.Index(fields=['status', 'date'],
+                         name='sales_invoice_status_idx'),
+        ]
+
     def __str__(self):
         return f"Invoice {self.id} - {self.customer.name}"
 
@@ -206,6 +225,14 @@ class SalesPayment(models.Model):
     updated_at = models.DateTimeField(
         default=timezone.now, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'],
+                         name='sales_payment_date_idx'),
+            models.Index(fields=['mapping_status', 'date'],
+                         name='sales_payment_mapping_idx'),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} - {self.invoice.sales.sales_no}"
 
@@ -252,3 +279,10 @@ class PaymentInstallment(models.Model):
 
     class Meta:
         ordering = ['payment_time']
+        indexes = [
+            models.Index(fields=['payment_schedule', 'payment_time'],
+                         name='installment_schedule_idx'),
+            # Installments falling due in a date range
+            models.Index(fields=['payment_time', 'status'],
+                         name='installment_due_idx'),
+        ]
@@ -1,21 +1,26 @@
 from . import models
 from rest_framework import serializers
-from accounting.serializers import PartySerializer
+from django.db import transaction
+from django.utils import timezone
+from accounting.serializers import (
+    BulkLineListSerializer, BulkPrimaryKeyRelatedField, PartySerializer,
+    SparseFieldsMixin, line_fields, sync_lines
+)
 
 
-class BrandSerializer(serializers.ModelSerializer):
+class BrandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Brands
         fields = ['id', 'name', 'description']
 
 
-class PlotSerializer(serializers.ModelSerializer):
+class PlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.PlotDescription
         fields = '__all__'
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     plot_description = PlotSerializer(read_only=False)
     brand = BrandSerializer(read_only=False)
 
@@ -54,7 +59,7 @@ class ItemSerializer(serializers.ModelSerializer):
         return models.Item.objects.create(**validated_data)
 
 
-class ItemReadSerializer(serializers.ModelSerializer):
+class ItemReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     plot_description = PlotSerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
 
@@ -65,7 +70,7 @@ class ItemReadSerializer(serializers.ModelSerializer):
 # Sales Serializers
 
 
-class SalesItemsReadSerializer(serializers.ModelSerializer):
+class SalesItemsReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item = ItemReadSerializer(read_only=True)
 
     class Meta:
@@ -79,14 +84,19 @@ class SalesItemsReadSerializer(serializers.ModelSerializer):
         return data
 
 
-class PaymentInstallmentSerializer(serializers.ModelSerializer):
+class PaymentInstallmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.PaymentInstallment
         fields = ['id', 'payment_time', 'payment_amount',
                   'status', 'created_at', 'updated_at']
 
 
-class PaymentScheduleReadSerializer(serializers.ModelSerializer):
+class PaymentInstallmentWriteSerializer(PaymentInstallmentSerializer):
+    # Matches an existing installment when the schedule is updated
+    id = serializers.IntegerField(required=False)
+
+
+class PaymentScheduleReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     installments = PaymentInstallmentSerializer(many=True, read_only=True)
 
     class Meta:
@@ -115,7 +125,7 @@ class PaymentScheduleReadSerializer(serializers.ModelSerializer):
             }
 
 
-class SalesReadSerializer(serializers.ModelSerializer):
+class SalesReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     lead_or_customer = PartySerializer(read_only=True)
     to = PartySerializer(read_only=True)
     items = SalesItemsReadSerializer(
@@ -131,12 +141,13 @@ class SalesReadSerializer(serializers.ModelSerializer):
 
 
 class SalesItemsWriteSerializer(serializers.ModelSerializer):
-    item_id = serializers.PrimaryKeyRelatedField(
+    item_id = BulkPrimaryKeyRelatedField(
         queryset=models.Item.objects.all(), source='item')
 
     class Meta:
         model = models.SalesItems
         fields = ['item_id', 'quantity']
+        list_serializer_class = BulkLineListSerializer
 
     def to_internal_value(self, data):
         if isinstance(data.get('item_id'), dict):
@@ -145,8 +156,16 @@ class SalesItemsWriteSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
+class SalesItemsLineSerializer(SalesItemsWriteSerializer):
+    # Matches an existing line when the sales document is updated
+    id = serializers.IntegerField(required=False)
+
+    class Meta(SalesItemsWriteSerializer.Meta):
+        fields = ['id'] + SalesItemsWriteSerializer.Meta.fields
+
+
 class PaymentScheduleWriteSerializer(serializers.ModelSerializer):
-    installments = PaymentInstallmentSerializer(
+    installments = PaymentInstallmentWriteSerializer(
         many=True, write_only=True, required=False)
 
     class Meta:
@@ -167,17 +186,34 @@ class PaymentScheduleWriteSerializer(serializers.ModelSerializer):
         # Access sales after ensuring it's saved
         sales = payment_schedule.sales
         if sales and sales.payment_mode == 'installment':
-            for installment_data in installments_data:
-                models.PaymentInstallment.objects.create(
-                    payment_schedule=payment_schedule,
-                    **installment_data
-                )
+            models.PaymentInstallment.objects.bulk_create([
+                models.PaymentInstallment(
+                    payment_schedule=payment_schedule, **line_fields(installment_data))
+                for installment_data in installments_data
+            ])
 
         return payment_schedule
 
+    def update(self, instance, validated_data):
+        installments_data = validated_data.pop('installments', [])
+        validated_data.pop('sales', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.updated_at = timezone.now()
+        instance.save()
+
+        # Only installment schedules keep installments
+        if instance.sales and instance.sales.payment_mode != 'installment':
+            installments_data = []
+        sync_lines(
+            instance.installments.all(), installments_data,
+            lambda values: models.PaymentInstallment(payment_schedule=instance, **values),
+            fields=['payment_time', 'payment_amount', 'status'], field='installments')
+        return instance
+
 
 class SalesWriteSerializer(serializers.ModelSerializer):
-    items = SalesItemsWriteSerializer(many=True, write_only=True)
+    items = SalesItemsLineSerializer(many=True, write_only=True)
     payment_schedule = PaymentScheduleWriteSerializer(
         write_only=True, required=False)
 
@@ -192,31 +228,44 @@ class SalesWriteSerializer(serializers.ModelSerializer):
             'amount': {'required': False},
         }
 
+    def build_item(self, sales, values):
+        # Store the subtotal as amount the way SalesItems.save() does
+        sales_item = models.SalesItems(sales=sales, **values)
+        if sales_item.quantity and sales_item.item:
+            sales_item.amount = sales_item.quantity * sales_item.item.price
+        return sales_item
+
+    def create_items(self, sales, items_data):
+        """
+        Insert the lines with one bulk_create. Returns their total.
+        """
+        sales_items = [self.build_item(sales, line_fields(item_data))
+                       for item_data in items_data]
+        models.SalesItems.objects.bulk_create(sales_items)
+        return sum(sales_item.subtotal() for sales_item in sales_items)
+
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         payment_schedule_data = validated_data.pop('payment_schedule', None)
 
-        sales = models.Sales.objects.create(**validated_data)
+        with transaction.atomic():
+            sales = models.Sales.objects.create(**validated_data)
 
-        # Create sales items
-        total_amount = 0
-        for item_data in items_data:
-            sales_item = models.SalesItems.objects.create(
-                sales=sales, **item_data)
-            total_amount += sales_item.subtotal()
+            # Create sales items
+            total_amount = self.create_items(sales, items_data)
 
-        # Update sales amount if not provided
-        if not sales.amount:
-            sales.amount = total_amount
-            sales.save(update_fields=['amount'])
+            # Update sales amount if not provided
+            if not sales.amount:
+                sales.amount = total_amount
+                sales.save(update_fields=['amount', 'updated_at'])
 
-        # Create payment schedule (for both at_a_time and installment)
-        if payment_schedule_data:
-            payment_schedule_data['sales'] = sales.id
-            payment_schedule_serializer = PaymentScheduleWriteSerializer(
-                data=payment_schedule_data)
-            if payment_schedule_serializer.is_valid():
-                payment_schedule_serializer.save()
+            # Create payment schedule (for both at_a_time and installment)
+            if payment_schedule_data:
+                payment_schedule_data['sales'] = sales.id
+                payment_schedule_serializer = PaymentScheduleWriteSerializer(
+                    data=payment_schedule_data)
+                if payment_schedule_serializer.is_valid():
+                    payment_schedule_serializer.save()
 
         return sales
 
@@ -224,49 +273,48 @@ class SalesWriteSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items', None)
         payment_schedule_data = validated_data.pop('payment_schedule', None)
 
-        # Update Sales fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        # Update items
-        if items_data is not None:
-            instance.salesitems_set.all().delete()
-
-            total_amount = 0
-            for item_data in items_data:
-                sales_item = models.SalesItems.objects.create(
-                    sales=instance, **item_data)
-                total_amount += sales_item.subtotal()
-
-            instance.amount = total_amount
-            instance.save(update_fields=['amount'])
-
-        # Update payment schedule
-        if payment_schedule_data is not None:
-            # Delete existing payment schedule and installments
-            try:
-                instance.payment_schedule.delete()
-            except PaymentSchedule.DoesNotExist:
-                pass
-
-            # Create new payment schedule
-            payment_schedule_data['sales'] = instance
-            payment_schedule_serializer = PaymentScheduleWriteSerializer(
-                data=payment_schedule_data)
-            if payment_schedule_serializer.is_valid():
-                payment_schedule_serializer.save()
+        with transaction.atomic():
+            # Update Sales fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            # Update items, writing only the lines that changed
+            if items_data is not None:
+                sales_items = sync_lines(
+                    instance.salesitems_set.all(), items_data,
+                    lambda values: self.build_item(instance, values),
+                    fields=['item', 'quantity', 'amount'])
+                instance.amount = sum(
+                    sales_item.subtotal() for sales_item in sales_items)
+                instance.save(update_fields=['amount', 'updated_at'])
+
+            # Update payment schedule in place
+            if payment_schedule_data is not None:
+                schedule = models.PaymentSchedule.objects.filter(
+                    sales=instance).first()
+                serializer = PaymentScheduleWriteSerializer()
+                if schedule is None:
+                    serializer.create({**payment_schedule_data, 'sales': instance})
+                else:
+                    schedule.sales = instance
+                    try:
+                        serializer.update(schedule, payment_schedule_data)
+                    except serializers.ValidationError as error:
+                        # Sent nested in the schedule, so reported there
+                        raise serializers.ValidationError(
+                            {'payment_schedule': error.detail})
 
         return instance
 
 
-class SalesPaymentSerializer(serializers.ModelSerializer):
+class SalesPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.SalesPayment
         fields = "__all__"
 
 
-class SalesInvoiceReadSerializer(serializers.ModelSerializer):
+class SalesInvoiceReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sales = SalesReadSerializer(read_only=True)
 
     class Meta:
@@ -274,7 +322,7 @@ class SalesInvoiceReadSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class SalesPaymentReadSerializer(serializers.ModelSerializer):
+class SalesPaymentReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     invoice = SalesInvoiceReadSerializer(read_only=True)
 
     class Meta:
@@ -282,7 +330,7 @@ class SalesPaymentReadSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class SalesInvoiceSerializer(serializers.ModelSerializer):
+class SalesInvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.SalesInvoice
         fields = "__all__"
@@ -2,7 +2,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.db import transaction
 from django.utils import timezone
-from .models import Sales, SalesInvoice, SalesPayment, Account
+from accounting.profiles import posting_accounts
+from .models import Sales, SalesInvoice, SalesPayment
 
 
 @receiver(post_save, sender=Sales)
@@ -14,21 +15,14 @@ def create_sales_invoice_and_payment(sender, instance, created, **kwargs):
     if (instance.amount and instance.amount > 0 and
             not SalesInvoice.objects.filter(sales=instance).exists()):
         with transaction.atomic():
-            # Get or create default accounts
-            debit_account = Account.objects.filter(
-                account_type='debit').first()
-            credit_account = Account.objects.filter(
-                account_type='credit').first()
-
-            # Create SalesInvoice
+            # Create SalesInvoice on the default sales posting accounts
             invoice = SalesInvoice.objects.create(
                 sales=instance,
                 date=instance.date or timezone.now(),
                 amount=instance.amount,
                 customer=instance.lead_or_customer,
                 status='open',
-                debit_account=debit_account,
-                credit_account=credit_account,
+                **posting_accounts('sales_invoice'),
                 created_at=timezone.now(),
                 updated_at=timezone.now()
             )
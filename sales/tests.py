@@ -1,3 +1,261 @@
+import datetime
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounting.models import Account, Party
+from . import models
+
+
+class SalesWriteTest(APITestCase):
+    url = '/api/sales/'
+
+    def setUp(self):
+        cache.clear()
+        Account.objects.create(name='Receivable', account_type='debit', balance=0)
+        Account.objects.create(name='Revenue', account_type='credit', balance=0)
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.items = [models.Item.objects.create(name=f"Plot {i}", price=Decimal('5.00'))
+                      for i in range(20)]
+
+    def post_sales(self, lines):
+        payload = {
+            'lead_or_customer': self.customer.pk, 'payment_mode': 'at_a_time',
+            'items': [{'item_id': item.pk, 'quantity': 3} for item in self.items[:lines]],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return models.Sales.objects.latest('pk'), len(queries)
+
+    def test_lines_written_in_bulk(self):
+        self.post_sales(1)  # Resolves the default posting accounts
+        _, small = self.post_sales(2)
+        sales, large = self.post_sales(20)
+        self.assertEqual(small, large)
+        self.assertEqual(sales.amount, Decimal('300.00'))
+        self.assertEqual(
+            set(sales.salesitems_set.values_list('amount', flat=True)), {Decimal('15.00')})
+        self.assertEqual(sales.sales_invoice.get().amount, Decimal('300.00'))
+
+    def test_update_keeps_line_and_installment_ids(self):
+        response = self.client.post(self.url, {
+            'lead_or_customer': self.customer.pk, 'payment_mode': 'installment',
+            'items': [{'item_id': item.pk, 'quantity': 1} for item in self.items[:3]],
+            'payment_schedule': {
+                'advance_payment': '5.00', 'rest_amount': '10.00',
+                'installments': [{'payment_time': '2024-01-01', 'payment_amount': '5.00'},
+                                 {'payment_time': '2024-02-01', 'payment_amount': '5.00'}],
+            },
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        sales = models.Sales.objects.latest('pk')
+        lines = list(sales.salesitems_set.order_by('pk').values_list('pk', flat=True))
+        schedule = sales.payment_schedule
+        installments = list(schedule.installments.values_list('pk', flat=True))
+
+        response = self.client.patch(f"{self.url}{sales.pk}/", {
+            'items': [{'id': lines[0], 'item_id': self.items[0].pk, 'quantity': 4},
+                      {'id': lines[1], 'item_id': self.items[1].pk, 'quantity': 1}],
+            'payment_schedule': {
+                'advance_payment': '0.00', 'rest_amount': '25.00',
+                'installments': [{'id': installments[0], 'payment_time': '2024-01-01',
+                                  'payment_amount': '20.00', 'status': 'paid'}],
+            },
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        sales.refresh_from_db()
+        self.assertEqual(sales.amount, Decimal('25.00'))
+        self.assertEqual(
+            list(sales.salesitems_set.order_by('pk').values_list('pk', 'amount')),
+            [(lines[0], Decimal('20.00')), (lines[1], Decimal('5.00'))])
+        self.assertEqual(sales.payment_schedule.pk, schedule.pk)
+        self.assertEqual(
+            list(schedule.installments.values_list('pk', 'payment_amount', 'status')),
+            [(installments[0], Decimal('20.00'), 'paid')])
+
+    def test_foreign_line_ids_are_reported_where_sent(self):
+        sales, _ = self.post_sales(1)
+        other, _ = self.post_sales(1)
+        models.Sales.objects.filter(pk=sales.pk).update(payment_mode='installment')
+        schedule = models.PaymentSchedule.objects.create(sales=sales)
+        foreign = models.PaymentInstallment.objects.create(
+            payment_schedule=models.PaymentSchedule.objects.create(sales=other),
+            payment_amount=Decimal('5.00'))
+        installments = [{'id': foreign.pk, 'payment_time': '2024-01-01',
+                         'payment_amount': '5.00'}]
+
+        response = self.client.patch(f"/api/payment-schedules/{schedule.pk}/",
+                                     {'installments': installments}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'installments'})
+
+        response = self.client.patch(f"{self.url}{sales.pk}/", {
+            'payment_schedule': {'installments': installments}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'payment_schedule'})
+        self.assertIn('installments', response.data['payment_schedule'])
+
+        response = self.client.patch(f"{self.url}{sales.pk}/", {
+            'items': [{'id': other.salesitems_set.get().pk,
+                       'item_id': self.items[0].pk, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'items'})
+
+
+class SalesPaymentListTest(APITestCase):
+    url = '/api/sales-payments/'
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Party.objects.create(name='Customer', type='customer')
+        self.brand = models.Brands.objects.create(name='Brand')
+
+    def add_payment(self):
+        sales = models.Sales.objects.create(lead_or_customer=self.customer, to=self.customer)
+        for _ in range(2):
+            item = models.Item.objects.create(name='Plot', price=Decimal('5.00'),
+                                              brand=self.brand)
+            models.SalesItems.objects.create(sales=sales, item=item, quantity=1)
+        schedule = models.PaymentSchedule.objects.create(sales=sales)
+        models.PaymentInstallment.objects.create(
+            payment_schedule=schedule, payment_amount=Decimal('5.00'))
+        invoice = models.SalesInvoice.objects.create(
+            sales=sales, customer=self.customer, amount=Decimal('10.00'))
+        models.SalesPayment.objects.create(invoice=invoice, amount=Decimal('10.00'),
+                                           payment_mode='cash')
+
+    def list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        # Counts include the ETag fingerprint query
+        return response.data['results'], len(queries)
+
+    def test_nested_list_is_constant_queries(self):
+        self.add_payment()
+        _, few = self.list_queries()
+        for _ in range(5):
+            self.add_payment()
+        results, many = self.list_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(many, 4)
+        sales = results[0]['invoice']['sales']
+        self.assertEqual(len(sales['items']), 2)
+        self.assertEqual(sales['items'][0]['item']['brand']['name'], 'Brand')
+        self.assertEqual(len(sales['payment_schedule']['installments']), 1)
+
+    def test_sparse_fields_and_expand(self):
+        self.add_payment()
+        sales_id = models.Sales.objects.get().pk
+
+        results, count = self.list_queries(fields='id,amount')
+        self.assertEqual(set(results[0]), {'id', 'amount'})
+        self.assertEqual(count, 2)
+
+        # Only the listed relations are nested, the rest are ids
+        results, count = self.list_queries(expand='invoice')
+        invoice = results[0]['invoice']
+        self.assertEqual(invoice['sales'], sales_id)
+        self.assertEqual(count, 2)
+
+        results, count = self.list_queries(
+            fields='id,invoice.sales', expand='invoice,invoice.sales')
+        self.assertEqual(set(results[0]), {'id', 'invoice'})
+        self.assertEqual(set(results[0]['invoice']), {'sales'})
+        sales = results[0]['invoice']['sales']
+        self.assertEqual(len(sales['items']), 2)
+        self.assertIsInstance(sales['items'][0], int)
+        self.assertEqual(sales['payment_schedule'],
+                         models.PaymentSchedule.objects.get().pk)
+        self.assertEqual(count, 3)
+
+
+class FilterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        customer = Party.objects.create(name='Customer', type='customer')
+        self.sales = [models.Sales.objects.create(lead_or_customer=customer, to=customer)
+                      for _ in range(2)]
+        self.schedule = models.PaymentSchedule.objects.create(sales=self.sales[0])
+        self.installments = [
+            models.PaymentInstallment.objects.create(
+                payment_schedule=self.schedule, payment_time=datetime.date(2024, 3, day),
+                payment_amount=Decimal('5.00'), status=status)
+            for day, status in [(1, 'paid'), (15, 'unpaid'), (31, 'unpaid')]]
+
+    def test_installments(self):
+        url = '/api/payment-installments/'
+        response = self.client.get(url, {'payment_schedule_id': self.schedule.pk,
+                                         'due_from': '2024-03-01', 'due_to': '2024-03-15',
+                                         'status': 'unpaid'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [self.installments[1].pk])
+        response = self.client.get(url, {'status': 'late'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_schedules_by_sales(self):
+        response = self.client.get('/api/payment-schedules/', {'sales_id': self.sales[1].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/api/payment-schedules/', {'sales_id': self.sales[0].pk})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class IndexUsageTest(TestCase):
+    rows = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.make_aware(datetime.datetime(2024, 1, 1))
+        days = [start + datetime.timedelta(hours=n) for n in range(cls.rows)]
+        statuses = ['open', 'paid', 'void', 'overdue', 'draft']
+        customer = Party.objects.create(name='Customer', type='customer')
+        sales = models.Sales.objects.bulk_create([
+            models.Sales(created_at=day, status=('draft', 'sent', 'accepted')[n % 3])
+            for n, day in enumerate(days)])
+        models.SalesInvoice.objects.bulk_create([
+            models.SalesInvoice(customer=customer, date=day, amount=1,
+                                status=statuses[n % 5])
+            for n, day in enumerate(days)])
+        models.SalesPayment.objects.bulk_create([
+            models.SalesPayment(date=day, amount=1, payment_mode='cash',
+                                mapping_status=f"batch-{n % 300}")
+            for n, day in enumerate(days)])
+        schedules = models.PaymentSchedule.objects.bulk_create([
+            models.PaymentSchedule(sales=sale) for sale in sales])
+        models.PaymentInstallment.objects.bulk_create([
+            models.PaymentInstallment(payment_schedule=schedules[n % len(schedules)],
+                                      payment_time=day.date(), payment_amount=1)
+            for n, day in enumerate(days)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.day = days[cls.rows // 2]
 
-# Create your tests here.
+    def test_hot_queries_use_indexes(self):
+        day = self.day
+        checks = [
+            ('sales_created_idx', models.Sales.objects.order_by('-created_at', '-id')[:50]),
+            ('sales_invoice_status_idx', models.SalesInvoice.objects.filter(
+                status='open', date__lt=day).order_by('date')),
+            ('sales_payment_mapping_idx', models.SalesPayment.objects.filter(
+                mapping_status='batch-7')),
+            ('installment_due_idx', models.PaymentInstallment.objects.filter(
+                payment_time__range=(day.date(), day.date() + datetime.timedelta(days=7)))),
+            ('installment_schedule_idx', models.PaymentInstallment.objects.filter(
+                payment_schedule_id=1)),
+        ]
+        for index, queryset in checks:
+            with self.subTest(index=index, query=str(queryset.query)):
+                plan = queryset.explain()
+                self.assertIn(f"INDEX {index}", plan)
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
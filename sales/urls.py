@@ -11,6 +11,8 @@ router.register(r'plot-descriptions', views.PlotDescriptionViewSet)
 router.register(r'items', views.ItemViewSet)
 router.register(r'sales-payments', views.SalesPaymentViewSet)
 router.register(r'sales-invoices', views.SalesInvoiceViewSet)
+router.register(r'payment-schedules', views.PaymentScheduleViewSet)
+router.register(r'payment-installments', views.PaymentInstallmentViewSet)
 
 
 urlpatterns = [
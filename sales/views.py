@@ -2,21 +2,26 @@ from rest_framework import viewsets
 from django.shortcuts import render
 from . import serializers
 from . import models
+from accounting.conditional import ConditionalGetMixin
+from accounting.querysets import OptimizedQuerysetMixin
 # Create your views here.
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.Brands.objects.all()
+    pagination_class = None
     serializer_class = serializers.BrandSerializer
 
 
-class PlotDescriptionViewSet(viewsets.ModelViewSet):
+class PlotDescriptionViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.PlotDescription.objects.all()
+    pagination_class = None
     serializer_class = serializers.PlotSerializer
 
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.Item.objects.all()
+    filter_fields = {'status': 'status', 'brand': 'brand', 'item_group': 'item_group'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -24,8 +29,11 @@ class ItemViewSet(viewsets.ModelViewSet):
         return serializers.ItemSerializer
 
 
-class SalesViewSet(viewsets.ModelViewSet):
+class SalesViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.Sales.objects.all()
+    cursor_ordering = ('-created_at',)
+    filter_fields = {'created': 'created_at', 'status': 'status', 'party': 'lead_or_customer',
+                     'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -43,53 +51,38 @@ class SalesViewSet(viewsets.ModelViewSet):
         return f"SALES-{now().strftime('%Y%m%d-%H%M%S')}"
 
 
-class SalesItemsViewSet(viewsets.ModelViewSet):
+class SalesItemsViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.SalesItems.objects.all()
+    filter_fields = {'sales_id': 'sales', 'item': 'item'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return serializers.SalesItemsReadSerializer
         return serializers.SalesItemsWriteSerializer
 
-    def get_queryset(self):
-        queryset = models.SalesItems.objects.all()
-        sales_id = self.request.query_params.get('sales_id')
-        if sales_id:
-            queryset = queryset.filter(sales_id=sales_id)
-        return queryset
 
-
-class PaymentScheduleViewSet(viewsets.ModelViewSet):
+class PaymentScheduleViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.PaymentSchedule.objects.all()
+    filter_fields = {'sales_id': 'sales'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
-            return PaymentScheduleReadSerializer
-        return PaymentScheduleWriteSerializer
-
-    def get_queryset(self):
-        queryset = PaymentSchedule.objects.all()
-        sales_id = self.request.query_params.get('sales_id')
-        if sales_id:
-            queryset = queryset.filter(sales_id=sales_id)
-        return queryset
+            return serializers.PaymentScheduleReadSerializer
+        return serializers.PaymentScheduleWriteSerializer
 
 
-class PaymentInstallmentViewSet(viewsets.ModelViewSet):
+class PaymentInstallmentViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.PaymentInstallment.objects.all()
+    filter_fields = {'payment_schedule_id': 'payment_schedule', 'due': 'payment_time',
+                     'status': 'status', 'amount': 'payment_amount'}
     serializer_class = serializers.PaymentInstallmentSerializer
 
-    def get_queryset(self):
-        queryset = PaymentInstallment.objects.all()
-        payment_schedule_id = self.request.query_params.get(
-            'payment_schedule_id')
-        if payment_schedule_id:
-            queryset = queryset.filter(payment_schedule_id=payment_schedule_id)
-        return queryset
-
 
-class SalesPaymentViewSet(viewsets.ModelViewSet):
+class SalesPaymentViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.SalesPayment.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'mapping_status': 'mapping_status',
+                     'invoice': 'invoice', 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -97,8 +90,11 @@ class SalesPaymentViewSet(viewsets.ModelViewSet):
         return serializers.SalesPaymentSerializer
 
 
-class SalesInvoiceViewSet(viewsets.ModelViewSet):
+class SalesInvoiceViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = models.SalesInvoice.objects.all()
+    cursor_ordering = ('-date',)
+    filter_fields = {'date': 'date', 'status': 'status', 'party': 'customer', 'sales': 'sales',
+                     'account': ('debit_account', 'credit_account'), 'amount': 'amount'}
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']: